@@ -37,6 +37,11 @@ document.addEventListener('DOMContentLoaded', () => {
     let isServerConnected = false;
     let connectionState = 'disconnected'; // 'disconnected', 'server_connected', 'camera_connected'
     let lightsOn = false;
+    let controlSocket = null;
+    let controlSeq = 0;
+    let statusEvents = null;
+    let statusEventsWatchdog = null;
+    let lostCameraId = null;
 
     // Load settings from localStorage
     const settings = {
@@ -137,6 +142,113 @@ document.addEventListener('DOMContentLoaded', () => {
     }
     // --- end Lights helpers ---
 
+    // --- Control channel helpers ---
+    // Open the persistent WebSocket control channel if the server offers one.
+    // Joystick updates fall back to POST /control while it is unavailable.
+    function openControlSocket(channel) {
+        if (!channel || !channel.url || !window.WebSocket) return;
+        if (controlSocket && controlSocket.readyState <= WebSocket.OPEN) return;
+
+        const socket = new WebSocket(`ws://${settings.gpioAddress}${channel.url}`);
+        socket.onopen = () => {
+            console.log('Control channel open');
+            controlSeq = 0;
+        };
+        socket.onclose = () => {
+            if (controlSocket === socket) controlSocket = null;
+        };
+        socket.onerror = (err) => {
+            console.warn('Control channel error:', err);
+        };
+        controlSocket = socket;
+    }
+
+    function closeControlSocket() {
+        if (controlSocket) {
+            controlSocket.close();
+            controlSocket = null;
+        }
+    }
+    // --- end Control channel helpers ---
+
+    // --- Status push helpers ---
+    // Subscribe to the server's /events stream instead of polling /status.
+    // The server pings idle streams every 15 seconds; if nothing arrives for
+    // longer than the watchdog allows, treat the link as lost and reconnect.
+    const STATUS_EVENTS_WATCHDOG_MS = 40000;
+
+    function openStatusEvents(events) {
+        closeStatusEvents();
+        const source = new EventSource(`http://${settings.gpioAddress}${events.url}`);
+        const handle = (name, handler) => source.addEventListener(name, (event) => {
+            resetStatusEventsWatchdog();
+            handler(JSON.parse(event.data));
+        });
+
+        handle('status', (data) => {
+            lightsOn = Boolean(data.lights);
+            updateLightsButtonUI();
+            openControlSocket(data.control_channel);
+        });
+        handle('ping', () => {});
+        handle('lights', (data) => {
+            lightsOn = Boolean(data.on);
+            updateLightsButtonUI();
+        });
+        handle('cameras', () => fetchAvailableCameras());
+        handle('camera', (data) => {
+            if (data.camera_id !== settings.cameraId) return;
+            if (data.state === 'lost' || data.state === 'released') {
+                lostCameraId = data.camera_id;
+                if (connectionState === 'camera_connected') {
+                    showCameraError('Camera connection lost');
+                    connectionState = 'server_connected';
+                    updateUIForConnectionState();
+                }
+            } else if (data.state === 'opened' && lostCameraId === data.camera_id) {
+                lostCameraId = null;
+                startCameraStream();
+            }
+        });
+        source.onerror = () => {
+            // Reconnect through checkServerConnection so the rest of the UI resyncs too
+            if (statusEvents === source) serverConnectionLost();
+        };
+        statusEvents = source;
+        resetStatusEventsWatchdog();
+    }
+
+    function resetStatusEventsWatchdog() {
+        clearTimeout(statusEventsWatchdog);
+        statusEventsWatchdog = setTimeout(serverConnectionLost, STATUS_EVENTS_WATCHDOG_MS);
+    }
+
+    function closeStatusEvents() {
+        clearTimeout(statusEventsWatchdog);
+        statusEventsWatchdog = null;
+        if (statusEvents) {
+            statusEvents.close();
+            statusEvents = null;
+        }
+    }
+
+    function serverConnectionLost() {
+        closeStatusEvents();
+        if (isServerConnected) {
+            isServerConnected = false;
+            updateConnectionStatus('disconnected');
+            connectionState = 'disconnected';
+            updateUIForConnectionState();
+            closeControlSocket();
+            showCameraError('Server connection lost');
+        }
+        // Keep retrying until the server is back
+        if (!serverCheckInterval) {
+            serverCheckInterval = setInterval(checkServerConnection, 5000);
+        }
+    }
+    // --- end Status push helpers ---
+
     // Initialize camera options
     function initCameraOptions() {
         // Clear previous options
@@ -158,11 +270,16 @@ document.addEventListener('DOMContentLoaded', () => {
         // Clear previous status check interval
         if (serverCheckInterval) {
             clearInterval(serverCheckInterval);
+            serverCheckInterval = null;
         }
 
         // Show connecting message
         updateConnectionStatus('connecting');
 
+        // Any open control channel or event stream may point at the old address
+        closeControlSocket();
+        closeStatusEvents();
+
         // Try to connect to server
         fetch(`http://${settings.gpioAddress}/status`, {
             method: 'GET',
@@ -182,13 +299,22 @@ document.addEventListener('DOMContentLoaded', () => {
                 connectionState = 'server_connected';
                 updateUIForConnectionState();
 
+                // Prefer the WebSocket control channel when available
+                openControlSocket(data.control_channel);
+
                 // Fetch available cameras
                 fetchAvailableCameras();
 
                 // Fetch current lights state
                 fetchLightsStatus();
 
-                // Set up periodic server check
+                // Let the server push changes when it can, so steady state needs no polling
+                if (data.events && window.EventSource) {
+                    openStatusEvents(data.events);
+                    return;
+                }
+
+                // Otherwise set up periodic server check
                 serverCheckInterval = setInterval(() => {
                     // Use a simple ping check that doesn't update the UI
                     fetch(`http://${settings.gpioAddress}/status`, {
@@ -197,12 +323,14 @@ document.addEventListener('DOMContentLoaded', () => {
                         signal: AbortSignal.timeout(10000)
                     })
                         .then(response => response.ok ? response.json() : Promise.reject())
-                        .then(() => {
+                        .then(data => {
                             // Still connected, do nothing
                             if (!isServerConnected) {
                                 isServerConnected = true;
                                 updateConnectionStatus('connected');
                             }
+                            // Reopen the control channel if it dropped
+                            openControlSocket(data.control_channel);
                         })
                         .catch(() => {
                             if (isServerConnected) {
@@ -210,6 +338,7 @@ document.addEventListener('DOMContentLoaded', () => {
                                 updateConnectionStatus('disconnected');
                                 connectionState = 'disconnected';
                                 updateUIForConnectionState();
+                                closeControlSocket();
                                 showCameraError('Server connection lost');
                             }
                         });
@@ -612,11 +741,26 @@ document.addEventListener('DOMContentLoaded', () => {
     setupJoystick(leftJoystick, leftKnob, leftValue, true);
     setupJoystick(rightJoystick, rightKnob, rightValue, false);
 
+    // Resend while a stick is held still; the server stops the motors if
+    // commands stop arriving for half a second
+    setInterval(() => {
+        if (leftJoystickActive || rightJoystickActive) {
+            sendControlValues();
+        }
+    }, 200);
+
     // Send control values to server
     function sendControlValues() {
         // Only send if server is connected
         if (!isServerConnected) return;
 
+        // Compact "seq,forwardReverse,leftRight" over the control channel
+        if (controlSocket && controlSocket.readyState === WebSocket.OPEN) {
+            controlSeq += 1;
+            controlSocket.send(`${controlSeq},${leftJoystickValue},${rightJoystickValue}`);
+            return;
+        }
+
         fetch(`http://${settings.gpioAddress}/control`, {
             method: 'POST',
             headers: {
@@ -636,6 +780,7 @@ document.addEventListener('DOMContentLoaded', () => {
                 updateConnectionStatus('disconnected');
                 connectionState = 'disconnected';
                 updateUIForConnectionState();
+                closeControlSocket();
                 showCameraError('Lost connection to server');
             }
         });
@@ -0,0 +1,53 @@
+"""Control latency against the number of streaming cameras, thread vs process capture
+
+Runs the load harness once per (capture mode, camera count), with one full
+size stream per camera, and tabulates POST /control round-trip percentiles
+and the server process's CPU (workers not included). With
+GPIO_SERVER_CAPTURE=process the capture and encode work moves into
+lower-priority worker processes, so the control percentiles should stay flat
+as cameras are added. Usage:
+
+    python firmware/benchmarks/capture_isolation.py [--cameras 1 2 4] [--duration 10]
+"""
+import argparse
+import json
+
+import harness
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--cameras', type=int, nargs='+', default=[0, 1, 2, 4], help='camera counts to run')
+    parser.add_argument('--modes', nargs='+', default=['thread', 'process'], choices=['thread', 'process'])
+    parser.add_argument('--engine', default='flask', choices=['flask', 'aiohttp'])
+    parser.add_argument('--mjpeg', action='store_true', help='synthetic cameras deliver MJPEG like a UVC camera')
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--port', type=int, default=18083)
+    args = parser.parse_args()
+
+    results = []
+    for mode in args.modes:
+        for cameras in args.cameras:
+            run = argparse.Namespace(
+                engine=args.engine, capture=mode, clients=cameras, cameras=max(1, cameras), stream_query='',
+                width=640, height=480, fps=30.0, video=None, mjpeg=args.mjpeg, command_rate=50.0, burst=2.0,
+                gap=0.5, transport='http', poll_interval=1.0, duration=args.duration, warmup=2.0, port=args.port)
+            load = harness.run_load(run)
+            results.append({
+                'capture': mode,
+                'cameras': cameras,
+                'control': load['control']['round_trip'],
+                'stream_fps_min': load['stream']['fps_min'],
+                'server_cpu_percent': load['process'].get('cpu_percent_mean')
+            })
+
+    print(json.dumps(results, indent=2))
+    print(f"\n{'capture':<9}{'cameras':>8}{'p50 ms':>9}{'p90 ms':>9}{'p99 ms':>9}{'fps min':>9}{'cpu %':>8}")
+    for row in results:
+        control = row['control']
+        print(f"{row['capture']:<9}{row['cameras']:>8}{control.get('p50_ms', 0):>9}{control.get('p90_ms', 0):>9}"
+              f"{control.get('p99_ms', 0):>9}{row['stream_fps_min']:>9}{row['server_cpu_percent'] or 0:>8}")
+
+
+if __name__ == '__main__':
+    main()
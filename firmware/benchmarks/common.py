@@ -0,0 +1,106 @@
+"""Helpers shared by the benchmark scripts"""
+import contextlib
+import http.client
+import importlib.util
+import io
+import logging
+import os
+import socket
+import statistics
+import threading
+import time
+
+SERVER_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'gpio-server.py')
+
+
+def load_server(start=True, path=SERVER_PATH, backend='simulation'):
+    """Import gpio-server.py (or another copy of it) as a module and bring up its simulated hardware, keeping GPIO chatter off stdout"""
+    # Set explicitly rather than left to detection: on a Pi, auto would
+    # drive the real motors and LEDs
+    os.environ['GPIO_SERVER_BACKEND'] = backend
+    spec = importlib.util.spec_from_file_location('gpio_server', path)
+    module = importlib.util.module_from_spec(spec)
+    with contextlib.redirect_stdout(io.StringIO()):
+        spec.loader.exec_module(module)
+        if start:
+            module.startup(wait=True)
+    return module
+
+
+def percentiles(samples):
+    """Summarise latency samples (seconds) as millisecond percentiles"""
+    samples = sorted(samples)
+    if not samples:
+        return {}
+    pick = lambda q: samples[min(len(samples) - 1, int(q * len(samples)))]
+    return {
+        'p50_ms': round(pick(0.50) * 1000, 3),
+        'p90_ms': round(pick(0.90) * 1000, 3),
+        'p99_ms': round(pick(0.99) * 1000, 3),
+        'max_ms': round(samples[-1] * 1000, 3),
+        'mean_ms': round(statistics.mean(samples) * 1000, 3)
+    }
+
+
+class StreamReader(threading.Thread):
+    """Reads an MJPEG stream as fast as the server sends it, counting frames and bytes"""
+
+    def __init__(self, port, path):
+        super().__init__(daemon=True)
+        self.port = port
+        self.path = path
+        self.frames = 0
+        self.bytes = 0
+        self.started = None
+        self._done = threading.Event()
+
+    def run(self):
+        with socket.create_connection(('127.0.0.1', self.port)) as conn:
+            conn.settimeout(1.0)
+            conn.sendall(f'GET {self.path} HTTP/1.1\r\nHost: localhost\r\n\r\n'.encode())
+            tail = b''
+            self.started = time.perf_counter()
+            while not self._done.is_set():
+                try:
+                    chunk = conn.recv(65536)
+                except socket.timeout:
+                    continue
+                if not chunk:
+                    break
+                self.bytes += len(chunk)
+                data = tail + chunk
+                self.frames += data.count(b'--frame\r\n')
+                tail = data[-9:]
+
+    def stop(self):
+        self._done.set()
+        self.join(timeout=2.0)
+        elapsed = time.perf_counter() - self.started if self.started else 0
+        return self.frames / elapsed if elapsed else 0.0
+
+
+def wait_for_server(port, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=1.0)
+            conn.request('GET', '/status')
+            if conn.getresponse().status == 200:
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Server on port {port} did not start")
+
+
+def serve(port, width=640, height=480, fps=30.0, video=None, mjpeg=False):
+    """Child process: run the server on simulated hardware with a synthetic camera"""
+    import synthetic_camera
+
+    synthetic_camera.install(width=width, height=height, fps=fps, video=video, mjpeg=mjpeg)
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = load_server()
+    server.CAPTURE_WORKER_COMMAND = synthetic_camera.worker_command()
+    if server.SERVER_ENGINE == 'aiohttp':
+        server.run_async_server(host='127.0.0.1', port=port)
+    else:
+        server.app.run(host='127.0.0.1', port=port, threaded=True)
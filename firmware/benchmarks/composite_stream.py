@@ -0,0 +1,101 @@
+"""Compare a composite (tiled) stream with separate per-camera streams
+
+Starts the GPIO server in a child process with synthetic cameras, then for
+each mode reads the streams for a fixed time and reports delivered FPS, bytes
+per second over the wire and the server's CPU use:
+
+  * separate: one /camera/<id>/stream per camera
+  * tile / pip: a single /composite/stream?cameras=...&layout=...
+
+Usage:
+
+    python firmware/benchmarks/composite_stream.py [--cameras 2] [--duration 10]
+"""
+import argparse
+import http.client
+import json
+import os
+import subprocess
+import sys
+import time
+
+from common import StreamReader, serve, wait_for_server
+from harness import ProcessSampler
+
+
+def measure(port, pid, paths, duration, warmup):
+    readers = [StreamReader(port, path) for path in paths]
+    for reader in readers:
+        reader.start()
+    time.sleep(warmup)
+    sampler = ProcessSampler(pid)
+    start_frames = [reader.frames for reader in readers]
+    start_bytes = [reader.bytes for reader in readers]
+    sampler.start()
+    time.sleep(duration)
+    process = sampler.stop()
+    fps = [(reader.frames - frames) / duration for reader, frames in zip(readers, start_frames)]
+    rate = sum(reader.bytes - sent for reader, sent in zip(readers, start_bytes)) / duration
+    for reader in readers:
+        reader.stop()
+    time.sleep(0.5)  # Let the server tear the streams down before the next mode
+    return {
+        'connections': len(paths),
+        'fps_per_connection': [round(value, 1) for value in fps],
+        'bytes_per_sec': round(rate),
+        'cpu_percent_mean': process.get('cpu_percent_mean')
+    }
+
+
+def composite_stats(port):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=5.0)
+    conn.request('GET', '/composite')
+    composites = json.loads(conn.getresponse().read())['composites']
+    conn.close()
+    return composites[0] if composites else {}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--cameras', type=int, default=2)
+    parser.add_argument('--width', type=int, default=640, help='synthetic camera and composite width')
+    parser.add_argument('--height', type=int, default=480)
+    parser.add_argument('--fps', type=float, default=30.0, help='synthetic camera frame rate')
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds measured per mode')
+    parser.add_argument('--warmup', type=float, default=2.0)
+    parser.add_argument('--port', type=int, default=18083)
+    parser.add_argument('--serve', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.port, args.width, args.height, args.fps)
+        return
+
+    child = subprocess.Popen([sys.executable, os.path.abspath(__file__), '--serve', '--port', str(args.port),
+                              '--width', str(args.width), '--height', str(args.height), '--fps', str(args.fps)],
+                             stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    camera_ids = ','.join(str(i) for i in range(args.cameras))
+    results = {}
+    try:
+        wait_for_server(args.port)
+        results['separate'] = measure(args.port, child.pid,
+                                      [f'/camera/{i}/stream' for i in range(args.cameras)],
+                                      args.duration, args.warmup)
+        for layout in ('tile', 'pip'):
+            path = f'/composite/stream?cameras={camera_ids}&layout={layout}&width={args.width}'
+            results[layout] = measure(args.port, child.pid, [path], args.duration, args.warmup)
+        # Stats of the last composite are gone once its viewer leaves; sample one live
+        reader = StreamReader(args.port, f'/composite/stream?cameras={camera_ids}&width={args.width}')
+        reader.start()
+        time.sleep(args.warmup)
+        stats = composite_stats(args.port)
+        reader.stop()
+        results['tile'].update({key: stats.get(key) for key in ('size', 'skew_ms', 'compose_ms', 'encode_ms')})
+    finally:
+        child.terminate()
+        child.wait(timeout=10)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
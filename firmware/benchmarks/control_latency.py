@@ -0,0 +1,152 @@
+"""Benchmark command-to-GPIO latency and sustained rate: POST /control vs /control/ws
+
+Runs the GPIO server in-process on simulated hardware, then drives it over
+real sockets. Command-to-GPIO is the time from sending a command until the
+motor control loop writes it to the pins, so it includes up to one loop tick.
+Usage:
+
+    python firmware/benchmarks/control_latency.py [--count 500] [--duration 5]
+"""
+import argparse
+import contextlib
+import http.client
+import io
+import json
+import logging
+import random
+import threading
+import time
+
+from common import load_server, percentiles
+
+
+class GpioClock:
+    """Wraps apply_motors() to timestamp the moment each new value reaches the GPIO layer"""
+
+    def __init__(self, server):
+        self.applied = []
+        original = server.apply_motors
+
+        def timed_apply(left_motor, right_motor):
+            original(left_motor, right_motor)
+            self.applied.append((left_motor, time.perf_counter()))
+
+        server.apply_motors = timed_apply
+
+    def wait_for(self, value, since, timeout=0.5):
+        """Return when a left motor value was applied after `since`, or None on timeout"""
+        deadline = time.perf_counter() + timeout
+        while time.perf_counter() < deadline:
+            for applied_value, stamp in reversed(self.applied[-4:]):
+                if applied_value == value and stamp >= since:
+                    return stamp
+            time.sleep(0.0002)
+        return None
+
+
+def bench_post(port, clock, count, duration):
+    conn = http.client.HTTPConnection('127.0.0.1', port)
+    headers = {'Content-Type': 'application/json'}
+    to_gpio, round_trip = [], []
+
+    for i in range(count):
+        value = i % 200 + 1
+        # Random spacing so commands don't phase-lock to the control loop tick
+        time.sleep(random.uniform(0, 0.01))
+        body = json.dumps({'forwardReverse': value, 'leftRight': 0})
+        sent = time.perf_counter()
+        conn.request('POST', '/control', body, headers)
+        conn.getresponse().read()
+        round_trip.append(time.perf_counter() - sent)
+        applied = clock.wait_for(value, sent)
+        if applied is not None:
+            to_gpio.append(applied - sent)
+
+    end = time.perf_counter() + duration
+    sent_count = 0
+    while time.perf_counter() < end:
+        conn.request('POST', '/control', json.dumps({'forwardReverse': sent_count % 255, 'leftRight': 0}), headers)
+        conn.getresponse().read()
+        sent_count += 1
+    conn.close()
+    return {
+        'command_to_gpio': percentiles(to_gpio),
+        'round_trip': percentiles(round_trip),
+        'sustained_rate_per_s': round(sent_count / duration, 1)
+    }
+
+
+def bench_websocket(port, clock, count, duration):
+    from simple_websocket import Client
+
+    ws = Client.connect(f'ws://127.0.0.1:{port}/control/ws')
+    to_gpio, round_trip = [], []
+    seq = 0
+
+    for i in range(count):
+        seq += 1
+        value = i % 200 + 1
+        time.sleep(random.uniform(0, 0.01))
+        sent = time.perf_counter()
+        ws.send(f'{seq},{value},0')
+        ws.receive()
+        round_trip.append(time.perf_counter() - sent)
+        applied = clock.wait_for(value, sent)
+        if applied is not None:
+            to_gpio.append(applied - sent)
+
+    # Sustained rate: keep a window of commands in flight, as a joystick would
+    window = 8
+    in_flight = 0
+    acked = 0
+    end = time.perf_counter() + duration
+    while time.perf_counter() < end:
+        while in_flight < window:
+            seq += 1
+            ws.send(f'{seq},{seq % 255},0')
+            in_flight += 1
+        ws.receive()
+        in_flight -= 1
+        acked += 1
+    while in_flight:
+        ws.receive()
+        in_flight -= 1
+    ws.close()
+    return {
+        'command_to_gpio': percentiles(to_gpio),
+        'round_trip': percentiles(round_trip),
+        'sustained_rate_per_s': round(acked / duration, 1)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--count', type=int, default=500, help='sequential commands for latency percentiles')
+    parser.add_argument('--duration', type=float, default=5.0, help='seconds for the sustained rate test')
+    args = parser.parse_args()
+
+    from werkzeug.serving import make_server
+
+    # Per-request access logging would dominate the timings
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+
+    server = load_server()
+    clock = GpioClock(server)
+    httpd = make_server('127.0.0.1', 0, server.app, threaded=True)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    port = httpd.server_port
+
+    results = {}
+    with contextlib.redirect_stdout(io.StringIO()):
+        results['post'] = bench_post(port, clock, args.count, args.duration)
+        if server.sock is not None:
+            results['websocket'] = bench_websocket(port, clock, args.count, args.duration)
+    httpd.shutdown()
+
+    if 'websocket' not in results:
+        print('flask-sock is not installed; only the POST path was measured')
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
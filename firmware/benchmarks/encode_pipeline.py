@@ -0,0 +1,109 @@
+"""Compare serial and pipelined JPEG encoding: stream FPS and per-frame latency
+
+For each resolution, streams a synthetic camera in-process (no network, so
+the encoder is the bottleneck) once with the serial encode loop
+(GPIO_SERVER_ENCODE_WORKERS=1) and once with the encode pool, and reports
+delivered FPS, capture-to-send frame age percentiles, and the time of a
+single encode at that size for reference. Usage:
+
+    python firmware/benchmarks/encode_pipeline.py [--workers 4] [--sizes 640x480 1280x720 1920x1080]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+from common import load_server, percentiles
+
+
+def stream(width, height, fps, duration, warmup):
+    """Runs in a child process so GPIO_SERVER_ENCODE_WORKERS is read at import"""
+    import cv2
+    import synthetic_camera
+
+    synthetic_camera.install(width=width, height=height, fps=fps)
+    server = load_server()
+    ages = []
+    original = server.StreamClient.record_sent
+
+    def record_sent(client, send_time, size, timestamp):
+        ages.append(time.time() - timestamp)
+        original(client, send_time, size, timestamp)
+
+    server.StreamClient.record_sent = record_sent
+    frames = server.generate_camera_frames('0', width=width, height=height)
+    measure_from = time.monotonic() + warmup
+    end = measure_from + duration
+    delivered = 0
+    for _ in frames:
+        now = time.monotonic()
+        if now >= end:
+            break
+        if now < measure_from:
+            ages.clear()
+        else:
+            delivered += 1
+    frames.close()
+
+    capture = server.camera_captures['0']
+    seq, _, frame = capture.latest()
+    image = capture.pixels(seq, frame)
+    started = time.perf_counter()
+    for _ in range(20):
+        cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, server.JPEG_QUALITY])
+    encode_ms = (time.perf_counter() - started) * 1000 / 20
+
+    server.stop_capture('0')
+    server.motor_loop.stop()
+    return {
+        'fps': round(delivered / duration, 1),
+        'frame_age': percentiles(ages),
+        'single_encode_ms': round(encode_ms, 2),
+        'pipelined': sum(variant.pipelined for variant in capture.variants.values()),
+        'pipeline_skipped': capture.prefetch_skipped
+    }
+
+
+def run_child(workers, in_flight, size, args):
+    env = dict(os.environ, GPIO_SERVER_ENCODE_WORKERS=str(workers), GPIO_SERVER_ENCODE_IN_FLIGHT=str(in_flight))
+    output = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', '--sizes', size,
+                             '--fps', str(args.fps), '--duration', str(args.duration), '--warmup', str(args.warmup)],
+                            env=env, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='encode pool size')
+    parser.add_argument('--in-flight', type=int, help='frames in the pool at once (default: --workers)')
+    parser.add_argument('--sizes', nargs='+', default=['640x480', '1280x720', '1920x1080'])
+    parser.add_argument('--fps', type=float, default=30.0, help='synthetic camera frame rate')
+    parser.add_argument('--duration', type=float, default=5.0)
+    parser.add_argument('--warmup', type=float, default=1.0)
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        width, height = map(int, args.sizes[0].split('x'))
+        print(json.dumps(stream(width, height, args.fps, args.duration, args.warmup)))
+        return
+
+    results = {}
+    for size in args.sizes:
+        results[size] = {
+            'serial': run_child(1, 1, size, args),
+            f'pool_{args.workers}': run_child(args.workers, args.in_flight or args.workers, size, args)
+        }
+    print(json.dumps(results, indent=2))
+    print(f"\n{'size':<11}{'encoder':<9}{'fps':>7}{'age p50':>9}{'age p99':>9}{'1 encode':>10}")
+    for size, runs in results.items():
+        for name, run in runs.items():
+            age = run['frame_age']
+            print(f"{size:<11}{name:<9}{run['fps']:>7}{age.get('p50_ms', 0):>9}{age.get('p99_ms', 0):>9}"
+                  f"{run['single_encode_ms']:>10}")
+
+
+if __name__ == '__main__':
+    main()
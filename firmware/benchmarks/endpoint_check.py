@@ -0,0 +1,65 @@
+"""Check that the server's endpoints answer cleanly after a full startup
+
+Brings the server up in-process on simulated hardware (see
+common.load_server), then requests the read-only endpoints and sends
+malformed bodies to the routes that validate their input, and reports any
+answer other than the expected status, or a JSON endpoint whose body is not
+JSON. Exits non-zero if anything is off. Usage:
+
+    python firmware/benchmarks/endpoint_check.py
+"""
+import sys
+
+from common import load_server
+
+# (method, path, JSON body, expected status)
+REQUESTS = [
+    ('GET', '/status', None, 200),
+    ('GET', '/debug/trace', None, 200),
+    ('GET', '/debug/trace?subsystem=lights', None, 200),
+    ('GET', '/lights', None, 200),
+    ('GET', '/composite', None, 200),
+    ('GET', '/metrics', None, 200),
+    ('POST', '/lights', [1, 2], 400),
+    ('POST', '/lights', {'color': 'red'}, 400),
+    ('POST', '/lights', {'on': 'false'}, 400),
+    ('POST', '/lights', {'on': False}, 200),
+    ('GET', '/camera/0/skipping', None, 200),
+    ('POST', '/camera/0/skipping', ['on'], 400),
+    ('POST', '/camera/0/skipping', {'on': 'false'}, 400),
+    ('POST', '/camera/0/settings', [1], 400),
+]
+
+
+def main():
+    server = load_server()
+    client = server.app.test_client()
+    failures = []
+    for method, path, body, expected in REQUESTS:
+        response = client.open(path, method=method, json=body)
+        problem = None
+        if response.status_code != expected:
+            problem = f"status {response.status_code}, expected {expected}"
+        elif response.mimetype == 'application/json' and response.get_json(silent=True) is None:
+            problem = "body is not JSON"
+        print(f"{method:<5}{path:<40}{response.status_code:>4}  {problem or 'ok'}")
+        if problem:
+            failures.append(path)
+
+    # Lights are initialised at startup, so the trace always holds a frame
+    events = client.get('/debug/trace?subsystem=lights').get_json() or {}
+    if not any(event['target'] == 'frame' for event in events.get('events', [])):
+        print("no lights frame in /debug/trace after startup")
+        failures.append('/debug/trace')
+
+    # Neither status queries nor rejected requests should have opened a camera
+    if server.camera_captures:
+        print(f"cameras opened: {sorted(server.camera_captures)}")
+        failures.append('camera_captures')
+
+    server.motor_loop.stop()
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
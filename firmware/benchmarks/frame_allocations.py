@@ -0,0 +1,121 @@
+"""Measure memory churn on the camera streaming path
+
+Runs the streaming generators in-process against a synthetic camera with
+several viewers and reports, per delivered frame, the minor page faults the
+process takes (fresh memory being touched: the cost of allocating and
+freeing frame-sized buffers) and the bytes allocated while a frame is
+produced (the tracemalloc high-water mark above the baseline), plus peak
+RSS. Pass --server to measure another copy of gpio-server.py, e.g. one
+exported from an earlier commit, for a before/after comparison:
+
+    git show HEAD~1:firmware/gpio-server.py > /tmp/gpio-server-before.py
+    python firmware/benchmarks/frame_allocations.py --server /tmp/gpio-server-before.py
+    python firmware/benchmarks/frame_allocations.py
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+
+from common import SERVER_PATH, load_server
+
+
+class Viewer(threading.Thread):
+    """Consumes one camera stream as fast as it is produced"""
+
+    def __init__(self, frames):
+        super().__init__(daemon=True)
+        self.frames = frames
+        self.delivered = 0
+        self.bytes = 0
+        self._done = threading.Event()
+
+    def run(self):
+        for part in self.frames:
+            self.delivered += 1
+            self.bytes += len(part)
+            if self._done.is_set():
+                break
+        self.frames.close()
+
+    def stop(self):
+        self._done.set()
+        self.join(timeout=5.0)
+
+
+def run(server_path, viewers, duration, width, mjpeg):
+    import synthetic_camera
+
+    synthetic_camera.install(width=width, height=width * 3 // 4, mjpeg=mjpeg)
+    server = load_server(path=server_path)
+    server.get_capture('0')
+    time.sleep(1.0)
+
+    clients = [Viewer(server.generate_camera_frames('0', 'fixed')) for _ in range(viewers)]
+    # A scaled variant exercises the resize path as well
+    clients.append(Viewer(server.generate_camera_frames('0', 'fixed', width // 2)))
+    for client in clients:
+        client.start()
+    time.sleep(1.0)
+
+    delivered = sum(client.delivered for client in clients)
+    faults = resource.getrusage(resource.RUSAGE_SELF).ru_minflt
+    time.sleep(duration)
+    frames = sum(client.delivered for client in clients) - delivered
+    faults = resource.getrusage(resource.RUSAGE_SELF).ru_minflt - faults
+
+    # tracemalloc slows allocation down, so it gets a separate window
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    delivered = sum(client.delivered for client in clients)
+    time.sleep(duration / 2)
+    traced_frames = sum(client.delivered for client in clients) - delivered
+    peak = tracemalloc.get_traced_memory()[1] - baseline
+    tracemalloc.stop()
+
+    for client in clients:
+        client.stop()
+    server.stop_capture('0')
+    server.motor_loop.stop()
+    return {
+        'server': server_path,
+        'viewers': len(clients),
+        'frames': frames,
+        'fps_per_viewer': round(frames / duration / len(clients), 1),
+        'page_faults_per_frame': round(faults / frames, 1) if frames else None,
+        'traced_peak_kb': round(peak / 1024),
+        'traced_frames': traced_frames,
+        'rss_peak_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--server', default=SERVER_PATH, help='gpio-server.py to measure')
+    parser.add_argument('--viewers', type=int, default=4, help='full-size stream viewers (plus one scaled)')
+    parser.add_argument('--duration', type=float, default=5.0)
+    parser.add_argument('--width', type=int, default=640, help='synthetic camera width (4:3)')
+    parser.add_argument('--mjpeg', action='store_true', help='synthetic camera delivers MJPEG passthrough')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run(args.server, args.viewers, args.duration, args.width, args.mjpeg)))
+        return
+
+    # A fresh process per run so peak RSS belongs to this measurement alone
+    command = [sys.executable, os.path.abspath(__file__), '--child', '--server', args.server,
+               '--viewers', str(args.viewers), '--duration', str(args.duration), '--width', str(args.width)]
+    if args.mjpeg:
+        command.append('--mjpeg')
+    output = subprocess.run(command, capture_output=True, text=True, check=True).stdout
+    print(json.dumps(json.loads(output.strip().splitlines()[-1]), indent=2))
+
+
+if __name__ == '__main__':
+    main()
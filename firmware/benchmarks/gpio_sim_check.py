@@ -0,0 +1,181 @@
+"""Check the libgpiod motor backend against the kernel's gpio-sim module
+
+Creates a simulated GPIO chip through configfs and a stand-in pwmchip
+directory, starts the server with GPIO_SERVER_BACKEND=gpiod pointed at them,
+drives the motors and reads back what actually reached the lines and PWM
+channels. Runs with the default PWM mapping, where only one enable pin has a
+channel, so the motors must not start at all; the same with
+GPIO_SERVER_ONOFF_MOTORS=1, where both tracks must run on/off; and with a
+channel for each enable pin, where both tracks must be on PWM with the
+enable lines left alone. Needs root and the gpio-sim module (modprobe
+gpio-sim). Usage:
+
+    sudo python firmware/benchmarks/gpio_sim_check.py [--lines 32]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from common import load_server
+
+CONFIGFS = '/sys/kernel/config/gpio-sim'
+
+# (forwardReverse, leftRight) commands and the expected per-track duty (0-100)
+COMMANDS = [((255, 0), 100), ((128, 0), 50), ((-128, 0), 50), ((0, 0), 0)]
+
+
+class SimChip:
+    """A gpio-sim chip with one bank, created and torn down through configfs"""
+
+    def __init__(self, lines, name='gpio-server-check'):
+        self.path = os.path.join(CONFIGFS, name)
+        self.bank = os.path.join(self.path, 'bank0')
+        os.mkdir(self.path)
+        os.mkdir(self.bank)
+        self._write(os.path.join(self.bank, 'num_lines'), lines)
+        self._write(os.path.join(self.path, 'live'), 1)
+        dev_name = self._read(os.path.join(self.path, 'dev_name'))
+        self.chip_name = self._read(os.path.join(self.bank, 'chip_name'))
+        self.device = f'/dev/{self.chip_name}'
+        self.lines = f'/sys/devices/platform/{dev_name}/{self.chip_name}'
+
+    @staticmethod
+    def _write(path, value):
+        with open(path, 'w') as f:
+            f.write(str(value))
+
+    @staticmethod
+    def _read(path):
+        with open(path) as f:
+            return f.read().strip()
+
+    def close(self):
+        self._write(os.path.join(self.path, 'live'), 0)
+        os.rmdir(self.bank)
+        os.rmdir(self.path)
+
+
+def fake_pwmchip(directory, channels=2):
+    """Lay out the sysfs attributes SysfsPwm writes, with every channel already exported"""
+    open(os.path.join(directory, 'export'), 'w').close()
+    for channel in range(channels):
+        os.mkdir(os.path.join(directory, f'pwm{channel}'))
+        for name in ('enable', 'period', 'duty_cycle'):
+            open(os.path.join(directory, f'pwm{channel}', name), 'w').close()
+
+
+def read_pwm(directory, channel, previous=None):
+    """Read a fake channel's attributes and empty duty_cycle for the next write
+
+    SysfsPwm pwrite()s duty_cycle in place, which a plain file (unlike sysfs)
+    would leave holding the tail of a longer earlier value. An empty file
+    means the duty was not rewritten, so the previous reading still holds.
+    """
+    values = {}
+    for name in ('enable', 'period', 'duty_cycle'):
+        with open(os.path.join(directory, f'pwm{channel}', name)) as f:
+            text = f.read()
+        values[name] = int(text) if text else (previous or {}).get(name, 0)
+    os.truncate(os.path.join(directory, f'pwm{channel}', 'duty_cycle'), 0)
+    return values
+
+
+def line_value(lines, offset):
+    with open(os.path.join(lines, f'sim_gpio{offset}', 'value')) as f:
+        return int(f.read())
+
+
+def observe(lines, pwmchip):
+    """Child process: bring the server up on the simulated chip and record each command's effect"""
+    server = load_server(backend='gpiod')
+    if not server.motor_loop.running:
+        return {'started': False, 'error': server.readiness.subsystems.get('gpio', {}).get('error')}
+    pins = {'a_en': server.MOTOR_A_EN, 'a_in1': server.MOTOR_A_IN1, 'a_in2': server.MOTOR_A_IN2,
+            'b_en': server.MOTOR_B_EN, 'b_in1': server.MOTOR_B_IN1, 'b_in2': server.MOTOR_B_IN2}
+    result = {'started': True, 'pwm': [server.pwm_a is not None, server.pwm_b is not None], 'steps': []}
+    pwm = [read_pwm(pwmchip, channel) for channel in (0, 1)]
+    for (forward_reverse, left_right), _ in COMMANDS:
+        server.drive(forward_reverse, left_right)
+        time.sleep(0.05)  # a few control loop ticks, well inside the deadman
+        pwm = [read_pwm(pwmchip, channel, pwm[channel]) for channel in (0, 1)]
+        result['steps'].append({
+            'lines': {name: line_value(lines, pin) for name, pin in pins.items()},
+            'pwm': pwm
+        })
+    server.motor_loop.stop()
+    return result
+
+
+def run_child(chip, pwmchip, settings):
+    env = dict(os.environ, GPIO_SERVER_GPIOCHIP=chip.device, GPIO_SERVER_PWMCHIP=pwmchip, **settings)
+    output = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', chip.lines, pwmchip],
+                            env=env, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def check(result, expect_pwm):
+    """Return a list of mismatches between what the lines show and what the commands asked for
+
+    expect_pwm None means the motors should have refused to start.
+    """
+    if expect_pwm is None:
+        return [] if not result['started'] else ["motors started without speed control"]
+    if not result['started']:
+        return [f"motors did not start: {result['error']}"]
+    problems = []
+    if result['pwm'] != [expect_pwm, expect_pwm]:
+        problems.append(f"tracks on PWM: {result['pwm']}, expected both {expect_pwm}")
+    for ((forward_reverse, _), duty), step in zip(COMMANDS, result['steps']):
+        lines = step['lines']
+        forward, reverse = (1, 0) if forward_reverse > 0 else (0, 1) if forward_reverse < 0 else (0, 0)
+        for track, pwm in (('a', step['pwm'][0]), ('b', step['pwm'][1])):
+            if (lines[f'{track}_in1'], lines[f'{track}_in2']) != (forward, reverse):
+                problems.append(f"{forward_reverse}: track {track} direction {lines[f'{track}_in1']}"
+                                f"{lines[f'{track}_in2']}, expected {forward}{reverse}")
+            if expect_pwm:
+                wanted = pwm['period'] * duty // 100
+                if not pwm['enable'] or abs(pwm['duty_cycle'] - wanted) > pwm['period'] // 100:
+                    problems.append(f"{forward_reverse}: track {track} PWM {pwm}, expected duty {wanted}")
+            elif lines[f'{track}_en'] != (1 if duty else 0) or pwm['enable']:
+                problems.append(f"{forward_reverse}: track {track} enable line {lines[f'{track}_en']}, "
+                                f"PWM enable {pwm['enable']}, expected on/off only")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--lines', type=int, default=32, help='lines on the simulated chip (covers BCM 0-27)')
+    parser.add_argument('--child', nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(observe(*args.child)))
+        return
+
+    if not os.path.isdir(CONFIGFS):
+        sys.exit(f"{CONFIGFS} not found: mount configfs and load the gpio-sim module (modprobe gpio-sim)")
+
+    chip = SimChip(args.lines)
+    failed = False
+    try:
+        for name, settings, expect_pwm in (('default mapping', {}, None),
+                                           ('on/off opt-in', {'GPIO_SERVER_ONOFF_MOTORS': '1'}, False),
+                                           ('pwm per track', {'GPIO_SERVER_PWM_CHANNELS': '17:0,18:1'}, True)):
+            with tempfile.TemporaryDirectory() as pwmchip:
+                fake_pwmchip(pwmchip)
+                problems = check(run_child(chip, pwmchip, settings), expect_pwm)
+            print(f"{name:<17}{'ok' if not problems else 'FAILED'}")
+            for problem in problems:
+                print(f"    {problem}")
+            failed = failed or bool(problems)
+    finally:
+        chip.close()
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,336 @@
+"""Hardware-free load harness for the GPIO server, with baseline comparison
+
+Boots the server in a child process on simulated GPIO/LED backends with a
+synthetic camera (generated patterns, or a looped video file), then drives
+a mixed load for a fixed duration:
+
+  * N MJPEG stream clients, spread across the synthetic cameras
+  * joystick command bursts at a set rate over POST /control or /control/ws
+  * periodic /status and /cameras polling
+
+and reports per-client stream FPS, control round-trip percentiles, polling
+latency, and the server's CPU and RSS. Save a run as a baseline and later
+runs are compared against it. Usage:
+
+    python firmware/benchmarks/harness.py --clients 4 --save-baseline baseline.json
+    python firmware/benchmarks/harness.py --clients 4 --baseline baseline.json
+"""
+import argparse
+import http.client
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+from common import StreamReader, percentiles, serve, wait_for_server
+
+# Metrics compared against a baseline, and whether higher values are better
+COMPARED_METRICS = {
+    'stream.fps_min': True,
+    'stream.fps_mean': True,
+    'control.rate_per_s': True,
+    'control.round_trip.p50_ms': False,
+    'control.round_trip.p99_ms': False,
+    'polling.status.p50_ms': False,
+    'polling.cameras.p50_ms': False,
+    'process.cpu_percent_mean': False,
+    'process.rss_mb_peak': False
+}
+
+
+class ProcessSampler(threading.Thread):
+    """Samples a process's CPU utilisation and resident memory from /proc"""
+
+    def __init__(self, pid, interval=0.5):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.cpu = []
+        self.rss = []
+        self._done = threading.Event()
+        self._ticks = os.sysconf('SC_CLK_TCK')
+        self._page = os.sysconf('SC_PAGE_SIZE')
+
+    def _cpu_seconds(self):
+        with open(f'/proc/{self.pid}/stat') as f:
+            # Skip past "pid (comm)"; utime and stime are fields 14 and 15
+            fields = f.read().rsplit(')', 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / self._ticks
+
+    def _rss_bytes(self):
+        with open(f'/proc/{self.pid}/statm') as f:
+            return int(f.read().split()[1]) * self._page
+
+    def run(self):
+        try:
+            last_cpu, last_time = self._cpu_seconds(), time.monotonic()
+            while not self._done.wait(self.interval):
+                cpu, now = self._cpu_seconds(), time.monotonic()
+                self.cpu.append(100.0 * (cpu - last_cpu) / (now - last_time))
+                self.rss.append(self._rss_bytes())
+                last_cpu, last_time = cpu, now
+        except OSError:
+            pass  # Process exited
+
+    def stop(self):
+        self._done.set()
+        self.join(timeout=2.0)
+        if not self.cpu:
+            return {}
+        return {
+            'cpu_percent_mean': round(sum(self.cpu) / len(self.cpu), 1),
+            'cpu_percent_max': round(max(self.cpu), 1),
+            'rss_mb_peak': round(max(self.rss) / 2**20, 1)
+        }
+
+
+class JoystickDriver(threading.Thread):
+    """Sends motor commands at a fixed rate in bursts, timing each round trip"""
+
+    def __init__(self, port, rate, burst, gap, transport='http'):
+        super().__init__(daemon=True)
+        self.port = port
+        self.rate = rate
+        self.burst = burst
+        self.gap = gap
+        self.transport = transport
+        self.samples = []
+        self.errors = 0
+        self.started = None
+        self._done = threading.Event()
+
+    def _connect(self):
+        if self.transport == 'ws':
+            from simple_websocket import Client
+            ws = Client.connect(f'ws://127.0.0.1:{self.port}/control/ws')
+            state = {'seq': 0}
+
+            def send(forward_reverse, left_right):
+                state['seq'] += 1
+                ws.send(f"{state['seq']},{forward_reverse},{left_right}")
+                ws.receive(timeout=2.0)
+            return send, ws.close
+
+        conn = http.client.HTTPConnection('127.0.0.1', self.port, timeout=2.0)
+        headers = {'Content-Type': 'application/json'}
+
+        def send(forward_reverse, left_right):
+            conn.request('POST', '/control', json.dumps(
+                {'forwardReverse': forward_reverse, 'leftRight': left_right}), headers)
+            conn.getresponse().read()
+        return send, conn.close
+
+    def run(self):
+        send, close = self._connect()
+        period = 1.0 / self.rate
+        self.started = time.monotonic()
+        burst_end = self.started + self.burst
+        next_send = self.started
+        i = 0
+        try:
+            while not self._done.is_set():
+                now = time.monotonic()
+                if now >= burst_end:
+                    # Joystick released: stay quiet for the gap, then start a new burst
+                    if self._done.wait(self.gap):
+                        break
+                    burst_end = time.monotonic() + self.burst
+                    next_send = time.monotonic()
+                    continue
+                if next_send > now:
+                    time.sleep(next_send - now)
+                i += 1
+                sent = time.perf_counter()
+                try:
+                    send(i % 200 - 100, (i * 7) % 100 - 50)
+                    self.samples.append(time.perf_counter() - sent)
+                except Exception:
+                    self.errors += 1
+                next_send += period
+                if next_send < time.monotonic() - period:
+                    next_send = time.monotonic()  # Server fell behind; don't burst to catch up
+        finally:
+            close()
+
+    def stop(self):
+        self._done.set()
+        self.join(timeout=5.0)
+        elapsed = time.monotonic() - self.started if self.started else 0
+        return {
+            'transport': self.transport,
+            'sent': len(self.samples),
+            'errors': self.errors,
+            'rate_per_s': round(len(self.samples) / elapsed, 1) if elapsed else 0.0,
+            'round_trip': percentiles(self.samples)
+        }
+
+
+class Poller(threading.Thread):
+    """Polls a GET endpoint at a fixed interval, timing each request"""
+
+    def __init__(self, port, path, interval):
+        super().__init__(daemon=True)
+        self.port = port
+        self.path = path
+        self.interval = interval
+        self.samples = []
+        self.errors = 0
+        self._done = threading.Event()
+
+    def run(self):
+        conn = http.client.HTTPConnection('127.0.0.1', self.port, timeout=5.0)
+        while not self._done.is_set():
+            started = time.perf_counter()
+            try:
+                conn.request('GET', self.path)
+                conn.getresponse().read()
+                self.samples.append(time.perf_counter() - started)
+            except (OSError, http.client.HTTPException):
+                self.errors += 1
+                conn.close()
+                conn = http.client.HTTPConnection('127.0.0.1', self.port, timeout=5.0)
+            self._done.wait(self.interval)
+        conn.close()
+
+    def stop(self):
+        self._done.set()
+        self.join(timeout=5.0)
+        return dict(percentiles(self.samples), requests=len(self.samples), errors=self.errors)
+
+
+def run_load(args):
+    command = [sys.executable, os.path.abspath(__file__), '--serve', '--port', str(args.port),
+               '--width', str(args.width), '--height', str(args.height), '--fps', str(args.fps)]
+    if args.video:
+        command += ['--video', args.video]
+    if args.mjpeg:
+        command.append('--mjpeg')
+    env = dict(os.environ, GPIO_SERVER_ENGINE=args.engine, GPIO_SERVER_CAPTURE=args.capture)
+    child = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_for_server(args.port)
+        sampler = ProcessSampler(child.pid)
+        readers = [StreamReader(args.port, f'/camera/{i % args.cameras}/stream{args.stream_query}')
+                   for i in range(args.clients)]
+        joystick = JoystickDriver(args.port, args.command_rate, args.burst, args.gap, args.transport)
+        pollers = {path.strip('/'): Poller(args.port, path, args.poll_interval)
+                   for path in ('/status', '/cameras')}
+
+        for worker in [*readers, *pollers.values()]:
+            worker.start()
+        time.sleep(args.warmup)
+        sampler.start()
+        joystick.start()
+        time.sleep(args.duration)
+
+        control = joystick.stop()
+        polling = {name: poller.stop() for name, poller in pollers.items()}
+        fps = [reader.stop() for reader in readers]
+        process = sampler.stop()
+    finally:
+        child.terminate()
+        child.wait(timeout=10)
+
+    return {
+        'config': {
+            'engine': args.engine,
+            'capture': args.capture,
+            'clients': args.clients,
+            'cameras': args.cameras,
+            'source': args.video or f'pattern {args.width}x{args.height}@{args.fps:g}' + (' mjpeg' if args.mjpeg else ''),
+            'command_rate': args.command_rate,
+            'transport': args.transport,
+            'duration': args.duration
+        },
+        'stream': {
+            'fps_per_client': [round(value, 1) for value in fps],
+            'fps_min': round(min(fps), 1) if fps else 0.0,
+            'fps_mean': round(sum(fps) / len(fps), 1) if fps else 0.0
+        },
+        'control': control,
+        'polling': polling,
+        'process': process
+    }
+
+
+def _lookup(results, path):
+    value = results
+    for key in path.split('.'):
+        if not isinstance(value, dict) or key not in value:
+            return None
+        value = value[key]
+    return value
+
+
+def compare(results, baseline, tolerance):
+    """Return (rows, regressed) comparing results to a baseline run"""
+    rows = []
+    regressed = False
+    for path, higher_is_better in COMPARED_METRICS.items():
+        current, base = _lookup(results, path), _lookup(baseline, path)
+        if current is None or base is None:
+            continue
+        change = (current - base) / base * 100 if base else 0.0
+        worse = -change if higher_is_better else change
+        status = 'regressed' if worse > tolerance else 'improved' if worse < -tolerance else 'ok'
+        regressed = regressed or status == 'regressed'
+        rows.append((path, base, current, change, status))
+    return rows, regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--engine', default='flask', choices=['flask', 'aiohttp'])
+    parser.add_argument('--capture', default='thread', choices=['thread', 'process'],
+                        help='capture in server threads or in worker processes')
+    parser.add_argument('--clients', type=int, default=2, help='concurrent stream clients')
+    parser.add_argument('--cameras', type=int, default=1, help='synthetic cameras the clients are spread across')
+    parser.add_argument('--stream-query', default='', help='query string for stream URLs, e.g. "?width=320"')
+    parser.add_argument('--width', type=int, default=640)
+    parser.add_argument('--height', type=int, default=480)
+    parser.add_argument('--fps', type=float, default=30.0, help='synthetic camera frame rate')
+    parser.add_argument('--video', help='loop this video file instead of generated patterns')
+    parser.add_argument('--mjpeg', action='store_true', help='synthetic cameras deliver MJPEG like a UVC camera')
+    parser.add_argument('--command-rate', type=float, default=50.0, help='joystick commands per second during a burst')
+    parser.add_argument('--burst', type=float, default=2.0, help='seconds per joystick burst')
+    parser.add_argument('--gap', type=float, default=0.5, help='seconds between joystick bursts')
+    parser.add_argument('--transport', default='http', choices=['http', 'ws'], help='POST /control or /control/ws')
+    parser.add_argument('--poll-interval', type=float, default=1.0, help='seconds between /status and /cameras polls')
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds of measured load')
+    parser.add_argument('--warmup', type=float, default=1.0, help='seconds of streaming before measuring')
+    parser.add_argument('--port', type=int, default=18081)
+    parser.add_argument('--baseline', help='compare against results saved with --save-baseline')
+    parser.add_argument('--save-baseline', help='write this run\'s results to a file')
+    parser.add_argument('--tolerance', type=float, default=10.0, help='percent change treated as a regression')
+    parser.add_argument('--serve', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.port, args.width, args.height, args.fps, args.video, args.mjpeg)
+        return
+
+    results = run_load(args)
+    print(json.dumps(results, indent=2))
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Saved baseline to {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get('config') != results['config']:
+            print("Warning: baseline was recorded with a different configuration")
+        rows, regressed = compare(results, baseline, args.tolerance)
+        print(f"\n{'metric':<28}{'baseline':>12}{'current':>12}{'change':>10}")
+        for path, base, current, change, status in rows:
+            print(f"{path:<28}{base:>12}{current:>12}{change:>+9.1f}%  {status}")
+        if regressed:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""Measure the cost of the /metrics instrumentation
+
+Times the individual instruments (histogram observe, counter increment, a
+timed section), then handles POST /control and encodes synthetic frames
+in-process with GPIO_SERVER_METRICS=1 and =0 and reports the difference.
+Usage:
+
+    python firmware/benchmarks/metrics_overhead.py [--count 20000] [--frames 300]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+from common import load_server
+
+
+def per_call_ns(fn, count):
+    started = time.perf_counter()
+    for _ in range(count):
+        fn()
+    return round((time.perf_counter() - started) * 1e9 / count, 1)
+
+
+def bench_instruments(server, count):
+    histogram = server.Histogram()
+    counter = server.Counter()
+
+    def timed_section():
+        started = time.monotonic()
+        histogram.observe(time.monotonic() - started)
+
+    return {
+        'histogram_observe_ns': per_call_ns(lambda: histogram.observe(0.004), count),
+        'counter_inc_ns': per_call_ns(counter.inc, count),
+        'timed_section_ns': per_call_ns(timed_section, count),
+        'empty_call_ns': per_call_ns(lambda: None, count)
+    }
+
+
+def bench_paths(count, frames):
+    """Runs in a child process so GPIO_SERVER_METRICS is read at import"""
+    import numpy as np
+
+    server = load_server()
+    client = server.app.test_client()
+    for _ in range(200):
+        client.post('/control', json={'forwardReverse': 10, 'leftRight': 0})
+
+    started = time.perf_counter()
+    for i in range(count):
+        client.post('/control', json={'forwardReverse': i % 255, 'leftRight': 0})
+    control_us = (time.perf_counter() - started) * 1e6 / count
+
+    capture = server.CameraCapture('bench')
+    variant = capture.acquire_variant(320, None)
+    frame = np.random.randint(0, 255, (480, 640, 3), np.uint8)
+    started = time.perf_counter()
+    for seq in range(1, frames + 1):
+        variant.encode(seq, time.time(), frame, 80)
+    encode_ms = (time.perf_counter() - started) * 1000 / frames
+
+    server.motor_loop.stop()
+    return {'control_request_us': round(control_us, 2), 'encode_ms': round(encode_ms, 3)}
+
+
+def run_child(enabled, count, frames):
+    env = dict(os.environ, GPIO_SERVER_METRICS='1' if enabled else '0')
+    output = subprocess.run([sys.executable, os.path.abspath(__file__), '--child',
+                             '--count', str(count), '--frames', str(frames)],
+                            env=env, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--count', type=int, default=20000, help='iterations per measurement')
+    parser.add_argument('--frames', type=int, default=300, help='frames to encode per run')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(bench_paths(args.count // 10, args.frames)))
+        return
+
+    server = load_server()
+    results = {'instruments': bench_instruments(server, args.count)}
+    server.motor_loop.stop()
+
+    enabled = run_child(True, args.count, args.frames)
+    disabled = run_child(False, args.count, args.frames)
+    results['metrics_on'] = enabled
+    results['metrics_off'] = disabled
+    results['overhead'] = {
+        'control_request_us': round(enabled['control_request_us'] - disabled['control_request_us'], 2),
+        'encode_ms': round(enabled['encode_ms'] - disabled['encode_ms'], 3)
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""Measure how quickly the GPIO server comes up
+
+Spawns the server the same way `python gpio-server.py` starts it (listener
+first, hardware initialised in the background), then reports, from the
+moment of spawning: time to the first successful /status, time until every
+subsystem reports ready, and time to the first camera frame. Usage:
+
+    python firmware/benchmarks/startup_time.py [--runs 5] [--synthetic]
+
+--synthetic serves a generated camera so time-to-first-frame can be measured
+without hardware; note that it imports OpenCV up front, which the real
+server defers until the first camera request.
+"""
+import argparse
+import http.client
+import json
+import logging
+import os
+import subprocess
+import sys
+import time
+
+from common import load_server
+
+
+def request(port, method, path, timeout=2.0):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=timeout)
+    try:
+        conn.request(method, path)
+        response = conn.getresponse()
+        return response.status, response.read()
+    finally:
+        conn.close()
+
+
+def measure(port, camera, synthetic, timeout=30.0):
+    command = [sys.executable, os.path.abspath(__file__), '--serve', '--port', str(port)]
+    if synthetic:
+        command.append('--synthetic')
+    spawned = time.perf_counter()
+    child = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    result = {}
+    try:
+        deadline = spawned + timeout
+        status = None
+        while time.perf_counter() < deadline:
+            try:
+                code, body = request(port, 'GET', '/status', timeout=0.5)
+                if code == 200:
+                    status = json.loads(body)
+                    break
+            except OSError:
+                time.sleep(0.005)
+        if status is None:
+            raise RuntimeError("Server did not answer /status")
+        result['first_status_s'] = round(time.perf_counter() - spawned, 3)
+
+        while not status['startup']['ready'] and time.perf_counter() < deadline:
+            time.sleep(0.01)
+            status = json.loads(request(port, 'GET', '/status')[1])
+        result['all_ready_s'] = round(time.perf_counter() - spawned, 3) if status['startup']['ready'] else None
+        result['subsystems_s'] = {name: info['seconds'] for name, info in status['startup']['subsystems'].items()}
+
+        if camera is not None:
+            requested = time.perf_counter()
+            code, _ = request(port, 'GET', f'/camera/{camera}/snapshot?fresh=1', timeout=10.0)
+            if code == 200:
+                result['first_frame_s'] = round(time.perf_counter() - spawned, 3)
+                result['first_frame_after_request_s'] = round(time.perf_counter() - requested, 3)
+    finally:
+        child.terminate()
+        child.wait(timeout=10)
+    return result
+
+
+def serve(port, synthetic):
+    """Child process: start like gpio-server.py's __main__ does, on another port"""
+    if synthetic:
+        import synthetic_camera
+        synthetic_camera.install()
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = load_server(start=False)
+    server.startup()
+    server.app.run(host='127.0.0.1', port=port, threaded=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--camera', default='0', help='camera to fetch the first frame from ("" to skip)')
+    parser.add_argument('--synthetic', action='store_true', help='serve a synthetic camera')
+    parser.add_argument('--port', type=int, default=18082)
+    parser.add_argument('--serve', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.port, args.synthetic)
+        return
+
+    runs = [measure(args.port, args.camera or None, args.synthetic) for _ in range(args.runs)]
+    summary = {}
+    for key in ('first_status_s', 'all_ready_s', 'first_frame_s', 'first_frame_after_request_s'):
+        values = sorted(run[key] for run in runs if run.get(key) is not None)
+        if values:
+            summary[key] = {'median': values[len(values) // 2], 'max': values[-1]}
+    print(json.dumps({'runs': runs, 'summary': summary}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
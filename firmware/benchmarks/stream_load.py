@@ -0,0 +1,82 @@
+"""Benchmark control latency under MJPEG stream load on the flask and aiohttp engines
+
+For each engine, starts the GPIO server in a child process with a synthetic
+camera, opens 1, 4 and 16 concurrent stream clients, and measures POST
+/control round-trip latency while they run. Usage:
+
+    python firmware/benchmarks/stream_load.py [--clients 1 4 16] [--engines flask aiohttp]
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+
+from common import StreamReader, percentiles, serve, wait_for_server
+
+
+def measure_control(port, count):
+    conn = http.client.HTTPConnection('127.0.0.1', port)
+    headers = {'Content-Type': 'application/json'}
+    samples = []
+    for i in range(count):
+        time.sleep(random.uniform(0, 0.01))
+        body = json.dumps({'forwardReverse': i % 200, 'leftRight': 0})
+        started = time.perf_counter()
+        conn.request('POST', '/control', body, headers)
+        conn.getresponse().read()
+        samples.append(time.perf_counter() - started)
+    conn.close()
+    return percentiles(samples)
+
+
+def run_engine(engine, port, client_counts, count, warmup):
+    env = dict(os.environ, GPIO_SERVER_ENGINE=engine)
+    child = subprocess.Popen([sys.executable, os.path.abspath(__file__), '--serve', '--port', str(port)],
+                             env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    results = {}
+    try:
+        wait_for_server(port)
+        for clients in client_counts:
+            readers = [StreamReader(port, '/camera/0/stream') for _ in range(clients)]
+            for reader in readers:
+                reader.start()
+            time.sleep(warmup)
+            control = measure_control(port, count)
+            fps = [reader.stop() for reader in readers]
+            results[str(clients)] = {
+                'control_round_trip': control,
+                'stream_fps_min': round(min(fps), 1),
+                'stream_fps_mean': round(sum(fps) / len(fps), 1)
+            }
+    finally:
+        child.terminate()
+        child.wait(timeout=10)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clients', type=int, nargs='+', default=[1, 4, 16], help='stream client counts')
+    parser.add_argument('--engines', nargs='+', default=['flask', 'aiohttp'], help='engines to compare')
+    parser.add_argument('--count', type=int, default=300, help='control requests per measurement')
+    parser.add_argument('--warmup', type=float, default=1.0, help='seconds of streaming before measuring')
+    parser.add_argument('--port', type=int, default=18080)
+    parser.add_argument('--serve', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.port)
+        return
+
+    results = {}
+    for engine in args.engines:
+        results[engine] = run_engine(engine, args.port, args.clients, args.count, args.warmup)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
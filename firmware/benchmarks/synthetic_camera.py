@@ -0,0 +1,195 @@
+"""Synthetic stand-in for cv2.VideoCapture so the server can run without a camera
+
+install() replaces cv2.VideoCapture with a factory producing SyntheticCapture
+objects: either generated test patterns or a looped video file, paced to a
+target frame rate like a real device. With mjpeg=True the source behaves like
+a UVC camera offering MJPG: when the server asks for undecoded frames it gets
+JPEG buffers, as OpenCV's V4L2 backend would return them.
+
+Run as a script, this module is a capture worker (GPIO_SERVER_CAPTURE=process)
+that installs the same synthetic source first; see worker_command().
+"""
+import json
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+_RealVideoCapture = cv2.VideoCapture
+
+
+class SyntheticCapture:
+    """Implements the subset of the cv2.VideoCapture API used by the server"""
+
+    def __init__(self, source=0, width=640, height=480, fps=30.0, video=None, pattern_frames=60, mjpeg=False):
+        self.source = source
+        self.mjpeg = mjpeg
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.video = video
+        self.pattern_frames = pattern_frames
+        self.frames_read = 0
+        self._opened = True
+        self._frames = None
+        self._jpegs = {}
+        self._video = None
+        self._next_frame = 0.0
+        self._props = {}
+
+    # --- cv2.VideoCapture API ---
+
+    def isOpened(self):
+        return self._opened
+
+    def release(self):
+        self._opened = False
+        if self._video is not None:
+            self._video.release()
+            self._video = None
+
+    def getBackendName(self):
+        return "SYNTHETIC"
+
+    def set(self, prop, value):
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            self.width = int(value)
+            self._frames = None
+            self._jpegs = {}
+        elif prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            self.height = int(value)
+            self._frames = None
+            self._jpegs = {}
+        elif prop == cv2.CAP_PROP_FPS and value > 0:
+            self.fps = float(value)
+        self._props[prop] = value
+        return True
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            return float(self.width)
+        if prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            return float(self.height)
+        if prop == cv2.CAP_PROP_FPS:
+            return float(self.fps)
+        return float(self._props.get(prop, 0.0))
+
+    def grab(self):
+        if not self._opened:
+            return False
+        self._wait_for_next_frame()
+        self.frames_read += 1
+        return True
+
+    def retrieve(self, image=None, flag=0):
+        if not self._opened:
+            return False, None
+        if self._raw_mjpeg():
+            return True, self._current_jpeg()
+        frame = self._current_frame()
+        if image is not None and image.shape == frame.shape:
+            np.copyto(image, frame)
+            return True, image
+        return True, frame.copy()
+
+    def read(self, image=None):
+        if not self.grab():
+            return False, None
+        return self.retrieve(image)
+
+    # --- frame generation ---
+
+    def _raw_mjpeg(self):
+        fourcc = int(self._props.get(cv2.CAP_PROP_FOURCC, 0))
+        return (self.mjpeg and fourcc == cv2.VideoWriter_fourcc(*'MJPG')
+                and (self._props.get(cv2.CAP_PROP_CONVERT_RGB, 1) == 0 or self._props.get(cv2.CAP_PROP_FORMAT) == -1))
+
+    def _current_jpeg(self):
+        # Pattern JPEGs are cached like pattern frames; video frames are encoded each time
+        index = self.frames_read % self.pattern_frames
+        jpeg = None if self.video else self._jpegs.get(index)
+        if jpeg is None:
+            _, jpeg = cv2.imencode('.jpg', self._current_frame(), [cv2.IMWRITE_JPEG_QUALITY, 90])
+            jpeg = jpeg.reshape(1, -1)
+            if not self.video:
+                self._jpegs[index] = jpeg
+        return jpeg.copy()
+
+    def _wait_for_next_frame(self):
+        # Pace like a real sensor: frames become available at a fixed rate
+        now = time.monotonic()
+        if self._next_frame > now:
+            time.sleep(self._next_frame - now)
+            now = self._next_frame
+        self._next_frame = max(now, self._next_frame) + 1.0 / self.fps
+
+    def _current_frame(self):
+        if self.video:
+            return self._video_frame()
+        if self._frames is None:
+            self._frames = [self._pattern(i) for i in range(self.pattern_frames)]
+        return self._frames[self.frames_read % len(self._frames)]
+
+    def _pattern(self, index):
+        """A moving bar over a gradient with some noise, so JPEGs are a realistic size"""
+        h, w = self.height, self.width
+        x = np.linspace(0, 255, w, dtype=np.float32)
+        y = np.linspace(0, 255, h, dtype=np.float32)[:, None]
+        frame = np.empty((h, w, 3), dtype=np.uint8)
+        frame[:, :, 0] = (x + index * 4) % 256
+        frame[:, :, 1] = y
+        frame[:, :, 2] = ((x[None, :] + y) / 2).astype(np.uint8)
+        bar = (index * w // self.pattern_frames) % w
+        frame[:, bar:bar + w // 16] = 255
+        rng = np.random.default_rng(index)
+        frame ^= rng.integers(0, 16, size=frame.shape, dtype=np.uint8)
+        cv2.putText(frame, f"SYNTHETIC {self.source}", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 0), 2)
+        return frame
+
+    def _video_frame(self):
+        if self._video is None:
+            self._video = _RealVideoCapture(self.video)
+        ok, frame = self._video.read()
+        if not ok:
+            # Loop back to the start of the file
+            self._video.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ok, frame = self._video.read()
+            if not ok:
+                raise RuntimeError(f"Could not read frames from {self.video}")
+        if frame.shape[1] != self.width or frame.shape[0] != self.height:
+            frame = cv2.resize(frame, (self.width, self.height))
+        return frame
+
+
+def install(width=640, height=480, fps=30.0, video=None, mjpeg=False):
+    """Make cv2.VideoCapture return synthetic sources; returns the list of created captures"""
+    if video and not os.path.exists(video):
+        raise FileNotFoundError(video)
+    created = []
+
+    def factory(source=0, *args, **kwargs):
+        capture = SyntheticCapture(source, width=width, height=height, fps=fps, video=video, mjpeg=mjpeg)
+        created.append(capture)
+        return capture
+
+    cv2.VideoCapture = factory
+    _settings.update(width=width, height=height, fps=fps, video=video, mjpeg=mjpeg)
+    return created
+
+
+_settings = {}
+
+
+def worker_command():
+    """Capture worker command line that sees the same synthetic source as install() set up"""
+    return [sys.executable, os.path.abspath(__file__), json.dumps(_settings), '--capture-worker']
+
+
+if __name__ == '__main__':
+    from common import load_server
+
+    install(**json.loads(sys.argv[1]))
+    server = load_server(start=False)
+    sys.exit(server.run_capture_worker(*sys.argv[3:]))
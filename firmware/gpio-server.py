@@ -1,10 +1,25 @@
 from flask import Flask, request, jsonify, Response, send_file
-import cv2
 import threading
+import array
+import bisect
+import collections
+import itertools
 import time
+import asyncio
+import concurrent.futures
+import contextlib
+import functools
+import importlib
 import io
+import json
+import math
 import os
+import queue
+import select
+import struct
+import subprocess
 import sys
+import urllib.parse
 from flask_cors import CORS
 
 # NeoPixel (WS281x) support
@@ -14,8 +29,552 @@ try:
 except Exception:
     Pi5NeoStrip = None
 
+# WebSocket support for the low-latency control channel
+try:
+    from flask_sock import Sock  # pip install flask-sock
+    from simple_websocket import ConnectionClosed
+except Exception:
+    Sock = None
+
+    class ConnectionClosed(Exception):
+        pass
+
+# Serving engine: 'flask' (threaded development server) or 'aiohttp' (asyncio)
+SERVER_ENGINE = os.environ.get('GPIO_SERVER_ENGINE', 'flask')
+
+# asyncio serving engine (optional; only imported when selected)
+aiohttp_web = None
+if SERVER_ENGINE == 'aiohttp':
+    try:
+        from aiohttp import web as aiohttp_web, WSMsgType  # pip install aiohttp
+    except Exception:
+        aiohttp_web = None
+
+class _LazyModule:
+    """Placeholder that imports a module on first attribute access"""
+
+    def __init__(self, name):
+        self._name = name
+
+    def __getattr__(self, attr):
+        with readiness.starting(self._name):
+            module = importlib.import_module(self._name)
+        # Rebind the global so later lookups skip this proxy
+        globals()[self._name] = module
+        return getattr(module, attr)
+
+# OpenCV takes a while to import on a Pi; it is loaded on the first camera request
+cv2 = _LazyModule('cv2')
+
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
+sock = Sock(app) if Sock is not None else None
+
+# -------------------- Metrics --------------------
+# Hot paths record monotonic durations into fixed-bucket histograms (one
+# bisect and two additions per sample, no locking). Everything is exported in
+# Prometheus text format at /metrics. GPIO_SERVER_METRICS=0 swaps in no-op
+# instruments, e.g. to measure the instrumentation overhead itself.
+METRICS_ENABLED = os.environ.get('GPIO_SERVER_METRICS', '1') != '0'
+METRICS_PREFIX = 'gpio_server_'
+METRICS_LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+                           0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+SYSTEM_SAMPLE_INTERVAL = 2.0  # Seconds between CPU/temperature/throttling samples
+
+class Histogram:
+    """Cumulative fixed-bucket histogram of durations in seconds"""
+
+    def __init__(self, buckets=METRICS_LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+class Counter:
+    """Monotonically increasing count"""
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+class _NullMetric:
+    """Stand-in for every instrument when metrics are disabled"""
+    buckets = ()
+    counts = [0]
+    sum = 0.0
+    count = 0
+    value = 0
+
+    def observe(self, value):
+        pass
+
+    def inc(self, amount=1):
+        pass
+
+_null_metric = _NullMetric()
+
+# name -> (type, help, {label tuple: instrument})
+_metric_families = {}
+_metric_families_lock = threading.Lock()
+
+def _metric(kind, factory, name, help_text, labels):
+    if not METRICS_ENABLED:
+        return _null_metric
+    key = tuple(sorted(labels.items()))
+    with _metric_families_lock:
+        family = _metric_families.setdefault(name, (kind, help_text, {}))
+        instrument = family[2].get(key)
+        if instrument is None:
+            instrument = family[2][key] = factory()
+        return instrument
+
+def metric_histogram(name, help_text, **labels):
+    """Get (creating on first use) the histogram for a name and label set"""
+    return _metric('histogram', Histogram, name, help_text, labels)
+
+def metric_counter(name, help_text, **labels):
+    """Get (creating on first use) the counter for a name and label set"""
+    return _metric('counter', Counter, name, help_text, labels)
+
+def _format_labels(labels, extra=None):
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{key}="{value}"' for (key, _), value in zip(pairs, escaped)) + '}'
+
+def _format_value(value):
+    if isinstance(value, float):
+        return repr(value)
+    return str(int(value))
+
+def render_metrics(gauges=()):
+    """Render all instruments plus (name, help, type, [(labels, value)]) gauges as Prometheus text"""
+    lines = []
+    with _metric_families_lock:
+        families = [(name, kind, help_text, list(series.items()))
+                    for name, (kind, help_text, series) in _metric_families.items()]
+    for name, kind, help_text, series in families:
+        full_name = METRICS_PREFIX + name + ('_total' if kind == 'counter' else '')
+        lines.append(f'# HELP {full_name} {help_text}')
+        lines.append(f'# TYPE {full_name} {kind}')
+        for labels, instrument in series:
+            if kind == 'histogram':
+                cumulative = 0
+                counts = list(instrument.counts)
+                for bound, count in zip(instrument.buckets + (float('inf'),), counts):
+                    cumulative += count
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    lines.append(f'{full_name}_bucket{_format_labels(labels, ("le", le))} {cumulative}')
+                lines.append(f'{full_name}_sum{_format_labels(labels)} {_format_value(float(instrument.sum))}')
+                lines.append(f'{full_name}_count{_format_labels(labels)} {cumulative}')
+            else:
+                lines.append(f'{full_name}{_format_labels(labels)} {_format_value(instrument.value)}')
+    for name, help_text, kind, series in gauges:
+        full_name = METRICS_PREFIX + name + ('_total' if kind == 'counter' else '')
+        lines.append(f'# HELP {full_name} {help_text}')
+        lines.append(f'# TYPE {full_name} {kind}')
+        for labels, value in series:
+            if value is None:
+                continue
+            lines.append(f'{full_name}{_format_labels(sorted(labels.items()))} {_format_value(value)}')
+    return '\n'.join(lines) + '\n'
+
+# Raspberry Pi firmware exposes the vcgencmd get_throttled bits here on recent kernels
+THROTTLED_SYSFS = '/sys/devices/platform/soc/soc:firmware/get_throttled'
+THERMAL_SYSFS = '/sys/class/thermal/thermal_zone0/temp'
+THROTTLE_FLAGS = {
+    'under_voltage': 0,
+    'freq_capped': 1,
+    'throttled': 2,
+    'soft_temp_limit': 3
+}
+
+class SystemMonitor:
+    """Samples CPU load, SoC temperature and throttling state in the background"""
+
+    def __init__(self, interval=SYSTEM_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.cpu_percent = None
+        self.load = None
+        self.temperature = None
+        self.throttled = None
+        self.rss_bytes = None
+        self._cpu_times = None
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="system-monitor", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+
+    def _run(self):
+        while self._running:
+            self.sample()
+            time.sleep(self.interval)
+
+    @staticmethod
+    def _read(path):
+        try:
+            with open(path) as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def sample(self):
+        stat = self._read('/proc/stat')
+        if stat:
+            fields = [int(x) for x in stat.split('\n', 1)[0].split()[1:]]
+            idle, total = fields[3] + (fields[4] if len(fields) > 4 else 0), sum(fields)
+            if self._cpu_times is not None and total > self._cpu_times[1]:
+                busy = (total - self._cpu_times[1]) - (idle - self._cpu_times[0])
+                self.cpu_percent = round(100.0 * busy / (total - self._cpu_times[1]), 1)
+            self._cpu_times = (idle, total)
+
+        loadavg = self._read('/proc/loadavg')
+        if loadavg:
+            self.load = tuple(float(x) for x in loadavg.split()[:3])
+
+        temp = self._read(THERMAL_SYSFS)
+        if temp and temp.strip().lstrip('-').isdigit():
+            self.temperature = int(temp) / 1000.0
+
+        throttled = self._read(THROTTLED_SYSFS)
+        if throttled:
+            try:
+                self.throttled = int(throttled.strip(), 16)
+            except ValueError:
+                pass
+
+        statm = self._read('/proc/self/statm')
+        if statm:
+            self.rss_bytes = int(statm.split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+    def gauges(self):
+        load = self.load or (None, None, None)
+        throttle = []
+        if self.throttled is not None:
+            for flag, bit in THROTTLE_FLAGS.items():
+                throttle.append(({'flag': flag, 'when': 'now'}, (self.throttled >> bit) & 1))
+                throttle.append(({'flag': flag, 'when': 'since_boot'}, (self.throttled >> (bit + 16)) & 1))
+        return [
+            ('cpu_percent', 'System-wide CPU utilisation over the last sample interval', 'gauge',
+             [({}, self.cpu_percent)]),
+            ('load_average', 'System load average', 'gauge',
+             [({'window': '1m'}, load[0]), ({'window': '5m'}, load[1]), ({'window': '15m'}, load[2])]),
+            ('soc_temperature_celsius', 'SoC temperature', 'gauge', [({}, self.temperature)]),
+            ('throttled', 'Firmware throttling flags (1 = active)', 'gauge', throttle),
+            ('process_resident_memory_bytes', 'Resident memory of the server process', 'gauge',
+             [({}, self.rss_bytes)]),
+            ('process_cpu_seconds', 'CPU time used by the server process', 'counter',
+             [({}, round(time.process_time(), 3))])
+        ]
+
+system_monitor = SystemMonitor()
+
+# -------------------- Event trace --------------------
+# What the motors, lights and cameras did is recorded into a preallocated ring
+# of structured events instead of being printed: appending is a counter bump
+# and five list stores, while console output under joystick traffic costs
+# far more and floods the journal. Recent events are served at /debug/trace and
+# a summary of activity goes to the log every TRACE_SUMMARY_INTERVAL seconds.
+TRACE_CAPACITY = 8192            # Events kept (rounded up to a power of two)
+TRACE_SUMMARY_INTERVAL = 30.0    # Seconds between activity summaries in the log
+TRACE_LOG_INTERVAL = 10.0        # Minimum seconds between repeats of the same log message
+
+class EventTrace:
+    """Fixed-size ring buffer of (seq, timestamp, subsystem, target, value) events"""
+
+    def __init__(self, capacity=TRACE_CAPACITY):
+        size = 1
+        while size < capacity:
+            size <<= 1
+        self.capacity = size
+        self._mask = size - 1
+        self._seqs = [0] * size
+        self._times = [0.0] * size
+        self._subsystems = [None] * size
+        self._targets = [None] * size
+        self._values = [None] * size
+        self._counter = itertools.count(1)  # next() is atomic under the GIL
+        self.last_seq = 0
+        self._log_state = {}   # key -> (last printed monotonic time, suppressed count)
+        self._running = False
+        self._thread = None
+
+    def record(self, subsystem, target, value=None):
+        seq = next(self._counter)
+        i = seq & self._mask
+        self._times[i] = time.time()
+        self._subsystems[i] = subsystem
+        self._targets[i] = target
+        self._values[i] = value
+        self._seqs[i] = seq
+        self.last_seq = seq
+
+    def log(self, subsystem, target, message):
+        """Record an event and print it, at most once per TRACE_LOG_INTERVAL for the same message"""
+        self.record(subsystem, target, message)
+        key = (subsystem, target, message)
+        now = time.monotonic()
+        last, suppressed = self._log_state.get(key, (None, 0))
+        if last is not None and now - last < TRACE_LOG_INTERVAL:
+            self._log_state[key] = (last, suppressed + 1)
+            return
+        self._log_state[key] = (now, 0)
+        if len(self._log_state) > 256:
+            self._log_state = {key: self._log_state[key]}
+        print(message + (f" (repeated {suppressed} more times)" if suppressed else ""))
+
+    def events(self, since=0, limit=None, subsystem=None, until=None):
+        """Return recorded events newer than seq `since` (up to `until`), oldest first"""
+        last = self.last_seq if until is None else until
+        first = max(since + 1, last - self.capacity + 1, 1)
+        events = []
+        for seq in range(first, last + 1):
+            i = seq & self._mask
+            event = {
+                'seq': self._seqs[i],
+                'time': self._times[i],
+                'subsystem': self._subsystems[i],
+                'target': self._targets[i],
+                'value': self._values[i]
+            }
+            # Skip slots overwritten while we were reading
+            if event['seq'] != seq:
+                continue
+            if subsystem is not None and event['subsystem'] != subsystem:
+                continue
+            events.append(event)
+        if limit is not None:
+            events = events[-limit:]
+        return events
+
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="trace-summary", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+
+    def _run(self):
+        reported = self.last_seq
+        while self._running:
+            time.sleep(TRACE_SUMMARY_INTERVAL)
+            last = self.last_seq
+            if last == reported:
+                continue
+            counts = collections.Counter(event['subsystem'] for event in self.events(since=reported))
+            lost = (last - reported) - sum(counts.values())
+            summary = ', '.join(f"{name} {count}" for name, count in counts.most_common())
+            print(f"Trace: {last - reported} events in the last {TRACE_SUMMARY_INTERVAL:g}s ({summary}"
+                  + (f", {lost} overwritten" if lost > 0 else "") + ")")
+            reported = last
+
+    def stats(self):
+        return {'capacity': self.capacity, 'recorded': self.last_seq}
+
+trace = EventTrace()
+
+# -------------------- Status snapshot and push events --------------------
+# Subsystems report state changes (lights toggled, camera opened/lost, deadman
+# stop) to the hub as they happen. /status reads the cached snapshot without
+# touching any device or lock, and /events pushes the snapshot plus each change
+# to subscribers over Server-Sent Events, so clients don't need to poll.
+EVENTS_KEEPALIVE = 15.0      # Seconds between pings on an idle /events stream
+EVENTS_QUEUE_DEPTH = 64      # Events buffered per subscriber before the oldest is dropped
+
+class EventSubscriber:
+    """Bounded queue of (id, event, data) tuples for one /events client"""
+
+    def __init__(self, depth=EVENTS_QUEUE_DEPTH):
+        self._queue = collections.deque(maxlen=depth)
+        self._cond = threading.Condition()
+        self.dropped = 0
+        # Optional callback run after each push (used to wake async streams)
+        self.listener = None
+
+    def push(self, item):
+        with self._cond:
+            if len(self._queue) == self._queue.maxlen:
+                self.dropped += 1
+            self._queue.append(item)
+            self._cond.notify()
+        if self.listener is not None:
+            self.listener()
+
+    def poll(self):
+        with self._cond:
+            return self._queue.popleft() if self._queue else None
+
+    def take(self, timeout=None):
+        with self._cond:
+            if not self._queue:
+                self._cond.wait(timeout)
+            return self._queue.popleft() if self._queue else None
+
+class StatusHub:
+    """Cached status snapshot maintained by the subsystems, fanned out to /events subscribers"""
+
+    def __init__(self):
+        # Replaced wholesale on every change, so readers never need the lock
+        self.snapshot = {'cameras': {}, 'lights': False, 'deadman_active': False}
+        self.subscribers = set()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def update(self, key, value, event=None, **data):
+        """Set one snapshot field; publishes `event` only if the value changed"""
+        with self._lock:
+            if self.snapshot.get(key) == value:
+                return
+            self.snapshot = dict(self.snapshot, **{key: value})
+        if event is not None:
+            self.publish(event, **data)
+
+    def set_camera(self, camera_id, is_open, state):
+        """Record a camera as open or not; `state` names the transition for subscribers"""
+        with self._lock:
+            if self.snapshot['cameras'].get(camera_id) == is_open:
+                return
+            self.snapshot = dict(self.snapshot, cameras=dict(self.snapshot['cameras'], **{camera_id: is_open}))
+        self.publish('camera', camera_id=camera_id, state=state, is_open=is_open)
+
+    def publish(self, event, **data):
+        item = (next(self._ids), event, data)
+        with self._lock:
+            subscribers = list(self.subscribers)
+        for subscriber in subscribers:
+            subscriber.push(item)
+
+    def subscribe(self):
+        subscriber = EventSubscriber()
+        with self._lock:
+            self.subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self.subscribers.discard(subscriber)
+
+status_hub = StatusHub()
+
+def format_sse(event, data, event_id=None):
+    """Encode one Server-Sent Events message"""
+    message = f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+    return f"id: {event_id}\n{message}" if event_id is not None else message
+
+# -------------------- Startup --------------------
+# Importing this module doesn't touch hardware. startup() brings GPIO, the
+# lights and the background monitors up on a worker thread while the HTTP
+# listener binds, so /status answers immediately and reports each subsystem's
+# readiness. OpenCV and the cameras are only loaded on first use.
+
+def _seconds_since_exec():
+    """Time since the process was started, so timings include interpreter start-up"""
+    try:
+        with open('/proc/self/stat') as f:
+            start_ticks = int(f.read().rsplit(')', 1)[1].split()[19])
+        with open('/proc/uptime') as f:
+            uptime = float(f.read().split()[0])
+        return max(0.0, uptime - start_ticks / os.sysconf('SC_CLK_TCK'))
+    except (OSError, ValueError, IndexError):
+        return 0.0
+
+PROCESS_STARTED = time.monotonic() - _seconds_since_exec()
+
+class Readiness:
+    """Start-up state of each subsystem and timings of start-up milestones"""
+
+    def __init__(self):
+        self.subsystems = {}   # name -> {'state', 'seconds', 'error'}
+        self.milestones = {}   # name -> seconds since process start
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def starting(self, name):
+        """Track one subsystem's initialisation; failures are recorded and re-raised"""
+        self.subsystems[name] = {'state': 'starting', 'seconds': None, 'error': None}
+        started = time.monotonic()
+        try:
+            yield
+        except Exception as e:
+            self.subsystems[name] = {'state': 'failed', 'seconds': round(time.monotonic() - started, 3),
+                                     'error': str(e)}
+            print(f"Startup: {name} failed: {e}")
+            status_hub.publish('startup', subsystem=name, state='failed', error=str(e))
+            raise
+        self.subsystems[name] = {'state': 'ready', 'seconds': round(time.monotonic() - started, 3),
+                                 'error': None}
+        print(f"Startup: {name} ready in {time.monotonic() - started:.3f}s")
+        status_hub.publish('startup', subsystem=name, state='ready')
+
+    def is_ready(self, name):
+        return self.subsystems.get(name, {}).get('state') == 'ready'
+
+    def milestone(self, name):
+        """Record the first time something happens; returns seconds since process start"""
+        if name in self.milestones:
+            return self.milestones[name]
+        with self._lock:
+            if name not in self.milestones:
+                self.milestones[name] = round(time.monotonic() - PROCESS_STARTED, 3)
+                print(f"Startup: {name.replace('_', ' ')} {self.milestones[name]:.3f}s after process start")
+        return self.milestones[name]
+
+    def stats(self):
+        return {
+            'ready': bool(self.subsystems) and all(info['state'] == 'ready' for info in self.subsystems.values()),
+            'subsystems': dict(self.subsystems),
+            'milestones': dict(self.milestones)
+        }
+
+readiness = Readiness()
+
+def _init_subsystems():
+    try:
+        with readiness.starting('gpio'):
+            init_gpio()
+        with readiness.starting('motor_loop'):
+            motor_loop.start()
+    except Exception:
+        pass  # Recorded in readiness; the rest can still come up
+
+    for name, init in (('trace', trace.start),
+                       ('lights', init_lights),
+                       ('camera_inventory', camera_inventory.start),
+                       ('system_monitor', system_monitor.start if METRICS_ENABLED else None)):
+        if init is None:
+            continue
+        try:
+            with readiness.starting(name):
+                init()
+        except Exception:
+            pass
+
+def startup(wait=False):
+    """Initialise hardware and background services on a worker thread"""
+    thread = threading.Thread(target=_init_subsystems, name="startup", daemon=True)
+    thread.start()
+    if wait:
+        thread.join()
+    return thread
 
 # Motor pin definitions (BCM numbering for RaspberryPi by default)
 # Motor A (Left)
@@ -43,12 +602,12 @@ ODROID_MOTOR_B_IN2 = 24  # Direction pin 2
 
 # Motor pin definitions (BCM numbering for Raspberry Pi by default)
 # Motor A (Left)
-MOTOR_A_EN = RPI_MOTOR_A_EN  # Enable pin
+MOTOR_A_EN = int(os.environ.get('GPIO_SERVER_MOTOR_A_EN', RPI_MOTOR_A_EN))  # Enable pin
 MOTOR_A_IN1 = RPI_MOTOR_A_IN1  # Direction pin 1
 MOTOR_A_IN2 = RPI_MOTOR_A_IN2  # Direction pin 2
 
 # Motor B (Right)
-MOTOR_B_EN = RPI_MOTOR_B_EN  # Enable pin
+MOTOR_B_EN = int(os.environ.get('GPIO_SERVER_MOTOR_B_EN', RPI_MOTOR_B_EN))  # Enable pin
 MOTOR_B_IN1 = RPI_MOTOR_B_IN1  # Direction pin 1
 MOTOR_B_IN2 = RPI_MOTOR_B_IN2  # Direction pin 2
 
@@ -67,6 +626,43 @@ NEO_SPI_DEV = '/dev/spidev0.0'
 NEO_SPI_SPEED_KHZ = 800
 
 
+# GPIO backend: 'auto' detects the board; 'gpiod' forces the libgpiod backend
+# (e.g. on a Pi 5, or against the kernel's gpio-sim module for testing);
+# 'simulation' never touches real pins or LEDs, even on a Pi (benchmarks)
+GPIO_BACKEND = os.environ.get('GPIO_SERVER_BACKEND', 'auto')
+
+def _simulated_gpio():
+    """A stand-in for RPi.GPIO whose writes only reach the trace"""
+    from types import ModuleType
+    SimGPIO = ModuleType('SimGPIO')
+    SimGPIO.BCM = "BCM"
+    SimGPIO.OUT = "OUT"
+    SimGPIO.IN = "IN"
+    SimGPIO.HIGH = 1
+    SimGPIO.LOW = 0
+    SimGPIO.setmode = lambda mode: print(f"GPIO setmode: {mode}")
+    SimGPIO.setup = lambda pin, mode: print(f"GPIO setup: pin {pin}, mode {mode}")
+    SimGPIO.output = lambda pin, value: None  # Writes are traced by MotorDriver
+    SimGPIO.cleanup = lambda: print("GPIO cleanup called")
+
+    class SimPWM:
+        def __init__(self, pin, freq):
+            self.pin = pin
+            self.freq = freq
+            print(f"PWM initialized: pin {pin}, freq {freq}")
+
+        def start(self, duty):
+            print(f"PWM start: pin {self.pin}, duty {duty}")
+
+        def ChangeDutyCycle(self, duty):
+            pass  # Traced by MotorDriver
+
+        def stop(self):
+            print(f"PWM stop: pin {self.pin}")
+
+    SimGPIO.PWM = SimPWM
+    return SimGPIO
+
 # Detect platform and initialize GPIO library accordingly
 def detect_platform():
     """Detect which platform we're running on and return appropriate GPIO module"""
@@ -74,6 +670,19 @@ def detect_platform():
         "name": None,
         "gpio_module": None
     }
+
+    if GPIO_BACKEND == 'simulation':
+        platform_info["name"] = "simulation"
+        platform_info["gpio_module"] = _simulated_gpio()
+        print("Using simulated GPIO (GPIO_SERVER_BACKEND=simulation)")
+        return platform_info
+
+    if GPIO_BACKEND == 'gpiod':
+        import gpiod
+        platform_info["name"] = "generic_linux"
+        platform_info["gpio_module"] = gpiod
+        print("Using libgpiod backend (GPIO_SERVER_BACKEND=gpiod)")
+        return platform_info
     
     # Try to identify platform
     try:
@@ -101,7 +710,7 @@ def detect_platform():
                         print("Couldn't load GPIO library for Odroid")
     except:
         # Fallback detection methods
-        if os.path.exists('/sys/class/gpio'):
+        if os.path.exists('/sys/class/gpio') or any(d.startswith('gpiochip') for d in os.listdir('/dev')):
             # Generic Linux with GPIO
             try:
                 import gpiod
@@ -119,143 +728,169 @@ def detect_platform():
         else:
             print("WARNING: No GPIO system detected, running in simulation mode")
             # Create a GPIO simulator for testing on non-GPIO systems
-            from types import ModuleType
-            SimGPIO = ModuleType('SimGPIO')
-            SimGPIO.BCM = "BCM"
-            SimGPIO.OUT = "OUT"
-            SimGPIO.IN = "IN"
-            SimGPIO.HIGH = 1
-            SimGPIO.LOW = 0
-            SimGPIO.setmode = lambda mode: print(f"GPIO setmode: {mode}")
-            SimGPIO.setup = lambda pin, mode: print(f"GPIO setup: pin {pin}, mode {mode}")
-            SimGPIO.output = lambda pin, value: print(f"GPIO output: pin {pin}, value {value}")
-            SimGPIO.cleanup = lambda: print("GPIO cleanup called")
-            
-            class SimPWM:
-                def __init__(self, pin, freq):
-                    self.pin = pin
-                    self.freq = freq
-                    print(f"PWM initialized: pin {pin}, freq {freq}")
-                
-                def start(self, duty):
-                    print(f"PWM start: pin {self.pin}, duty {duty}")
-                
-                def ChangeDutyCycle(self, duty):
-                    print(f"PWM duty cycle change: pin {self.pin}, duty {duty}")
-                
-                def stop(self):
-                    print(f"PWM stop: pin {self.pin}")
-            
-            SimGPIO.PWM = SimPWM
             platform_info["name"] = "simulation"
-            platform_info["gpio_module"] = SimGPIO
+            platform_info["gpio_module"] = _simulated_gpio()
             
     return platform_info
 
-# Initialize GPIO based on detected platform
-platform = detect_platform()
-GPIO = platform["gpio_module"]
-platform_name = platform["name"]
+# -------------------- libgpiod backend --------------------
+# On generic Linux boards the motor direction pins are requested from the GPIO
+# character device as one line set, so a command for both motors is a single
+# bulk set-values ioctl. Enable pins use hardware PWM through
+# /sys/class/pwm, which needs both on their own PWM channel. Without it the
+# enable pins could only be switched on/off, turning any joystick movement
+# into full speed, so the motors are not started unless the operator opts
+# in with GPIO_SERVER_ONOFF_MOTORS=1 (both tracks then run on/off).
+GPIOD_CHIP = os.environ.get('GPIO_SERVER_GPIOCHIP', '/dev/gpiochip0')
+PWM_CHIP = os.environ.get('GPIO_SERVER_PWMCHIP', '/sys/class/pwm/pwmchip0')
+PWM_FREQUENCY = 1000  # Hz, as used by the RPi.GPIO software PWM
+MOTOR_ONOFF_ALLOWED = os.environ.get('GPIO_SERVER_ONOFF_MOTORS', '0') == '1'
 
-# Configure GPIO based on platform
-if platform_name == "raspberry_pi":
-    print("Setting up GPIO for RaspberryPI hardware")
-    GPIO.setmode(GPIO.BCM)
-    
-    # Set up GPIO pins
-    GPIO.setup(MOTOR_A_EN, GPIO.OUT)
-    GPIO.setup(MOTOR_A_IN1, GPIO.OUT)
-    GPIO.setup(MOTOR_A_IN2, GPIO.OUT)
-    GPIO.setup(MOTOR_B_EN, GPIO.OUT)
-    GPIO.setup(MOTOR_B_IN1, GPIO.OUT)
-    GPIO.setup(MOTOR_B_IN2, GPIO.OUT)
-
-    # Set up PWM
-    pwm_a = GPIO.PWM(MOTOR_A_EN, 1000)  # 1000 Hz frequency
-    pwm_b = GPIO.PWM(MOTOR_B_EN, 1000)  # 1000 Hz frequency
-
-    # Start PWM with 0% duty cycle
-    pwm_a.start(0)
-    pwm_b.start(0)
-    
-elif platform_name == "odroid":
-    print("Setting up GPIO for Odroid hardware")
-    # Motor pin definitions (BCM numbering for ODROID by default)
-    # Motor A (Left)
-    MOTOR_A_EN = ODROID_MOTOR_A_EN  # Enable pin
-    MOTOR_A_IN1 = ODROID_MOTOR_A_IN1  # Direction pin 1
-    MOTOR_A_IN2 = ODROID_MOTOR_A_IN2  # Direction pin 2
-
-    # Motor B (Right)
-    MOTOR_B_EN = ODROID_MOTOR_B_EN  # Enable pin
-    MOTOR_B_IN1 = ODROID_MOTOR_B_IN1  # Direction pin 1
-    MOTOR_B_IN2 = ODROID_MOTOR_B_IN2  # Direction pin 2
-
-    # WiringPi setup for Odroid
-    GPIO.wiringPiSetupGpio()  # Use GPIO numbering
-    
-    # Set up GPIO pins
-    GPIO.pinMode(MOTOR_A_EN, GPIO.OUTPUT)
-    GPIO.pinMode(MOTOR_A_IN1, GPIO.OUTPUT)
-    GPIO.pinMode(MOTOR_A_IN2, GPIO.OUTPUT)
-    GPIO.pinMode(MOTOR_B_EN, GPIO.OUTPUT)
-    GPIO.pinMode(MOTOR_B_IN1, GPIO.OUTPUT)
-    GPIO.pinMode(MOTOR_B_IN2, GPIO.OUTPUT)
-
-    # Set up PWM 
-    # WiringPi has a different PWM interface
-    pwm_a = GPIO
-    pwm_b = GPIO
-    
-    # Start PWM with 0% duty cycle
-    GPIO.softPwmCreate(MOTOR_A_EN, 0, 100)
-    GPIO.softPwmCreate(MOTOR_B_EN, 0, 100)
-
-# elif platform_name == "odroid" and "pyA20" in str(GPIO.__module__):
-#     # pyA20 setup for Odroid
-#     # You may need to map BCM pins to Odroid pins
-#     GPIO.init()
-    
-#     # Set up GPIO pins  
-#     GPIO.setcfg(MOTOR_A_EN, GPIO.OUTPUT)
-#     GPIO.setcfg(MOTOR_A_IN1, GPIO.OUTPUT)
-#     GPIO.setcfg(MOTOR_A_IN2, GPIO.OUTPUT)
-#     GPIO.setcfg(MOTOR_B_EN, GPIO.OUTPUT)
-#     GPIO.setcfg(MOTOR_B_IN1, GPIO.OUTPUT)
-#     GPIO.setcfg(MOTOR_B_IN2, GPIO.OUTPUT)
-
-#     # Create PWM wrapper classes to maintain compatible interface
-#     class PyA20PWM:
-#         def __init__(self, pin, freq):
-#             self.pin = pin
-            
-#         def start(self, duty):
-#             self.ChangeDutyCycle(duty)
-            
-#         def ChangeDutyCycle(self, duty):
-#             # PyA20 doesn't have built-in PWM, simulating with rapid GPIO toggles
-#             # In a real implementation, consider using hardware PWM or more efficient software PWM
-#             if duty > 0:
-#                 GPIO.output(self.pin, GPIO.HIGH)
-#             else:
-#                 GPIO.output(self.pin, GPIO.LOW)
-                
-#         def stop(self):
-#             GPIO.output(self.pin, GPIO.LOW)
-            
-#     pwm_a = PyA20PWM(MOTOR_A_EN, 1000)
-#     pwm_b = PyA20PWM(MOTOR_B_EN, 1000) 
-    
-#     pwm_a.start(0)
-#     pwm_b.start(0)
-else:
-    print("Setting up GPIO for fallback simulation mode")
-    # Simulation or fallback mode
-    if hasattr(GPIO, 'setmode'):
+def _parse_pwm_channels(spec):
+    """Parse 'pin:channel,pin:channel' into {pin: channel}"""
+    channels = {}
+    for item in spec.split(','):
+        if item.strip():
+            pin, channel = item.split(':')
+            channels[int(pin)] = int(channel)
+    return channels
+
+# Enable pin (line offset) -> pwmchip channel. The default is the Raspberry
+# Pi 4 mapping with the pwm-2chan overlay (Pi 5 boards expose these on a
+# different chip); GPIO_SERVER_PWM_CHANNELS overrides it for other wiring
+HARDWARE_PWM_CHANNELS = _parse_pwm_channels(os.environ.get('GPIO_SERVER_PWM_CHANNELS', '12:0,18:0,13:1,19:1'))
+
+gpiod_lines = None
+
+class GpiodLines:
+    """A set of output lines requested together through libgpiod v2"""
+
+    def __init__(self, chip_path, offsets, consumer="gpio-server"):
+        import gpiod
+        from gpiod.line import Direction, Value
+
+        if not hasattr(gpiod, 'request_lines'):
+            raise RuntimeError("libgpiod v2 Python bindings are required (pip install gpiod)")
+        self.offsets = tuple(offsets)
+        self._values = {0: Value.INACTIVE, 1: Value.ACTIVE}
+        self._request = gpiod.request_lines(chip_path, consumer=consumer, config={
+            self.offsets: gpiod.LineSettings(direction=Direction.OUTPUT, output_value=Value.INACTIVE)
+        })
+
+    def set_value(self, offset, value):
+        self._request.set_value(offset, self._values[1 if value else 0])
+
+    def set_values(self, levels):
+        """Write several lines with one ioctl"""
+        values = self._values
+        self._request.set_values({offset: values[1 if value else 0] for offset, value in levels.items()})
+
+    def release(self):
+        self._request.release()
+
+class SysfsPwm:
+    """Hardware PWM channel under /sys/class/pwm with the RPi.GPIO PWM interface"""
+
+    def __init__(self, chip, channel, frequency=PWM_FREQUENCY):
+        self.path = os.path.join(chip, f'pwm{channel}')
+        if not os.path.isdir(self.path):
+            self._write(os.path.join(chip, 'export'), channel)
+            # udev needs a moment to make the new channel's attributes writable
+            deadline = time.monotonic() + 1.0
+            while not os.access(os.path.join(self.path, 'enable'), os.W_OK) and time.monotonic() < deadline:
+                time.sleep(0.01)
+        self.period = int(1e9 / frequency)
+        self._write(os.path.join(self.path, 'duty_cycle'), 0)
+        self._write(os.path.join(self.path, 'period'), self.period)
+        # Duty changes are the hot path: keep the attribute open and pwrite() it
+        self._duty_fd = os.open(os.path.join(self.path, 'duty_cycle'), os.O_WRONLY)
+
+    @staticmethod
+    def _write(path, value):
+        with open(path, 'w') as f:
+            f.write(str(value))
+
+    def start(self, duty):
+        self.ChangeDutyCycle(duty)
+        self._write(os.path.join(self.path, 'enable'), 1)
+
+    def ChangeDutyCycle(self, duty):
+        os.pwrite(self._duty_fd, str(self.period * duty // 100).encode(), 0)
+
+    def stop(self):
+        if self._duty_fd is None:
+            return
+        self.ChangeDutyCycle(0)
+        self._write(os.path.join(self.path, 'enable'), 0)
+        os.close(self._duty_fd)
+        self._duty_fd = None
+
+def _open_hardware_pwm(pin):
+    """Return a started SysfsPwm for an enable pin, or None if it has no usable channel"""
+    channel = HARDWARE_PWM_CHANNELS.get(pin)
+    if channel is None or not os.path.isdir(PWM_CHIP):
+        return None
+    try:
+        pwm = SysfsPwm(PWM_CHIP, channel)
+        pwm.start(0)
+        return pwm
+    except OSError as e:
+        print(f"Hardware PWM for pin {pin} unavailable: {e}")
+        return None
+
+def _open_motor_pwms():
+    """Return (pwm_a, pwm_b) for the enable pins, or raise unless both get their own channel
+
+    With GPIO_SERVER_ONOFF_MOTORS=1 a missing channel gives (None, None)
+    instead: a track left on on/off control would run flat out while the
+    other follows the joystick, so if either track can't have PWM neither
+    uses it.
+    """
+    channel_a = HARDWARE_PWM_CHANNELS.get(MOTOR_A_EN)
+    channel_b = HARDWARE_PWM_CHANNELS.get(MOTOR_B_EN)
+    if channel_a is None or channel_b is None or channel_a == channel_b:
+        problem = (f"enable pins {MOTOR_A_EN} and {MOTOR_B_EN} need separate hardware PWM channels "
+                   f"(GPIO_SERVER_PWM_CHANNELS is {HARDWARE_PWM_CHANNELS})")
+    else:
+        pwm_a = _open_hardware_pwm(MOTOR_A_EN)
+        pwm_b = _open_hardware_pwm(MOTOR_B_EN)
+        if pwm_a is not None and pwm_b is not None:
+            return pwm_a, pwm_b
+        for pwm in (pwm_a, pwm_b):
+            if pwm is not None:
+                pwm.stop()
+        missing = MOTOR_A_EN if pwm_a is None else MOTOR_B_EN
+        problem = f"hardware PWM on {PWM_CHIP} is unavailable for enable pin {missing}"
+    if not MOTOR_ONOFF_ALLOWED:
+        raise RuntimeError(f"No motor speed control: {problem}. Move the enable pins to PWM pins (see README), "
+                           "or set GPIO_SERVER_ONOFF_MOTORS=1 to drive both tracks at full speed or stopped")
+    print(f"WARNING: {problem}; GPIO_SERVER_ONOFF_MOTORS=1, so both tracks run at full speed or stopped")
+    return None, None
+
+# Filled in by init_gpio() during startup
+GPIO = None
+platform_name = None
+
+# PWM handles for the enable pins (left as None if the platform has no PWM)
+pwm_a = None
+pwm_b = None
+
+def init_gpio():
+    """Detect the platform, configure the motor pins and bind the motor driver"""
+    global GPIO, platform_name, pwm_a, pwm_b, gpiod_lines
+    global MOTOR_A_EN, MOTOR_A_IN1, MOTOR_A_IN2, MOTOR_B_EN, MOTOR_B_IN1, MOTOR_B_IN2
+    global gpio_output, pwm_set_duty
+
+    platform = detect_platform()
+    GPIO = platform["gpio_module"]
+    platform_name = platform["name"]
+
+    # Configure GPIO based on platform
+    if platform_name == "raspberry_pi":
+        print("Setting up GPIO for RaspberryPI hardware")
         GPIO.setmode(GPIO.BCM)
-        
-    # Set up GPIO pins as in Raspberry Pi setup
-    if hasattr(GPIO, 'setup'):
+    
+        # Set up GPIO pins
         GPIO.setup(MOTOR_A_EN, GPIO.OUT)
         GPIO.setup(MOTOR_A_IN1, GPIO.OUT)
         GPIO.setup(MOTOR_A_IN2, GPIO.OUT)
@@ -263,21 +898,128 @@ else:
         GPIO.setup(MOTOR_B_IN1, GPIO.OUT)
         GPIO.setup(MOTOR_B_IN2, GPIO.OUT)
 
-    # Set up PWM
-    if hasattr(GPIO, 'PWM'):
+        # Set up PWM
         pwm_a = GPIO.PWM(MOTOR_A_EN, 1000)  # 1000 Hz frequency
         pwm_b = GPIO.PWM(MOTOR_B_EN, 1000)  # 1000 Hz frequency
 
         # Start PWM with 0% duty cycle
         pwm_a.start(0)
         pwm_b.start(0)
+    
+    elif platform_name == "odroid":
+        print("Setting up GPIO for Odroid hardware")
+        # Motor pin definitions (BCM numbering for ODROID by default)
+        # Motor A (Left)
+        MOTOR_A_EN = ODROID_MOTOR_A_EN  # Enable pin
+        MOTOR_A_IN1 = ODROID_MOTOR_A_IN1  # Direction pin 1
+        MOTOR_A_IN2 = ODROID_MOTOR_A_IN2  # Direction pin 2
+
+        # Motor B (Right)
+        MOTOR_B_EN = ODROID_MOTOR_B_EN  # Enable pin
+        MOTOR_B_IN1 = ODROID_MOTOR_B_IN1  # Direction pin 1
+        MOTOR_B_IN2 = ODROID_MOTOR_B_IN2  # Direction pin 2
+
+        # WiringPi setup for Odroid
+        GPIO.wiringPiSetupGpio()  # Use GPIO numbering
+    
+        # Set up GPIO pins
+        GPIO.pinMode(MOTOR_A_EN, GPIO.OUTPUT)
+        GPIO.pinMode(MOTOR_A_IN1, GPIO.OUTPUT)
+        GPIO.pinMode(MOTOR_A_IN2, GPIO.OUTPUT)
+        GPIO.pinMode(MOTOR_B_EN, GPIO.OUTPUT)
+        GPIO.pinMode(MOTOR_B_IN1, GPIO.OUTPUT)
+        GPIO.pinMode(MOTOR_B_IN2, GPIO.OUTPUT)
+
+        # Set up PWM 
+        # WiringPi has a different PWM interface
+        pwm_a = GPIO
+        pwm_b = GPIO
+    
+        # Start PWM with 0% duty cycle
+        GPIO.softPwmCreate(MOTOR_A_EN, 0, 100)
+        GPIO.softPwmCreate(MOTOR_B_EN, 0, 100)
+
+    # elif platform_name == "odroid" and "pyA20" in str(GPIO.__module__):
+    #     # pyA20 setup for Odroid
+    #     # You may need to map BCM pins to Odroid pins
+    #     GPIO.init()
+    
+    #     # Set up GPIO pins  
+    #     GPIO.setcfg(MOTOR_A_EN, GPIO.OUTPUT)
+    #     GPIO.setcfg(MOTOR_A_IN1, GPIO.OUTPUT)
+    #     GPIO.setcfg(MOTOR_A_IN2, GPIO.OUTPUT)
+    #     GPIO.setcfg(MOTOR_B_EN, GPIO.OUTPUT)
+    #     GPIO.setcfg(MOTOR_B_IN1, GPIO.OUTPUT)
+    #     GPIO.setcfg(MOTOR_B_IN2, GPIO.OUTPUT)
+
+    #     # Create PWM wrapper classes to maintain compatible interface
+    #     class PyA20PWM:
+    #         def __init__(self, pin, freq):
+    #             self.pin = pin
+            
+    #         def start(self, duty):
+    #             self.ChangeDutyCycle(duty)
+            
+    #         def ChangeDutyCycle(self, duty):
+    #             # PyA20 doesn't have built-in PWM, simulating with rapid GPIO toggles
+    #             # In a real implementation, consider using hardware PWM or more efficient software PWM
+    #             if duty > 0:
+    #                 GPIO.output(self.pin, GPIO.HIGH)
+    #             else:
+    #                 GPIO.output(self.pin, GPIO.LOW)
+                
+    #         def stop(self):
+    #             GPIO.output(self.pin, GPIO.LOW)
+            
+    #     pwm_a = PyA20PWM(MOTOR_A_EN, 1000)
+    #     pwm_b = PyA20PWM(MOTOR_B_EN, 1000) 
+    
+    #     pwm_a.start(0)
+    #     pwm_b.start(0)
+    elif platform_name == "generic_linux":
+        print(f"Setting up GPIO for generic Linux (libgpiod on {GPIOD_CHIP})")
+        pwm_a, pwm_b = _open_motor_pwms()
+        lines = [MOTOR_A_IN1, MOTOR_A_IN2, MOTOR_B_IN1, MOTOR_B_IN2]
+        if pwm_a is None:
+            # Opted in to on/off: the motors run at full speed or not at all
+            lines += [MOTOR_A_EN, MOTOR_B_EN]
+        gpiod_lines = GpiodLines(GPIOD_CHIP, lines)
+    else:
+        print("Setting up GPIO for fallback simulation mode")
+        # Simulation or fallback mode
+        if hasattr(GPIO, 'setmode'):
+            GPIO.setmode(GPIO.BCM)
+        
+        # Set up GPIO pins as in Raspberry Pi setup
+        if hasattr(GPIO, 'setup'):
+            GPIO.setup(MOTOR_A_EN, GPIO.OUT)
+            GPIO.setup(MOTOR_A_IN1, GPIO.OUT)
+            GPIO.setup(MOTOR_A_IN2, GPIO.OUT)
+            GPIO.setup(MOTOR_B_EN, GPIO.OUT)
+            GPIO.setup(MOTOR_B_IN1, GPIO.OUT)
+            GPIO.setup(MOTOR_B_IN2, GPIO.OUT)
+
+        # Set up PWM
+        if hasattr(GPIO, 'PWM'):
+            pwm_a = GPIO.PWM(MOTOR_A_EN, 1000)  # 1000 Hz frequency
+            pwm_b = GPIO.PWM(MOTOR_B_EN, 1000)  # 1000 Hz frequency
 
+            # Start PWM with 0% duty cycle
+            pwm_a.start(0)
+            pwm_b.start(0)
+
+    gpio_output, pwm_set_duty, write_pins = _gpio_writers(platform_name)
+    motor_driver.bind(gpio_output, pwm_set_duty, getattr(GPIO, 'HIGH', 1), getattr(GPIO, 'LOW', 0), write_pins)
 
 
 strip = None
 lights_on = False
 _lights_lock = threading.Lock()
 
+LIGHTS_FPS = 30               # Frame rate of the light engine while animating
+LED_GAMMA = 2.2               # Perceptual correction applied through the brightness table
+LIGHTS_WARM_WHITE = (255, 200, 120)
+
 class DummyStrip:
     def __init__(self, n, brightness=1.0):
         self._n = n
@@ -288,53 +1030,225 @@ class DummyStrip:
         self._data = [rgb] * self._n
     def set_pixel(self, i, rgb):
         self._data[i] = rgb
-        print(f"Sim LED {i} -> {rgb}")
+        trace.record('led', i, rgb)
     def show(self):
-        print(f"Sim LEDs: {self._data}")
+        trace.record('led', 'show')
     def set_brightness(self, b):
         self._brightness = b
 
-def _apply_brightness(rgb):
-    scale = max(0.0, min(1.0, LED_BRIGHTNESS / 255.0))
-    r, g, b = rgb
-    return (int(r * scale), int(g * scale), int(b * scale))
+def _strip_writer(strip):
+    """Return write(frame) pushing an RGB byte frame to a strip, picking the strip's API once"""
+    if hasattr(strip, 'set_led_color') and hasattr(strip, 'update_strip'):
+        # Pi5Neo: set the buffer, then one SPI transfer. update_strip() sleeps
+        # afterwards by default, which would stall the engine's frame clock;
+        # the WS2812 latch only needs ~300us of idle line.
+        update = strip.update_strip
+        try:
+            import inspect
+            if 'sleep_duration' in inspect.signature(update).parameters:
+                update = functools.partial(update, sleep_duration=0.001)
+        except (TypeError, ValueError):
+            pass
+
+        def write(frame):
+            for i in range(len(frame) // 3):
+                strip.set_led_color(i, frame[3 * i], frame[3 * i + 1], frame[3 * i + 2])
+            update()
+        return write
 
-def _strip_show():
-    try:
-        if strip is None:
+    set_pixel = getattr(strip, 'set_pixel', None) or getattr(strip, 'setPixelColor')
+    show = getattr(strip, 'show', None) or getattr(strip, 'write')
+
+    def write(frame):
+        for i in range(len(frame) // 3):
+            set_pixel(i, (frame[3 * i], frame[3 * i + 1], frame[3 * i + 2]))
+        show()
+    return write
+
+class LightEngine:
+    """Per-pixel framebuffer for the NeoPixels, rendered to the strip by one thread
+
+    Each pixel holds a colour and a brightness (0-255). Output goes through a
+    256-entry brightness/gamma table, and a frame identical to the last one sent
+    is not written, so the SPI bus only sees actual changes. Fades and effects
+    advance at LIGHTS_FPS; with nothing animating the thread sleeps until the
+    next change.
+    """
+
+    EFFECTS = ('none', 'breathe')
+
+    def __init__(self, count=LED_COUNT, brightness=LED_BRIGHTNESS, gamma=LED_GAMMA, fps=LIGHTS_FPS):
+        self.count = count
+        self.fps = fps
+        self.gamma = gamma
+        self.brightness = brightness
+        self.effect = 'none'
+        self.effect_period = 2.0
+        self.frames = 0            # Frames written to the strip
+        self.skipped = 0           # Frames not written because nothing changed
+        self.errors = 0
+        # r, g, b, brightness per pixel: where a fade started and where it ends
+        self._from = bytearray(4 * count)
+        self._to = bytearray([0, 0, 0, 255] * count)
+        self._from[:] = self._to
+        self._fade_start = 0.0
+        self._fade_duration = 0.0
+        self._effect_start = 0.0
+        self._sent = None
+        self._lut = b''
+        self._build_lut()
+        self._write = None
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._running = False
+        self._thread = None
+
+    def _build_lut(self):
+        scale = max(0, min(255, int(self.brightness))) / 255.0
+        self._lut = bytes(round(255 * scale * (v / 255.0) ** self.gamma) for v in range(256))
+
+    def bind(self, strip):
+        """Attach the strip to render to and start the render thread"""
+        self._write = _strip_writer(strip)
+        self._sent = None
+        self.start()
+        self._wake.set()
+
+    def start(self):
+        if self._running:
             return
-        # Pi5Neo uses update_strip(); simulation uses show()
-        if hasattr(strip, 'update_strip'):
-            strip.update_strip()
-        elif hasattr(strip, 'show'):
-            strip.show()
-        elif hasattr(strip, 'write'):
-            strip.write()
-    except Exception as e:
-        print(f"NeoPixel show error: {e}")
-
-def _strip_fill(rgb):
-    if strip is None:
-        return
-    try:
-        r, g, b = _apply_brightness(rgb)
-        if hasattr(strip, 'fill_strip'):
-            # Pi5Neo API
-            strip.fill_strip(r, g, b)
-        elif hasattr(strip, 'fill'):
-            strip.fill((r, g, b))
-        else:
-            n = strip.numPixels() if hasattr(strip, 'numPixels') else LED_COUNT
-            for i in range(n):
-                if hasattr(strip, 'set_led_color'):
-                    strip.set_led_color(i, r, g, b)
-                elif hasattr(strip, 'set_pixel'):
-                    strip.set_pixel(i, (r, g, b))
-                elif hasattr(strip, 'setPixelColor'):
-                    strip.setPixelColor(i, (r, g, b))
-        _strip_show()
-    except Exception as e:
-        print(f"NeoPixel fill error: {e}")
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="lights", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the render thread, writing the final frame (e.g. lights off) first"""
+        self._running = False
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+        self._thread = None
+        with self._lock:
+            self._fade_duration = 0.0
+            self.effect = 'none'
+        self._show(self.render(time.monotonic())[0])
+
+    def _show(self, frame):
+        """Write a frame to the strip unless it is what the strip already shows"""
+        if self._write is None:
+            return
+        if frame == self._sent:
+            self.skipped += 1
+            return
+        try:
+            self._write(frame)
+            self._sent = frame
+            self.frames += 1
+            trace.record('lights', 'frame', frame.hex())  # Trace values are served as JSON
+        except Exception as e:
+            self.errors += 1
+            trace.log('lights', 'show', f"NeoPixel show error: {e}")
+
+    def _current(self, now):
+        """The framebuffer at time now, part way through any fade"""
+        if self._fade_duration <= 0 or now >= self._fade_start + self._fade_duration:
+            return self._to
+        t = (now - self._fade_start) / self._fade_duration
+        return bytearray(round(a + (b - a) * t) for a, b in zip(self._from, self._to))
+
+    def update(self, pixels, fade=0.0):
+        """Set {index: (rgb or None, brightness or None)}; fade over `fade` seconds"""
+        with self._lock:
+            now = time.monotonic()
+            self._from = bytearray(self._current(now))
+            target = bytearray(self._to)
+            for index, (rgb, brightness) in pixels.items():
+                base = 4 * index
+                if rgb is not None:
+                    target[base:base + 3] = bytes(rgb)
+                if brightness is not None:
+                    target[base + 3] = brightness
+            self._to = target
+            self._fade_start = now
+            self._fade_duration = max(0.0, fade)
+        self._wake.set()
+
+    def fill(self, rgb, fade=0.0):
+        self.update({i: (rgb, None) for i in range(self.count)}, fade)
+
+    def set_brightness(self, brightness):
+        """Change the strip-wide brightness (rebuilds the output table)"""
+        with self._lock:
+            self.brightness = max(0, min(255, int(brightness)))
+            self._build_lut()
+        self._wake.set()
+
+    def set_effect(self, effect, period=None):
+        if effect not in self.EFFECTS:
+            raise ValueError(f"Unknown effect {effect!r}; expected one of {', '.join(self.EFFECTS)}")
+        with self._lock:
+            self.effect = effect
+            if period:
+                self.effect_period = max(0.2, float(period))
+            self._effect_start = time.monotonic()
+        self._wake.set()
+
+    @property
+    def lit(self):
+        """True if any pixel is set to a visible colour"""
+        to = self._to
+        return any(to[i + 3] and any(to[i:i + 3]) for i in range(0, len(to), 4))
+
+    def pixels(self):
+        to = self._to
+        return [{'index': i // 4, 'color': list(to[i:i + 3]), 'brightness': to[i + 3]}
+                for i in range(0, len(to), 4)]
+
+    def render(self, now):
+        """Compose the output frame: per-pixel brightness, effect, then the gamma table"""
+        with self._lock:
+            source = self._current(now)
+            lut = self._lut
+            animating = now < self._fade_start + self._fade_duration or self.effect != 'none'
+            level = 255
+            if self.effect == 'breathe':
+                phase = (now - self._effect_start) / self.effect_period
+                level = round(255 * (0.55 - 0.45 * math.cos(2 * math.pi * phase)))
+        frame = bytearray(3 * self.count)
+        for i in range(self.count):
+            scale = source[4 * i + 3] * level
+            for c in range(3):
+                frame[3 * i + c] = lut[source[4 * i + c] * scale // 65025]
+        return frame, animating
+
+    def _run(self):
+        period = 1.0 / self.fps
+        while self._running:
+            self._wake.clear()
+            started = time.monotonic()
+            frame, animating = self.render(started)
+            self._show(frame)
+            if animating:
+                time.sleep(max(0.0, period - (time.monotonic() - started)))
+            else:
+                # Nothing moving: sleep until something changes
+                self._wake.wait()
+
+    def stats(self):
+        return {
+            'fps': self.fps,
+            'brightness': self.brightness,
+            'gamma': self.gamma,
+            'effect': self.effect,
+            'frames_written': self.frames,
+            'frames_skipped': self.skipped,
+            'errors': self.errors
+        }
+
+light_engine = LightEngine()
+
+def _strip_fill(rgb, fade=0.0):
+    light_engine.fill(rgb, fade)
 
 def init_lights():
     global strip, lights_on
@@ -345,6 +1259,7 @@ def init_lights():
             strip = Pi5NeoStrip(NEO_SPI_DEV, LED_COUNT, NEO_SPI_SPEED_KHZ)
             lights_on = False
             _strip_fill((0, 0, 0))
+            light_engine.bind(strip)
             print(f"Pi5Neo initialized on {NEO_SPI_DEV} with {LED_COUNT} LEDs @ {NEO_SPI_SPEED_KHZ}kHz")
             return
         except Exception as e:
@@ -354,51 +1269,210 @@ def init_lights():
     strip = DummyStrip(LED_COUNT, brightness=LED_BRIGHTNESS / 255.0)
     lights_on = False
     _strip_fill((0, 0, 0))
+    light_engine.bind(strip)
     if platform_name != "raspberry_pi":
         print("Using simulated NeoPixel strip (not Raspberry Pi)")
     elif Pi5NeoStrip is None:
         print("Using simulated NeoPixel strip (Pi5Neo not available)")
 
-def set_lights(state: bool):
+def set_lights(state: bool, fade=0.0):
     global lights_on
     with _lights_lock:
         lights_on = bool(state)
         if lights_on:
             # Warm white-ish
-            _strip_fill((255, 200, 120))
+            _strip_fill(LIGHTS_WARM_WHITE, fade)
         else:
-            _strip_fill((0, 0, 0))
+            _strip_fill((0, 0, 0), fade)
+    status_hub.update('lights', lights_on, 'lights', on=lights_on)
 
-# Initialize lights after GPIO/motor setup
-init_lights()
+def _sync_lights_state():
+    """Refresh lights_on after per-pixel changes"""
+    global lights_on
+    with _lights_lock:
+        lights_on = light_engine.lit
+    status_hub.update('lights', lights_on, 'lights', on=lights_on)
 
-# Wrapper functions to handle platform differences
-def gpio_output(pin, value):
-    """Abstract GPIO output function that works across platforms"""
+def _gpio_writers(platform_name):
+    """Return (gpio_output, pwm_set_duty, write_pins) for a platform; write_pins is None without bulk writes"""
+    # Wrapper functions to handle platform differences. The platform is fixed for
+    # the life of the process, so pick the implementation once rather than
+    # comparing platform_name on every write.
     if platform_name == "raspberry_pi" or platform_name == "simulation":
-        GPIO.output(pin, value)
-    elif platform_name == "odroid":
-        GPIO.digitalWrite(pin, value)
-    else:
-        print(f"Setting pin {pin} to {value}")
+        def gpio_output(pin, value):
+            """Abstract GPIO output function that works across platforms"""
+            GPIO.output(pin, value)
 
-def pwm_set_duty(pwm_obj, pin, duty):
-    """Abstract PWM duty cycle function that works across platforms"""
-    if platform_name == "raspberry_pi" or platform_name == "simulation":
-        pwm_obj.ChangeDutyCycle(duty)
+        def pwm_set_duty(pwm_obj, pin, duty):
+            """Abstract PWM duty cycle function that works across platforms"""
+            pwm_obj.ChangeDutyCycle(duty)
+
+        if platform_name == "raspberry_pi":
+            def write_pins(levels):
+                """Write several pins in one RPi.GPIO call"""
+                GPIO.output(list(levels), list(levels.values()))
+        else:
+            write_pins = None
+    elif platform_name == "generic_linux":
+        def gpio_output(pin, value):
+            """Abstract GPIO output function that works across platforms"""
+            gpiod_lines.set_value(pin, value)
+
+        def pwm_set_duty(pwm_obj, pin, duty):
+            """Abstract PWM duty cycle function that works across platforms"""
+            if pwm_obj is not None:
+                pwm_obj.ChangeDutyCycle(duty)
+            else:
+                gpiod_lines.set_value(pin, 1 if duty > 0 else 0)
+
+        def write_pins(levels):
+            """Write several lines with one ioctl"""
+            gpiod_lines.set_values(levels)
     elif platform_name == "odroid":
-        GPIO.softPwmWrite(pin, duty)
+        def gpio_output(pin, value):
+            """Abstract GPIO output function that works across platforms"""
+            GPIO.digitalWrite(pin, value)
+
+        def pwm_set_duty(pwm_obj, pin, duty):
+            """Abstract PWM duty cycle function that works across platforms"""
+            GPIO.softPwmWrite(pin, duty)
+
+        write_pins = None
     else:
-        print(f"Setting PWM on pin {pin} to duty {duty}")
+        # No GPIO library: MotorDriver's trace is the only record of writes
+        def gpio_output(pin, value):
+            """Abstract GPIO output function that works across platforms"""
+
+        def pwm_set_duty(pwm_obj, pin, duty):
+            """Abstract PWM duty cycle function that works across platforms"""
+
+        write_pins = None
+    return gpio_output, pwm_set_duty, write_pins
+
+gpio_output = pwm_set_duty = None
+
+class MotorDriver:
+    """Drives the motor pins through a shadow copy of each pin level and PWM duty
+
+    With a bulk pin writer, changes are queued and flush() writes all direction
+    pins in one call, followed by the duty changes (so a motor never runs at
+    its new speed in the old direction).
+    """
+
+    def __init__(self, write_pin=None, write_duty=None, high=1, low=0, write_pins=None):
+        self._write_pin = write_pin
+        self._write_duty = write_duty
+        self._write_pins = write_pins
+        self._high = high
+        self._low = low
+        self._levels = {}
+        self._duties = {}
+        self._pending_pins = {}
+        self._pending_duties = []
+        self.writes = 0
+        self.skipped = 0
+        self.bulk_writes = 0
+
+    def set_pin(self, pin, value):
+        if self._levels.get(pin) == value:
+            self.skipped += 1
+            return
+        if self._write_pins is not None:
+            self._pending_pins[pin] = value
+        else:
+            self._write_pin(pin, value)
+        self._levels[pin] = value
+        self.writes += 1
+        trace.record('gpio', pin, value)
+
+    def set_duty(self, pwm_obj, pin, duty):
+        if self._duties.get(pin) == duty:
+            self.skipped += 1
+            return
+        if self._write_pins is not None:
+            self._pending_duties.append((pwm_obj, pin, duty))
+        else:
+            self._write_duty(pwm_obj, pin, duty)
+        self._duties[pin] = duty
+        self.writes += 1
+        trace.record('pwm', pin, duty)
+
+    def flush(self):
+        """Write queued changes; a no-op without a bulk writer"""
+        if not self._pending_pins and not self._pending_duties:
+            return
+        pins, duties = self._pending_pins, self._pending_duties
+        self._pending_pins, self._pending_duties = {}, []
+        try:
+            if pins:
+                self._write_pins(pins)
+                self.bulk_writes += 1
+            for pwm_obj, pin, duty in duties:
+                self._write_duty(pwm_obj, pin, duty)
+        except Exception:
+            # The shadow state no longer matches the pins
+            self.invalidate()
+            raise
+
+    def set_motor(self, in1, in2, en, pwm_obj, value):
+        """Set one motor from a -255..255 value"""
+        if value > 0:  # Forward
+            self.set_pin(in1, self._high)
+            self.set_pin(in2, self._low)
+            self.set_duty(pwm_obj, en, int(abs(value) / 255 * 100))
+        elif value < 0:  # Reverse
+            self.set_pin(in1, self._low)
+            self.set_pin(in2, self._high)
+            self.set_duty(pwm_obj, en, int(abs(value) / 255 * 100))
+        else:  # Stop
+            self.set_pin(in1, self._low)
+            self.set_pin(in2, self._low)
+            self.set_duty(pwm_obj, en, 0)
+
+    def bind(self, write_pin, write_duty, high=1, low=0, write_pins=None):
+        """Attach the platform's pin writers once GPIO has been initialised"""
+        self._write_pin = write_pin
+        self._write_duty = write_duty
+        self._write_pins = write_pins
+        self._high = high
+        self._low = low
+        self.invalidate()
+
+    def invalidate(self):
+        """Forget the shadow state so the next command rewrites every pin"""
+        self._levels.clear()
+        self._duties.clear()
+        self._pending_pins = {}
+        self._pending_duties = []
+
+    def stats(self):
+        return {'issued': self.writes, 'skipped': self.skipped, 'bulk_writes': self.bulk_writes}
+
+# Bound to the platform's writers by init_gpio()
+motor_driver = MotorDriver()
 
 # Camera setup
 cameras = {}
 camera_locks = {}
 
+# Default capture resolution; a stream variant may raise it up to the maximum
+CAMERA_WIDTH = 640
+CAMERA_HEIGHT = 480
+CAMERA_MAX_WIDTH = 1920
+CAMERA_MAX_HEIGHT = 1080
+
+# Forward the camera's native MJPEG frames instead of decoding and re-encoding
+# them; cameras that can't deliver MJPEG fall back to decode/encode
+CAMERA_PASSTHROUGH = True
+
+def is_jpeg_buffer(frame):
+    """True if a captured frame is an undecoded JPEG buffer rather than pixels"""
+    return (frame is not None and frame.dtype == 'uint8' and frame.size > 2
+            and (frame.ndim == 1 or (frame.ndim == 2 and frame.shape[0] == 1))
+            and frame.flat[0] == 0xFF and frame.flat[1] == 0xD8)
+
 def get_camera(camera_id):
     """Get or create camera instance with thread-safe access"""
-    global cameras, camera_locks
-    
     # Initialize camera lock if it doesn't exist
     if camera_id not in camera_locks:
         camera_locks[camera_id] = threading.Lock()
@@ -410,91 +1484,861 @@ def get_camera(camera_id):
             cam_id = int(camera_id) if camera_id.isdigit() else camera_id
             camera = cv2.VideoCapture(cam_id)
             
-            # Configure camera properties if needed
-            camera.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-            camera.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
+            # Resolution, format, FPS, exposure and driver buffers (see Camera settings)
+            apply_camera_settings(camera_id, camera)
             
             if not camera.isOpened():
-                print(f"Error: Could not open camera {camera_id}")
+                trace.log('camera', camera_id, f"Error: Could not open camera {camera_id}")
+                status_hub.set_camera(camera_id, False, 'unavailable')
             else:
                 print(f"Camera {camera_id} initialized")
+                status_hub.set_camera(camera_id, True, 'opened')
                 
             cameras[camera_id] = camera
     
     return cameras[camera_id], camera_locks[camera_id]
 
-def generate_camera_frames(camera_id):
-    """Generate frames from camera for MJPEG streaming"""
-    camera, lock = get_camera(camera_id)
-    
-    while True:
-        with lock:
-            success, frame = camera.read()
-        
-        if not success:
-            print(f"Error reading from camera {camera_id}")
-            time.sleep(0.5)
-            continue
-        
-        # Encode frame as JPEG
-        ret, jpeg = cv2.imencode('.jpg', frame)
-        if not ret:
-            continue
-            
-        # Yield the frame in MJPEG format
-        yield (b'--frame\r\n'
-               b'Content-Type: image/jpeg\r\n\r\n' + jpeg.tobytes() + b'\r\n')
-        
-        # Small delay to control frame rate
-        time.sleep(0.05)  # 20 FPS
+# -------------------- Camera capture engine --------------------
+# One background reader thread per camera owns the VideoCapture and publishes
+# the latest frame. Each stream client gets a small frame slot that the reader
+# fills, so adding viewers never adds reads on the device or contention on its lock.
+camera_captures = {}
+_captures_lock = threading.Lock()
 
-@app.route('/camera/<camera_id>/stream')
-def camera_stream(camera_id):
+# JPEG quality used for snapshots and for streams on a healthy link
+JPEG_QUALITY = 95
+JPEG_QUALITY_MIN = 45
+JPEG_QUALITY_STEP = 10
+
+# Stream pacing: 'adaptive' follows the link, 'fixed' is the legacy 20 FPS
+STREAM_PACING = 'adaptive'
+STREAM_FIXED_FPS = 20
+STREAM_MAX_FPS = 30
+STREAM_MIN_FPS = 2
+STREAM_SLOT_DEPTH = 1         # Frames buffered per client (1-2); older frames are dropped
+STREAM_ADAPT_INTERVAL = 0.5   # Seconds between quality/rate adjustments
+
+# Decoded frames are read into a small per-camera pool of preallocated arrays
+# instead of a new array per read. A frame's array is reused this many frames
+# later, so encodes check the frame is still intact before caching it.
+CAMERA_FRAME_BUFFERS = 4
+
+# Pipelined encoding: at 720p and up a single imencode can take longer than
+# the camera's frame interval, and one viewer thread encoding frame after
+# frame caps the stream while other cores sit idle. With more than one
+# worker, the capture thread hands each new frame to a shared pool (OpenCV
+# releases the GIL while encoding) for every variant and quality being
+# watched, paced to the fastest viewer, and viewers collect the finished
+# JPEGs in frame order. Frames beyond ENCODE_MAX_IN_FLIGHT are left to the
+# viewer's own serial encode, so queueing never adds latency to a frame.
+ENCODE_WORKERS = int(os.environ.get('GPIO_SERVER_ENCODE_WORKERS', min(4, os.cpu_count() or 1)))
+ENCODE_MAX_IN_FLIGHT = int(os.environ.get('GPIO_SERVER_ENCODE_IN_FLIGHT', ENCODE_WORKERS))
+
+encode_pool = (concurrent.futures.ThreadPoolExecutor(ENCODE_WORKERS, thread_name_prefix='encode')
+               if ENCODE_WORKERS > 1 else None)
+_encode_slots = threading.BoundedSemaphore(max(1, ENCODE_MAX_IN_FLIGHT))
+
+# Encoded frames are stored already framed as a multipart part, so viewers
+# write the shared part as-is instead of concatenating a copy each
+MJPEG_PART_HEADER = b'--frame\r\nContent-Type: image/jpeg\r\n\r\n'
+MJPEG_PART_TRAILER = b'\r\n'
+
+def mjpeg_payload(data):
+    """Copy JPEG data into a complete multipart part; returns a zero-copy view of the JPEG within it"""
+    part = b''.join((MJPEG_PART_HEADER, data, MJPEG_PART_TRAILER))
+    return memoryview(part)[len(MJPEG_PART_HEADER):len(part) - len(MJPEG_PART_TRAILER)]
+
+def mjpeg_part(jpeg):
+    """The multipart part for a JPEG: the enclosing part for mjpeg_payload() views, else a new one"""
+    if isinstance(jpeg, memoryview):
+        return jpeg.obj
+    return b''.join((MJPEG_PART_HEADER, jpeg, MJPEG_PART_TRAILER))
+
+_stream_client_ids = itertools.count(1)
+
+class StreamClient:
+    """Per-viewer frame slot with pacing state and delivery statistics"""
+
+    def __init__(self, adaptive=True, depth=STREAM_SLOT_DEPTH, variant=None, max_quality=JPEG_QUALITY):
+        self.id = next(_stream_client_ids)
+        self.adaptive = adaptive
+        self.depth = max(1, min(2, int(depth)))
+        self.variant = variant
+        self.target_fps = float(STREAM_MAX_FPS if adaptive else STREAM_FIXED_FPS)
+        self.max_quality = max_quality
+        self.quality = max_quality
+        self.offered = 0
+        self.dropped = 0
+        self.delivered = 0
+        self.bytes_sent = 0
+        self.send_time = 0.0      # Smoothed seconds spent writing one frame
+        self.interval = 0.0       # Smoothed seconds between delivered frames
+        self.latency = 0.0        # Smoothed capture-to-sent age in seconds
+        self.last_sent = 0.0
+        self.change_seq = 0       # Last changed frame this viewer was sent (see ChangeDetector)
+        self._last_adapt = time.monotonic()
+        self._slot = collections.deque(maxlen=self.depth)
+        self._cond = threading.Condition()
+        # Optional callback run after each offer (used to wake async streams)
+        self.listener = None
+
+    def offer(self, item):
+        """Called by the capture thread; a full slot drops its oldest frame"""
+        with self._cond:
+            self.offered += 1
+            if len(self._slot) == self.depth:
+                self.dropped += 1
+            self._slot.append(item)
+            self._cond.notify()
+        if self.listener is not None:
+            self.listener()
+
+    def poll(self):
+        """Non-blocking take; returns None if the slot is empty"""
+        with self._cond:
+            return self._slot.popleft() if self._slot else None
+
+    def take(self, timeout=1.0):
+        with self._cond:
+            if not self._slot:
+                self._cond.wait(timeout)
+            if not self._slot:
+                return None
+            return self._slot.popleft()
+
+    def wake(self):
+        with self._cond:
+            self._cond.notify_all()
+        if self.listener is not None:
+            self.listener()
+
+    def record_sent(self, send_time, size, timestamp):
+        now = time.monotonic()
+        if self.last_sent:
+            self.interval = _ewma(self.interval, now - self.last_sent)
+        self.last_sent = now
+        self.delivered += 1
+        self.bytes_sent += size
+        age = time.time() - timestamp
+        if self.variant is not None:
+            self.variant.add_bytes(size)
+            self.variant.capture.delivery_ages.append(age)
+        self.send_time = _ewma(self.send_time, send_time)
+        self.latency = _ewma(self.latency, age)
+
+        if self.adaptive and now - self._last_adapt >= STREAM_ADAPT_INTERVAL:
+            self._last_adapt = now
+            self._adapt()
+
+    def _adapt(self):
+        budget = 1.0 / self.target_fps
+        if self.send_time > 0.8 * budget:
+            # The link can't keep up: shed quality first, then frame rate
+            if self.quality > min(JPEG_QUALITY_MIN, self.max_quality):
+                self.quality = max(min(JPEG_QUALITY_MIN, self.max_quality), self.quality - JPEG_QUALITY_STEP)
+            else:
+                self.target_fps = max(STREAM_MIN_FPS, self.target_fps * 0.75)
+        elif self.send_time < 0.4 * budget:
+            # Plenty of headroom: restore frame rate first, then quality
+            if self.target_fps < STREAM_MAX_FPS:
+                self.target_fps = min(STREAM_MAX_FPS, self.target_fps * 1.25 + 0.5)
+            elif self.quality < self.max_quality:
+                self.quality = min(self.max_quality, self.quality + JPEG_QUALITY_STEP)
+
+    def stats(self):
+        return {
+            'id': self.id,
+            'pacing': 'adaptive' if self.adaptive else 'fixed',
+            'variant': self.variant.name if self.variant is not None else 'native',
+            'slot_depth': self.depth,
+            'target_fps': round(self.target_fps, 1),
+            'effective_fps': round(1.0 / self.interval, 1) if self.interval else 0.0,
+            'quality': self.quality,
+            'delivered': self.delivered,
+            'dropped': self.dropped,
+            'drop_rate': round(self.dropped / self.offered, 3) if self.offered else 0.0,
+            'send_ms': round(self.send_time * 1000, 1),
+            'latency_ms': round(self.latency * 1000, 1),
+            'bytes_sent': self.bytes_sent
+        }
+
+def _ewma(current, sample, alpha=0.2):
+    """Exponentially weighted moving average, seeded by the first sample"""
+    return sample if not current else current + alpha * (sample - current)
+
+class StreamVariant:
+    """Shared scaler and JPEG encoder for one output resolution of a camera"""
+
+    def __init__(self, capture, width=None, height=None):
+        self.capture = capture
+        self.width = width        # None keeps the captured size (or aspect ratio)
+        self.height = height
+        self.subscribers = 0
+        self.jpegs = {}           # quality -> (seq, timestamp, jpeg_bytes)
+        self.encodes = 0
+        self.scales = 0
+        self.cpu_time = 0.0       # Thread CPU seconds spent scaling and encoding
+        self.bytes_sent = 0
+        self.bytes_per_sec = 0.0
+        self.created = time.monotonic()
+        self._window_start = self.created
+        self._window_bytes = 0
+        self._scaled = (0, None)
+        self._resized = None      # Reused output array for scaling
+        self._lock = threading.Lock()
+        self.pipelined = 0        # Encodes done ahead of time by the encode pool
+        self._pending = {}        # (seq, quality) -> Future while in the pool
+        self._next_prefetch = 0.0
+        self._encode_time = metric_histogram(
+            'jpeg_encode_seconds', 'Time to scale and encode one JPEG',
+            camera=capture.camera_id, variant='native' if self.native else 'scaled')
+
+    @property
+    def native(self):
+        return self.width is None and self.height is None
+
+    @property
+    def name(self):
+        if self.native:
+            return 'native'
+        return f"{self.width or 'auto'}x{self.height or 'auto'}"
+
+    def cached_jpeg(self, seq, quality=JPEG_QUALITY):
+        """Return the cached encode of frame seq (or newer) without blocking, else None"""
+        cached = self.jpegs.get(quality)
+        if cached is not None and cached[0] >= seq:
+            self.capture.cache_hits += 1
+            return cached
+        return None
+
+    def encode(self, seq, timestamp, frame, quality=JPEG_QUALITY):
+        """Return (seq, timestamp, jpeg_bytes) for a captured frame, encoding each frame once per quality"""
+        pending = self._pending.get((seq, quality))
+        if pending is not None:
+            # The encode pool already has this frame; wait for it rather than encoding it twice
+            result = pending.result()
+            if result is not None:
+                return result
+
+        # Viewers asking for the same frame queue here and then hit the cache
+        with self._lock:
+            cached = self.jpegs.get(quality)
+            if cached is not None and cached[0] >= seq:
+                self.capture.cache_hits += 1
+                return cached
+            return self._encode(seq, timestamp, frame, quality)
+
+    def _encode(self, seq, timestamp, frame, quality, reuse=True):
+        started = time.thread_time()
+        wall_started = time.monotonic()
+        if not self._uses_pixels(frame, quality):
+            # The camera's JPEG is used as-is at full quality
+            self.capture.passthrough_frames += 1
+            return self._store(quality, (seq, timestamp, mjpeg_payload(frame)))
+
+        # Anything else needs pixels (decoded once per frame by the capture)
+        image = self._scale(seq, frame, reuse)
+        if image is None:
+            return None
+        ret, jpeg = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        if not ret or not self.capture.frame_intact(seq):
+            # The pooled buffer was reused for a newer frame while we worked
+            return None
+        self.encodes += 1
+        self.capture.encodes += 1
+        self.cpu_time += time.thread_time() - started
+        self._encode_time.observe(time.monotonic() - wall_started)
+        return self._store(quality, (seq, timestamp, mjpeg_payload(jpeg)))
+
+    def _store(self, quality, result):
+        # Pool encodes can finish out of order; the cache only moves forward
+        cached = self.jpegs.get(quality)
+        if cached is None or cached[0] < result[0]:
+            self.jpegs[quality] = result
+        return result
+
+    def _uses_pixels(self, frame, quality):
+        return not (is_jpeg_buffer(frame) and quality >= JPEG_QUALITY and self._matches_capture())
+
+    def prefetch(self, seq, timestamp, frame, qualities, fps):
+        """Called by the capture thread: start encoding a new frame on the pool, paced to fps"""
+        now = time.monotonic()
+        if now < self._next_prefetch:
+            return
+        # A little ahead of the viewers' rate, so pacing jitter doesn't starve them
+        self._next_prefetch = now + 0.9 / fps
+        for quality in qualities:
+            if not self._uses_pixels(frame, quality) or (seq, quality) in self._pending:
+                continue
+            if not _encode_slots.acquire(blocking=False):
+                self.capture.prefetch_skipped += 1
+                continue
+            key = (seq, quality)
+            self._pending[key] = encode_pool.submit(self._pipelined, seq, timestamp, frame, quality)
+            self._pending[key].add_done_callback(functools.partial(self._prefetch_done, key))
+
+    def _pipelined(self, seq, timestamp, frame, quality):
+        cached = self.jpegs.get(quality)
+        if cached is not None and cached[0] >= seq:
+            return None
+        # Scale into a fresh array: other pool workers may be scaling neighbouring frames
+        result = self._encode(seq, timestamp, frame, quality, reuse=False)
+        if result is not None:
+            self.pipelined += 1
+        return result
+
+    def _prefetch_done(self, key, future):
+        _encode_slots.release()
+        self._pending.pop(key, None)
+
+    def _matches_capture(self):
+        if self.native:
+            return True
+        width, height = self.capture.frame_size
+        return self.width in (None, width) and self.height in (None, height)
+
+    def _scale(self, seq, frame, reuse=True):
+        scaled_seq, scaled = self._scaled
+        if scaled is not None and scaled_seq == seq:
+            return scaled
+        image = self.capture.pixels(seq, frame)
+        if image is None or self.native:
+            return image
+
+        src_height, src_width = image.shape[:2]
+        width, height = self.width, self.height
+        if width is None:
+            width = round(src_width * height / src_height)
+        elif height is None:
+            height = round(src_height * width / src_width)
+        # Never upscale: a variant larger than the capture gets the capture size
+        width, height = min(width, src_width), min(height, src_height)
+        if (width, height) != (src_width, src_height):
+            resized = self._resized if reuse else None
+            if resized is None or resized.shape[:2] != (height, width) or resized.shape[2:] != image.shape[2:]:
+                resized = None
+            image = cv2.resize(image, (width, height), dst=resized, interpolation=cv2.INTER_AREA)
+            self.scales += 1
+            if not reuse:
+                return image
+            self._resized = image
+        if reuse:
+            self._scaled = (seq, image)
+        return image
+
+    def add_bytes(self, size):
+        self.bytes_sent += size
+        self._window_bytes += size
+        now = time.monotonic()
+        if now - self._window_start >= 1.0:
+            self.bytes_per_sec = self._window_bytes / (now - self._window_start)
+            self._window_start = now
+            self._window_bytes = 0
+
+    def stats(self):
+        elapsed = max(1e-6, time.monotonic() - self.created)
+        return {
+            'variant': self.name,
+            'subscribers': self.subscribers,
+            'encodes': self.encodes,
+            'pipelined': self.pipelined,
+            'scales': self.scales,
+            'cpu_ms_per_encode': round(self.cpu_time * 1000 / self.encodes, 2) if self.encodes else 0.0,
+            'cpu_percent': round(self.cpu_time * 100 / elapsed, 1),
+            'bytes_per_sec': round(self.bytes_per_sec),
+            'bytes_sent': self.bytes_sent
+        }
+
+class CameraCapture:
+    """Background reader that owns a camera and fans its frames out to viewers"""
+
+    def __init__(self, camera_id):
+        self.camera_id = camera_id
+        self.frame = None
+        self.seq = 0
+        self.timestamp = 0.0
+        self.read_errors = 0
+        self.clients = set()
+        self.mode = None          # 'passthrough' or 'decode' once the first frame arrives
+        self._cond = threading.Condition()
+        self._running = False
+        self._thread = None
+
+        # Output variants (resolutions) currently being served; the native
+        # variant is permanent and backs snapshots and full-size streams
+        self.native = StreamVariant(self)
+        self.variants = {(None, None): self.native}
+        self.base_size = camera_base_size(camera_id)
+        self.frame_size = self.base_size
+        self._desired_size = self.frame_size
+
+        # Saved settings (see Camera settings); changes are applied by the reader thread
+        self.low_latency = get_camera_settings(camera_id).get('low_latency', False)
+        self._settings_pending = False
+        self.drained = 0              # Stale queued frames dropped in low-latency mode
+        self.driver_ages = collections.deque(maxlen=CAMERA_FRAME_AGE_SAMPLES)
+        self.delivery_ages = collections.deque(maxlen=CAMERA_FRAME_AGE_SAMPLES)
+
+        # Totals across all variants
+        self.encodes = 0
+        self.cache_hits = 0
+        self.passthrough_frames = 0
+        self.prefetch_skipped = 0     # Frames the encode pool had no room for
+
+        # Preallocated read buffers (decode mode only; MJPEG buffers vary in size)
+        self._buffers = None
+        self.reads_in_place = 0
+
+        # Pixels of the most recent passthrough frame, decoded on demand
+        self.decodes = 0
+        self._decoded = (0, None)
+        self._decode_lock = threading.Lock()
+
+        # Recent frames kept for look-back (see RewindBuffer); started on demand
+        self.rewind = None
+
+        # Lets viewers skip frames of a static scene (see ChangeDetector)
+        self.change = ChangeDetector()
+
+        self._capture_time = metric_histogram(
+            'camera_capture_seconds', 'Time blocked in camera.read() per frame', camera=camera_id)
+        self._read_failures = metric_counter(
+            'camera_read_errors', 'Failed camera reads', camera=camera_id)
+
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name=f"capture-{self.camera_id}", daemon=True)
+        self._thread.start()
+        if get_camera_settings(self.camera_id).get('rewind'):
+            self.enable_rewind(persistent=True)
+
+    def stop(self):
+        self._running = False
+        with self._cond:
+            self._cond.notify_all()
+            clients = list(self.clients)
+        for client in clients:
+            client.wake()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=2.0)
+        self._thread = None
+        rewind, self.rewind = self.rewind, None
+        if rewind is not None:
+            rewind.stop()
+
+    @property
+    def running(self):
+        return self._running
+
+    def enable_rewind(self, persistent=False):
+        """Start the rewind buffer unless it is running; returns it, or None if rewind is off or the capture stopped"""
+        if REWIND_SECONDS <= 0 or not self._running:
+            return None
+        with self._cond:
+            if self.rewind is None:
+                self.rewind = RewindBuffer(self, idle_timeout=None if persistent else REWIND_IDLE_SECONDS)
+                self.rewind.start()
+            elif persistent:
+                self.rewind.idle_timeout = None
+            return self.rewind
+
+    def _rewind_idle(self, rewind):
+        # Called by an on-demand buffer's feeder once nobody has read it for a while
+        with self._cond:
+            if self.rewind is rewind:
+                self.rewind = None
+
+    def rewind_stats(self):
+        rewind = self.rewind
+        return rewind.stats() if rewind is not None else None
+
+    @property
+    def viewers(self):
+        return len(self.clients)
+
+    def _run(self):
+        camera, lock = get_camera(self.camera_id)
+        self._read_frame_size(camera)
+        while self._running:
+            if self._settings_pending:
+                self._apply_settings(camera, lock)
+            if self._desired_size != self.frame_size:
+                self._apply_frame_size(camera, lock)
+
+            buffers = self._buffers
+            buffer = buffers[(self.seq + 1) % len(buffers)] if buffers else None
+            started = time.monotonic()
+            with lock:
+                if self.low_latency:
+                    success, frame = self._read_newest(camera, buffer)
+                else:
+                    success, frame = camera.read(buffer) if buffer is not None else camera.read()
+                age = driver_frame_age(camera) if success else None
+            self._capture_time.observe(time.monotonic() - started)
+
+            if not success:
+                self.read_errors += 1
+                self._read_failures.inc()
+                trace.log('camera', self.camera_id, f"Error reading from camera {self.camera_id}")
+                if self.read_errors == 1:
+                    status_hub.set_camera(self.camera_id, False, 'lost')
+                time.sleep(0.5)
+                if self._running and not camera.isOpened():
+                    # Device went away; try to reopen it
+                    camera, lock = get_camera(self.camera_id)
+                    self._read_frame_size(camera)
+                    self.mode = None
+                continue
+
+            if self.read_errors:
+                self.read_errors = 0
+                status_hub.set_camera(self.camera_id, True, 'opened')
+            if self.mode is None:
+                self.mode = self._detect_mode(camera, lock, frame)
+                print(f"Camera {self.camera_id} capture mode: {self.mode}")
+                if self.mode == 'decode' and frame.ndim < 3:
+                    # Raw buffer we can't use; wait for a converted frame
+                    continue
+            if frame is buffer:
+                self.reads_in_place += 1
+            elif self.mode == 'decode' and frame.ndim == 3 and (buffers is None or frame.shape != buffers[0].shape):
+                # First frame, or the size changed: (re)build the pool to match
+                self._allocate_buffers(frame)
+            if self.seq == 0:
+                readiness.milestone('first_frame')
+            if self.change.enabled:
+                self.change.observe(self.seq + 1, frame)
+            if age is not None:
+                self.driver_ages.append(age)
+            with self._cond:
+                self.frame = frame
+                self.seq += 1
+                # Stamp the frame with when the sensor delivered it, where the driver says
+                self.timestamp = time.time() - (age or 0.0)
+                item = (self.seq, self.timestamp, frame)
+                clients = list(self.clients)
+                self._cond.notify_all()
+            for client in clients:
+                client.offer(item)
+            self._prefetch(item, clients)
+
+    def _prefetch(self, item, clients):
+        """Start pool encodes of a new frame for each variant and quality its viewers want"""
+        if encode_pool is None:
+            return
+        demand = {}
+        for client in clients:
+            if client.variant is not None:
+                fps, qualities = demand.get(client.variant, (0.0, set()))
+                demand[client.variant] = (max(fps, client.target_fps), qualities | {client.quality})
+        if self.change.unchanged(item[0]):
+            return  # Viewers will most likely skip it; a keepalive is encoded on demand
+        for variant, (fps, qualities) in demand.items():
+            variant.prefetch(*item, qualities, fps)
+
+    def _read_newest(self, camera, buffer):
+        """grab() past any frames the driver already queued, then decode only the newest"""
+        interval = 1.0 / (camera.get(cv2.CAP_PROP_FPS) or 30.0)
+        for _ in range(CAMERA_DRAIN_MAX):
+            started = time.monotonic()
+            if not camera.grab():
+                return False, None
+            age = driver_frame_age(camera)
+            if age is None:
+                # No buffer timestamps: a grab that didn't wait was sitting in the queue
+                stale = time.monotonic() - started < CAMERA_DRAIN_QUEUED
+            else:
+                stale = age > interval
+            if not stale:
+                break
+            self.drained += 1
+        return camera.retrieve(buffer) if buffer is not None else camera.retrieve()
+
+    def reload_settings(self):
+        """Pick up changed saved settings; the reader thread applies them to the device"""
+        with self._cond:
+            self.base_size = camera_base_size(self.camera_id)
+            self.low_latency = get_camera_settings(self.camera_id).get('low_latency', False)
+            self._update_desired_size()
+            self._settings_pending = True
+        rewind = self.rewind
+        if get_camera_settings(self.camera_id).get('rewind'):
+            self.enable_rewind(persistent=True)
+        elif rewind is not None:
+            # Back to on demand: it stops once nobody has read it for a while
+            rewind.idle_timeout = REWIND_IDLE_SECONDS
+
+    def _apply_settings(self, camera, lock):
+        self._settings_pending = False
+        with lock:
+            apply_camera_settings(self.camera_id, camera)
+        self._read_frame_size(camera)
+        # The format may have changed; detect passthrough again on the next frame
+        self.mode = None
+        print(f"Camera {self.camera_id} settings applied: {get_camera_settings(self.camera_id)}")
+
+    def _allocate_buffers(self, frame):
+        import numpy as np
+
+        # Frames in the encode pool must outlive the reads that follow them
+        count = CAMERA_FRAME_BUFFERS + (ENCODE_MAX_IN_FLIGHT if encode_pool is not None else 0)
+        self._buffers = [np.empty_like(frame) for _ in range(count)]
+
+    def frame_intact(self, seq):
+        """False if frame seq's pooled buffer may since have been overwritten by a newer read"""
+        return not self._buffers or self.seq - seq < len(self._buffers) - 1
+
+    def _read_frame_size(self, camera):
+        width = int(camera.get(cv2.CAP_PROP_FRAME_WIDTH)) or CAMERA_WIDTH
+        height = int(camera.get(cv2.CAP_PROP_FRAME_HEIGHT)) or CAMERA_HEIGHT
+        self.frame_size = (width, height)
+
+    def _apply_frame_size(self, camera, lock):
+        width, height = self._desired_size
+        with lock:
+            camera.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+            camera.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+        self._read_frame_size(camera)
+        if self.frame_size != self._desired_size:
+            # The device picked its nearest mode; don't keep retrying
+            self._desired_size = self.frame_size
+        print(f"Camera {self.camera_id} capturing at {self.frame_size[0]}x{self.frame_size[1]}")
+
+    def acquire_variant(self, width=None, height=None):
+        """Get the shared variant for an output size, creating it for the first subscriber"""
+        with self._cond:
+            key = (width, height)
+            variant = self.variants.get(key)
+            if variant is None:
+                variant = StreamVariant(self, width, height)
+                self.variants[key] = variant
+            variant.subscribers += 1
+            self._update_desired_size()
+            return variant
+
+    def release_variant(self, variant):
+        """Drop a subscription; the last subscriber tears the variant down"""
+        with self._cond:
+            variant.subscribers = max(0, variant.subscribers - 1)
+            if variant.subscribers == 0 and not variant.native:
+                self.variants.pop((variant.width, variant.height), None)
+            self._update_desired_size()
+
+    def _update_desired_size(self):
+        # Capture once at the largest size anyone is asking for. A variant
+        # giving one dimension keeps the capture's aspect ratio, as _scale() does
+        width, height = self.base_size
+        frame_width, frame_height = self.frame_size
+        for variant in self.variants.values():
+            if variant.subscribers:
+                wanted_width, wanted_height = variant.width, variant.height
+                if wanted_width is None and wanted_height is not None:
+                    wanted_width = round(frame_width * wanted_height / frame_height)
+                elif wanted_height is None and wanted_width is not None:
+                    wanted_height = round(frame_height * wanted_width / frame_width)
+                width = max(width, wanted_width or 0)
+                height = max(height, wanted_height or 0)
+        self._desired_size = (min(width, CAMERA_MAX_WIDTH), min(height, CAMERA_MAX_HEIGHT))
+
+    def _detect_mode(self, camera, lock, frame):
+        """Decide from the first frame whether the device is delivering MJPEG passthrough"""
+        if is_jpeg_buffer(frame):
+            return 'passthrough'
+        if frame.ndim < 3 and CAMERA_PASSTHROUGH:
+            # Undecoded but not JPEG (e.g. YUYV): let OpenCV convert again
+            with lock:
+                camera.set(cv2.CAP_PROP_FORMAT, cv2.CV_8UC3)
+                camera.set(cv2.CAP_PROP_CONVERT_RGB, 1)
+        return 'decode'
+
+    def subscribe(self, client):
+        with self._cond:
+            self.clients.add(client)
+
+    def unsubscribe(self, client):
+        with self._cond:
+            self.clients.discard(client)
+
+    def latest(self):
+        """The most recent (seq, timestamp, frame), without waiting"""
+        with self._cond:
+            return self.seq, self.timestamp, self.frame
+
+    def wait_for_frame(self, last_seq, timeout=1.0):
+        """Block until a frame newer than last_seq is available; returns (seq, timestamp, frame) or None"""
+        with self._cond:
+            if self.seq <= last_seq and self._running:
+                self._cond.wait_for(lambda: self.seq > last_seq or not self._running, timeout)
+            if self.seq <= last_seq or self.frame is None:
+                return None
+            return self.seq, self.timestamp, self.frame
+
+    def cached_jpeg(self, seq, quality=JPEG_QUALITY):
+        """Return the native variant's cached encode of frame seq without blocking, else None"""
+        return self.native.cached_jpeg(seq, quality)
+
+    def encode(self, seq, timestamp, frame, quality=JPEG_QUALITY):
+        """Encode a captured frame at the native size (once per frame and quality)"""
+        return self.native.encode(seq, timestamp, frame, quality)
+
+    def pixels(self, seq, frame):
+        """Return a BGR image for a captured frame, decoding passthrough JPEGs once per frame"""
+        if not is_jpeg_buffer(frame):
+            return frame
+        with self._decode_lock:
+            decoded_seq, decoded = self._decoded
+            if decoded is not None and decoded_seq == seq:
+                return decoded
+            decoded = cv2.imdecode(frame, cv2.IMREAD_COLOR)
+            self.decodes += 1
+            self._decoded = (seq, decoded)
+            return decoded
+
+    def get_jpeg(self, last_seq=0, timeout=1.0, quality=JPEG_QUALITY, variant=None):
+        """Return (seq, timestamp, jpeg_bytes) for a frame newer than last_seq"""
+        result = self.wait_for_frame(last_seq, timeout)
+        if result is None:
+            return None
+        return (variant or self.native).encode(*result, quality=quality)
+
+def get_capture(camera_id):
+    """Get or start the background capture for a camera"""
+    readiness.milestone('first_camera_request')
+    with _captures_lock:
+        capture = camera_captures.get(camera_id)
+        if capture is None:
+            capture = ProcessCapture(camera_id) if CAPTURE_MODE == 'process' else CameraCapture(camera_id)
+            camera_captures[camera_id] = capture
+        capture.start()
+    return capture
+
+def stop_capture(camera_id):
+    """Stop the background capture for a camera, if running"""
+    with _captures_lock:
+        capture = camera_captures.pop(camera_id, None)
+    if capture is not None:
+        capture.stop()
+
+def _stream_params(args):
+    """Parse ?width=&height=&quality= into (width, height, quality), clamped to sane ranges"""
+    def number(name):
+        try:
+            return int(args.get(name, ''))
+        except (TypeError, ValueError):
+            return None
+
+    width, height, quality = number('width'), number('height'), number('quality')
+    width = max(16, min(CAMERA_MAX_WIDTH, width)) if width and width > 0 else None
+    height = max(16, min(CAMERA_MAX_HEIGHT, height)) if height and height > 0 else None
+    quality = max(10, min(100, quality)) if quality else JPEG_QUALITY
+    return width, height, quality
+
+def generate_camera_frames(camera_id, pacing=STREAM_PACING, width=None, height=None, quality=JPEG_QUALITY):
+    """Generate frames from camera for MJPEG streaming"""
+    capture = get_capture(camera_id)
+    variant = capture.acquire_variant(width, height)
+    client = StreamClient(adaptive=(pacing == 'adaptive'), variant=variant, max_quality=quality)
+    send_time = metric_histogram('stream_send_seconds', 'Time to write one MJPEG frame to a viewer', camera=camera_id)
+    frame_age = metric_histogram('stream_frame_age_seconds', 'Capture-to-sent age of streamed frames', camera=camera_id)
+    capture.subscribe(client)
+    next_due = 0.0
+
+    try:
+        while capture.running:
+            # Wait out the client's frame interval before taking a frame, so
+            # whatever sits in the slot is the freshest one available
+            delay = next_due - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+
+            item = client.take()
+            if item is None or not capture.change.should_send(client, item[0]):
+                continue
+
+            result = variant.encode(*item, quality=client.quality)
+            if result is None:
+                continue
+            _, timestamp, jpeg = result
+
+            # Yield the frame in MJPEG format; the WSGI server writes it to the
+            # socket before resuming us, so this measures the send time
+            started = time.monotonic()
+            yield mjpeg_part(jpeg)
+            elapsed = time.monotonic() - started
+            client.record_sent(elapsed, len(jpeg), timestamp)
+            send_time.observe(elapsed)
+            frame_age.observe(time.time() - timestamp)
+
+            next_due = started + 1.0 / client.target_fps
+    finally:
+        capture.unsubscribe(client)
+        capture.release_variant(variant)
+
+@app.route('/camera/<camera_id>/stream')
+def camera_stream(camera_id):
     """Route to stream video from a camera"""
-    return Response(generate_camera_frames(camera_id),
+    pacing = request.args.get('pacing', STREAM_PACING)
+    if pacing not in ('adaptive', 'fixed'):
+        pacing = STREAM_PACING
+    width, height, quality = _stream_params(request.args)
+    return Response(generate_camera_frames(camera_id, pacing, width, height, quality),
                     mimetype='multipart/x-mixed-replace; boundary=frame')
 
 @app.route('/camera/<camera_id>/snapshot')
 def camera_snapshot(camera_id):
     """Route to get a single snapshot from a camera"""
-    camera, lock = get_camera(camera_id)
-    
-    with lock:
-        success, frame = camera.read()
+    capture = get_capture(camera_id)
+
+    # Serve the cached JPEG immediately, or wait for the next frame if ?fresh=1
+    fresh = request.args.get('fresh', '').lower() in ('1', 'true', 'yes')
+    last_seq = capture.seq if fresh else 0
+    width, height, quality = _stream_params(request.args)
+    variant = capture.acquire_variant(width, height)
+    try:
+        result = capture.get_jpeg(last_seq, timeout=2.0, quality=quality, variant=variant)
+    finally:
+        capture.release_variant(variant)
     
-    if not success:
+    if result is None:
         return jsonify({
             'status': 'error',
             'message': f'Failed to capture image from camera {camera_id}'
         }), 500
-    
-    # Encode frame as JPEG
-    ret, jpeg = cv2.imencode('.jpg', frame)
-    if not ret:
-        return jsonify({
-            'status': 'error',
-            'message': 'Failed to encode camera image'
-        }), 500
+    seq, timestamp, jpeg = result
     
     # Return image as response
-    return send_file(
-        io.BytesIO(jpeg.tobytes()),
+    response = send_file(
+        io.BytesIO(jpeg),
         mimetype='image/jpeg',
         as_attachment=False
     )
+    response.headers['X-Frame-Seq'] = str(seq)
+    response.headers['X-Frame-Timestamp'] = f'{timestamp:.3f}'
+    return response
 
 @app.route('/camera/<camera_id>', methods=['GET'])
 def camera_status(camera_id):
     """Route to check camera status"""
     try:
-        camera, _ = get_camera(camera_id)
-        is_open = camera.isOpened()
+        if CAPTURE_MODE == 'process':
+            # The device belongs to the worker process; report what it publishes
+            capture = get_capture(camera_id)
+            is_open = capture.running and not capture.read_errors
+            width, height = capture.frame_size
+            fps = capture.fps
+        else:
+            camera, _ = get_camera(camera_id)
+            is_open = camera.isOpened()
+            capture = camera_captures.get(camera_id)
         
         if is_open:
-            # Get camera properties
-            width = int(camera.get(cv2.CAP_PROP_FRAME_WIDTH))
-            height = int(camera.get(cv2.CAP_PROP_FRAME_HEIGHT))
-            fps = camera.get(cv2.CAP_PROP_FPS)
+            if CAPTURE_MODE != 'process':
+                # Get camera properties
+                width = int(camera.get(cv2.CAP_PROP_FRAME_WIDTH))
+                height = int(camera.get(cv2.CAP_PROP_FRAME_HEIGHT))
+                fps = camera.get(cv2.CAP_PROP_FPS)
             
             return jsonify({
                 'status': 'success',
@@ -503,6 +2347,31 @@ def camera_status(camera_id):
                 'width': width,
                 'height': height,
                 'fps': fps,
+                'viewers': capture.viewers if capture else 0,
+                'capture_mode': capture.mode if capture else None,
+                'jpeg_cache': {
+                    'encodes': capture.encodes if capture else 0,
+                    'hits': capture.cache_hits if capture else 0,
+                    'passthrough': capture.passthrough_frames if capture else 0,
+                    'decodes': capture.decodes if capture else 0
+                },
+                'frame_buffers': {
+                    'pooled': len(capture._buffers or ()) if capture else 0,
+                    'reads_in_place': capture.reads_in_place if capture else 0
+                },
+                'encode_pipeline': {
+                    'workers': ENCODE_WORKERS if encode_pool is not None else 0,
+                    'max_in_flight': ENCODE_MAX_IN_FLIGHT,
+                    'pipelined': sum(variant.pipelined for variant in list(capture.variants.values())) if capture else 0,
+                    'skipped': capture.prefetch_skipped if capture else 0
+                },
+                'clients': [client.stats() for client in list(capture.clients)] if capture else [],
+                'variants': [variant.stats() for variant in list(capture.variants.values())] if capture else [],
+                'frame_size': list(capture.frame_size) if capture else None,
+                'rewind': capture.rewind_stats() if capture else None,
+                'skipping': capture.change.stats() if capture else None,
+                'frame_age': frame_age_stats(capture) if capture else None,
+                'worker': capture.worker_stats() if isinstance(capture, ProcessCapture) else None,
                 'stream_url': f'/camera/{camera_id}/stream',
                 'snapshot_url': f'/camera/{camera_id}/snapshot'
             })
@@ -524,20 +2393,23 @@ def camera_status(camera_id):
 @app.route('/cameras', methods=['GET'])
 def list_cameras():
     """Route to list all available cameras with their names"""
+    # ?refresh=1 forces a rescan; otherwise this is a read of the cached inventory
+    if request.args.get('refresh', '').lower() in ('1', 'true', 'yes') or camera_inventory.scans == 0:
+        # Also covers a request that arrives before the first background scan
+        camera_inventory.refresh()
+    detected_cameras = camera_inventory.cameras
     available_cameras = {}
     
     # List existing cameras that are already opened
-    for cam_id, camera in cameras.items():
+    for cam_id, camera in list(cameras.items()):
         is_open = camera.isOpened()
-        name = get_camera_name(cam_id, camera)
+        info = detected_cameras.get(cam_id)
+        name = info["name"] if info else get_camera_name(cam_id, camera)
         available_cameras[cam_id] = {
             "available": is_open,
             "name": name
         }
     
-    # Try to detect cameras on the system
-    detected_cameras = detect_system_cameras()
-    
     # Add detected cameras to the list if they're not already there
     for cam_id, camera_info in detected_cameras.items():
         if cam_id not in available_cameras:
@@ -549,8 +2421,8 @@ def list_cameras():
     })
 
 def detect_system_cameras():
-    """Detect cameras connected to the system"""
-    cameras = {}
+    """Detect cameras by opening them (slow; used where sysfs isn't available)"""
+    detected = {}
     
     # First try with video device files (Linux)
     if os.path.exists('/dev'):
@@ -558,12 +2430,16 @@ def detect_system_cameras():
             if device.startswith('video'):
                 cam_id = device.replace('video', '')
                 if cam_id.isdigit():
+                    # Never reopen a camera we are already streaming from
+                    if cam_id in cameras or cam_id in camera_captures:
+                        continue
+
                     # Try to open the device
                     cap = cv2.VideoCapture(int(cam_id))
                     is_available = cap.isOpened()
                     name = get_camera_name(cam_id, cap) if is_available else f"Camera {cam_id}"
                     
-                    cameras[cam_id] = {
+                    detected[cam_id] = {
                         "available": is_available,
                         "name": name
                     }
@@ -574,15 +2450,17 @@ def detect_system_cameras():
     
     # If no cameras were found with device files, or we're not on Linux,
     # try a few indices as fallback (more portable)
-    if not cameras:
+    if not detected:
         for i in range(10):  # Try indices 0-9
             cam_id = str(i)
+            if cam_id in cameras or cam_id in camera_captures:
+                continue
             cap = cv2.VideoCapture(i)
             is_available = cap.isOpened()
             
             if is_available or i < 3:  # Always include first 3 indices as potential cameras
                 name = get_camera_name(cam_id, cap) if is_available else f"Camera {i}"
-                cameras[cam_id] = {
+                detected[cam_id] = {
                     "available": is_available,
                     "name": name
                 }
@@ -595,7 +2473,7 @@ def detect_system_cameras():
             if not is_available and i >= 3:
                 break
     
-    return cameras
+    return detected
 
 def get_camera_name(cam_id, camera):
     """Get the camera name based on device info or position"""
@@ -627,12 +2505,1305 @@ def get_camera_name(cam_id, camera):
         
     return name
 
+# -------------------- Camera settings --------------------
+# Per-camera capture settings (resolution, FPS, FOURCC, exposure, driver
+# buffer count, low-latency mode and an always-on rewind buffer), saved to
+# CAMERA_SETTINGS_FILE and applied whenever the device is opened, so they
+# survive restarts. V4L2
+# queues several buffers by default, so a plain read() can hand back a frame
+# that has been waiting for hundreds of milliseconds. Low-latency mode asks
+# the driver for a single buffer and drains anything still queued with
+# grab() before decoding only the newest frame with retrieve().
+CAMERA_SETTINGS_FILE = os.environ.get('GPIO_SERVER_CAMERA_SETTINGS',
+                                      os.path.join(os.path.dirname(os.path.abspath(__file__)), 'camera-settings.json'))
+CAMERA_DRAIN_MAX = 4            # Most queued frames dropped before one is used
+CAMERA_DRAIN_QUEUED = 0.002     # A grab() quicker than this returned an already-queued frame
+CAMERA_FRAME_AGE_SAMPLES = 256  # Recent frame ages kept per camera for percentiles
+
+camera_settings = {}            # camera id -> saved settings
+_camera_settings_lock = threading.Lock()
+_camera_settings_loaded = False
+
+def load_camera_settings(force=False):
+    """Read the saved camera settings (once, unless forced)"""
+    global camera_settings, _camera_settings_loaded
+    with _camera_settings_lock:
+        if _camera_settings_loaded and not force:
+            return
+        _camera_settings_loaded = True
+        try:
+            with open(CAMERA_SETTINGS_FILE) as f:
+                camera_settings = json.load(f)
+        except FileNotFoundError:
+            camera_settings = {}
+        except (OSError, ValueError) as e:
+            print(f"Ignoring camera settings in {CAMERA_SETTINGS_FILE}: {e}")
+            camera_settings = {}
+
+def _save_camera_settings():
+    # Write-and-rename so a power cut never leaves a truncated file
+    temporary = CAMERA_SETTINGS_FILE + '.tmp'
+    with open(temporary, 'w') as f:
+        json.dump(camera_settings, f, indent=2, sort_keys=True)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporary, CAMERA_SETTINGS_FILE)
+
+def get_camera_settings(camera_id):
+    load_camera_settings()
+    return dict(camera_settings.get(camera_id, {}))
+
+def _parse_camera_settings(data):
+    """Validate a POST /camera/<id>/settings body; None values reset a setting to its default"""
+    def number(name, kind, low, high):
+        if isinstance(data[name], bool):
+            raise ValueError(f"{name} must be a number")
+        value = kind(data[name])
+        if not low <= value <= high:
+            raise ValueError(f"{name} must be between {low} and {high}")
+        return value
+
+    def flag(name):
+        # Only real JSON booleans: bool("false") would be True
+        if not isinstance(data[name], bool):
+            raise ValueError(f"{name} must be true or false")
+        return data[name]
+
+    changes = {}
+    for name in data:
+        if data[name] is None:
+            changes[name] = None
+        elif name == 'width':
+            changes[name] = number(name, int, 16, CAMERA_MAX_WIDTH)
+        elif name == 'height':
+            changes[name] = number(name, int, 16, CAMERA_MAX_HEIGHT)
+        elif name == 'fps':
+            changes[name] = number(name, float, 1.0, 240.0)
+        elif name == 'buffer_size':
+            changes[name] = number(name, int, 1, 32)
+        elif name == 'fourcc':
+            fourcc = str(data[name]).upper()
+            if len(fourcc) != 4 or not fourcc.isalnum():
+                raise ValueError(f"fourcc {data[name]!r} is not a four-character code like MJPG or YUYV")
+            changes[name] = fourcc
+        elif name == 'exposure':
+            changes[name] = 'auto' if data[name] == 'auto' else number(name, float, 0.0, 100000.0)
+        elif name in ('low_latency', 'rewind'):
+            changes[name] = flag(name)
+        else:
+            raise ValueError(f"unknown setting {name!r}")
+    return changes
+
+def update_camera_settings(camera_id, changes):
+    """Merge validated changes into a camera's settings, save them, and apply them to a running capture"""
+    load_camera_settings()
+    with _camera_settings_lock:
+        settings = dict(camera_settings.get(camera_id, {}))
+        for name, value in changes.items():
+            if value is None:
+                settings.pop(name, None)
+            else:
+                settings[name] = value
+        if settings:
+            camera_settings[camera_id] = settings
+        else:
+            camera_settings.pop(camera_id, None)
+        _save_camera_settings()
+    capture = camera_captures.get(camera_id)
+    if capture is not None:
+        capture.reload_settings()
+    return settings
+
+def apply_camera_settings(camera_id, camera):
+    """Configure an open VideoCapture from its saved settings (call with the camera's lock held)"""
+    settings = get_camera_settings(camera_id)
+    # Ask for the camera's own MJPEG unless told otherwise, so the capture
+    # can forward JPEGs untouched (checked on the first frame)
+    fourcc = settings.get('fourcc', 'MJPG' if CAMERA_PASSTHROUGH else None)
+    if fourcc:
+        camera.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*fourcc))
+    width, height = camera_base_size(camera_id)
+    camera.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+    camera.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+    if 'fps' in settings:
+        camera.set(cv2.CAP_PROP_FPS, settings['fps'])
+    buffer_size = settings.get('buffer_size', 1 if settings.get('low_latency') else None)
+    if buffer_size:
+        camera.set(cv2.CAP_PROP_BUFFERSIZE, buffer_size)
+    exposure = settings.get('exposure')
+    if exposure == 'auto':
+        camera.set(cv2.CAP_PROP_AUTO_EXPOSURE, 3)   # V4L2 aperture-priority auto
+    elif exposure is not None:
+        camera.set(cv2.CAP_PROP_AUTO_EXPOSURE, 1)   # V4L2 manual
+        camera.set(cv2.CAP_PROP_EXPOSURE, exposure)
+    if CAMERA_PASSTHROUGH:
+        camera.set(cv2.CAP_PROP_FORMAT, -1)
+        camera.set(cv2.CAP_PROP_CONVERT_RGB, 0)
+
+def camera_base_size(camera_id):
+    """Capture size when no stream asks for more: the saved resolution, else the default"""
+    settings = get_camera_settings(camera_id)
+    return settings.get('width', CAMERA_WIDTH), settings.get('height', CAMERA_HEIGHT)
+
+def driver_frame_age(camera):
+    """Seconds since the driver captured the last grabbed frame, from its buffer timestamp, if known"""
+    # V4L2 reports the buffer's CLOCK_MONOTONIC timestamp in milliseconds;
+    # other backends report a stream position or nothing
+    stamp = camera.get(cv2.CAP_PROP_POS_MSEC)
+    if stamp <= 0:
+        return None
+    age = time.monotonic() - stamp / 1000.0
+    return age if 0.0 <= age < 10.0 else None
+
+def _age_percentiles(samples):
+    samples = sorted(samples)
+    if not samples:
+        return None
+    pick = lambda q: round(samples[min(len(samples) - 1, int(q * len(samples)))] * 1000, 1)
+    return {'p50_ms': pick(0.5), 'p90_ms': pick(0.9), 'p99_ms': pick(0.99)}
+
+def frame_age_stats(capture):
+    """Driver-queue and capture-to-delivery frame ages for a capture"""
+    return {
+        'driver': _age_percentiles(list(capture.driver_ages)),
+        'delivery': _age_percentiles(list(capture.delivery_ages)),
+        'drained_frames': capture.drained
+    }
+
+@app.route('/camera/<camera_id>/settings', methods=['GET', 'POST'])
+def camera_settings_route(camera_id):
+    """Route to get or change a camera's saved capture settings"""
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or {}
+        if not isinstance(data, dict):
+            return jsonify({'status': 'error', 'message': 'Expected a JSON object'}), 400
+        try:
+            changes = _parse_camera_settings(data)
+        except (TypeError, ValueError) as e:
+            return jsonify({'status': 'error', 'message': f'Invalid camera settings: {e}'}), 400
+        try:
+            update_camera_settings(camera_id, changes)
+        except OSError as e:
+            return jsonify({'status': 'error', 'message': f'Could not save camera settings: {e}'}), 500
+        trace.log('camera', camera_id, f"Camera {camera_id} settings changed: {changes}")
+    capture = camera_captures.get(camera_id)
+    return jsonify({
+        'status': 'success',
+        'camera_id': camera_id,
+        'settings': get_camera_settings(camera_id),
+        'frame_size': list(capture.frame_size) if capture else None,
+        'frame_age': frame_age_stats(capture) if capture else None
+    })
+
+# -------------------- Change detection --------------------
+# A robot parked in front of a static scene still streams a full JPEG every
+# frame. With skipping on for a camera, the capture thread compares a small
+# grayscale copy of each frame against the last frame that counted as a
+# change (passthrough JPEGs are decoded at 1/8 scale for this, so it stays
+# cheap), and stream viewers skip frames with too little change: nothing is
+# encoded or sent for them. A keepalive frame still goes out every
+# CHANGE_KEEPALIVE seconds so a static picture doesn't look like a dead link.
+CHANGE_SKIP = False           # Default for each camera; see POST /camera/<id>/skipping
+CHANGE_THRESHOLD = 0.005      # Fraction of pixels that must change for a frame to be sent
+CHANGE_PIXEL_DELTA = 12       # Grey levels a downscaled pixel must move to count as changed
+CHANGE_KEEPALIVE = 2.0        # Seconds between frames sent to viewers of a static scene
+CHANGE_SIZE = (80, 60)        # Size of the grayscale copy that is compared
+
+class ChangeDetector:
+    """Per-camera frame differencing that lets stream viewers skip unchanged frames"""
+
+    def __init__(self, enabled=CHANGE_SKIP, threshold=CHANGE_THRESHOLD, keepalive=CHANGE_KEEPALIVE):
+        self.enabled = enabled
+        self.threshold = threshold
+        self.keepalive = keepalive
+        self.change_seq = 0       # Most recent frame that differed enough from the reference
+        self.score = 0.0          # Changed fraction of the most recent frame
+        self.frames = 0
+        self.changes = 0
+        self.sent = 0             # Viewer frames let through
+        self.skipped = 0          # Viewer frames skipped as unchanged
+        self.compare_time = 0.0   # Smoothed seconds per comparison
+        self._reference = None
+
+    def observe(self, seq, frame):
+        """Called by the capture thread for each frame while enabled"""
+        started = time.monotonic()
+        if is_jpeg_buffer(frame):
+            gray = cv2.imdecode(frame, cv2.IMREAD_REDUCED_GRAYSCALE_8)
+        else:
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        if gray is None:
+            return
+        small = cv2.resize(gray, CHANGE_SIZE, interpolation=cv2.INTER_AREA)
+        if self._reference is None:
+            self.score = 1.0
+        else:
+            diff = cv2.absdiff(small, self._reference)
+            self.score = cv2.countNonZero(cv2.threshold(diff, CHANGE_PIXEL_DELTA, 255, cv2.THRESH_BINARY)[1]) / diff.size
+        self.frames += 1
+        if self.score >= self.threshold:
+            # Compare against the last change, not the last frame, so slow drift still adds up
+            self._reference = small
+            self.change_seq = seq
+            self.changes += 1
+        self.compare_time = _ewma(self.compare_time, time.monotonic() - started)
+
+    def unchanged(self, seq):
+        """True if frame seq is known not to differ from the last change"""
+        return self.enabled and self.change_seq != seq
+
+    def should_send(self, client, seq):
+        """Viewer side: False if frame seq can be skipped for this client"""
+        if not self.enabled:
+            return True
+        if self.change_seq > client.change_seq or time.monotonic() - client.last_sent >= self.keepalive:
+            client.change_seq = self.change_seq
+            self.sent += 1
+            return True
+        self.skipped += 1
+        return False
+
+    def configure(self, enabled=None, threshold=None, keepalive=None):
+        if enabled is not None:
+            if enabled and not self.enabled:
+                self._reference = None  # Start from a fresh picture
+            self.enabled = enabled
+        if threshold is not None:
+            self.threshold = threshold
+        if keepalive is not None:
+            self.keepalive = keepalive
+
+    def stats(self):
+        viewed = self.sent + self.skipped
+        return {
+            'enabled': self.enabled,
+            'threshold': self.threshold,
+            'pixel_delta': CHANGE_PIXEL_DELTA,
+            'keepalive_s': self.keepalive,
+            'score': round(self.score, 4),
+            'frames_compared': self.frames,
+            'changes': self.changes,
+            'sent': self.sent,
+            'skipped': self.skipped,
+            'skip_ratio': round(self.skipped / viewed, 3) if viewed else 0.0,
+            'compare_ms': round(self.compare_time * 1000, 3)
+        }
+
+@app.route('/camera/<camera_id>/skipping', methods=['GET', 'POST'])
+def camera_skipping(camera_id):
+    """Route to turn unchanged-frame skipping on or off for a camera's streams, or report its effect"""
+    if request.method == 'GET':
+        # A status query reports on a running capture; it never opens the camera
+        capture = camera_captures.get(camera_id)
+        if capture is None:
+            return jsonify(dict(ChangeDetector().stats(), status='success', camera_id=camera_id,
+                                capturing=False, bytes_per_sec=0))
+    else:
+        data = request.get_json(silent=True) or {}
+        if not isinstance(data, dict):
+            return jsonify({'status': 'error', 'message': 'Expected a JSON object'}), 400
+        if 'on' in data and not isinstance(data['on'], bool):
+            return jsonify({'status': 'error', 'message': 'on must be true or false'}), 400
+        if any(isinstance(data.get(name), bool) for name in ('threshold', 'keepalive')):
+            return jsonify({'status': 'error', 'message': 'threshold and keepalive must be numbers'}), 400
+        try:
+            threshold = float(data['threshold']) if 'threshold' in data else None
+            keepalive = float(data['keepalive']) if 'keepalive' in data else None
+        except (TypeError, ValueError):
+            return jsonify({'status': 'error', 'message': 'threshold and keepalive must be numbers'}), 400
+        if threshold is not None and not 0.0 <= threshold <= 1.0:
+            return jsonify({'status': 'error', 'message': 'threshold must be a fraction between 0 and 1'}), 400
+        if keepalive is not None and not 0.1 <= keepalive <= 60.0:
+            return jsonify({'status': 'error', 'message': 'keepalive must be between 0.1 and 60 seconds'}), 400
+        capture = get_capture(camera_id)
+        capture.change.configure(data.get('on'), threshold, keepalive)
+        trace.log('camera', camera_id, f"Frame skipping {'on' if capture.change.enabled else 'off'} "
+                  f"(threshold {capture.change.threshold}, keepalive {capture.change.keepalive}s)")
+    variants = list(capture.variants.values())
+    return jsonify(dict(capture.change.stats(), status='success', camera_id=camera_id, capturing=True,
+                        bytes_per_sec=round(sum(variant.bytes_per_sec for variant in variants))))
+
+# -------------------- Capture worker processes --------------------
+# With GPIO_SERVER_CAPTURE=process each camera's capture thread and JPEG
+# encode run in a child process instead, so their CPU time (and the GIL) stay
+# out of the process answering /control, and a camera driver that crashes or
+# wedges takes down only its worker. The worker writes each full-quality JPEG
+# into a ring of shared-memory slots and sends the slot's sequence number down
+# a pipe; ProcessCapture copies the JPEG out once and fans it out to viewers,
+# snapshots, rewind and recording exactly like a local capture. Scaled or
+# reduced-quality variants are still encoded in the server process. Workers
+# that exit, or stop making progress, are restarted with back-off.
+CAPTURE_MODE = os.environ.get('GPIO_SERVER_CAPTURE', 'thread')   # 'thread' or 'process'
+CAPTURE_WORKER_SLOTS = 4
+CAPTURE_WORKER_SLOT_BYTES = 2 * 1024 * 1024   # Largest JPEG a slot holds; bigger frames are dropped
+CAPTURE_WORKER_START_TIMEOUT = 20.0   # Seconds for a new worker to deliver its first frame or error
+CAPTURE_WORKER_TIMEOUT = 5.0          # Seconds without capture progress before a worker is killed
+CAPTURE_WORKER_RESTART_DELAY = 1.0    # Back-off before a restart, doubled per quick failure
+CAPTURE_WORKER_RESTART_MAX = 30.0
+# Workers run at a lower CPU priority so that, when the board is saturated,
+# the scheduler still gives the control path first claim on a core
+CAPTURE_WORKER_NICE = 10
+
+# How a worker is started; the camera id, shared memory name and pipe fd are appended
+CAPTURE_WORKER_COMMAND = [sys.executable, os.path.abspath(__file__), '--capture-worker']
+
+class CaptureRing:
+    """Shared-memory layout used by a capture worker: a header and a ring of JPEG slots
+
+    Header: progress time (monotonic), frame width and height, capture fps,
+    read errors, mode (1 passthrough, 2 decode) and oversized frames dropped.
+    Each slot has (seq, timestamp, length) followed by its JPEG bytes; a slot
+    is marked seq 0 while being rewritten so readers can detect a torn copy.
+    """
+
+    HEADER = struct.Struct('<dIIdIII')
+    SLOT = struct.Struct('<QdI4x')
+    MODES = {None: 0, 'passthrough': 1, 'decode': 2}
+
+    def __init__(self, buf, slots=CAPTURE_WORKER_SLOTS, slot_bytes=CAPTURE_WORKER_SLOT_BYTES):
+        self.buf = buf
+        self.slots = slots
+        self.slot_bytes = slot_bytes
+        self._data_start = 64 + slots * self.SLOT.size
+
+    @classmethod
+    def size(cls, slots=CAPTURE_WORKER_SLOTS, slot_bytes=CAPTURE_WORKER_SLOT_BYTES):
+        return 64 + slots * (cls.SLOT.size + slot_bytes)
+
+    def header(self):
+        progress, width, height, fps, read_errors, mode, oversized = self.HEADER.unpack_from(self.buf, 0)
+        modes = {value: name for name, value in self.MODES.items()}
+        return {'progress': progress, 'frame_size': (width, height), 'fps': fps,
+                'read_errors': read_errors, 'mode': modes.get(mode), 'oversized': oversized}
+
+    def write_header(self, progress, frame_size, fps, read_errors, mode, oversized):
+        self.HEADER.pack_into(self.buf, 0, progress, frame_size[0], frame_size[1], fps or 0.0,
+                              read_errors, self.MODES.get(mode, 0), oversized)
+
+    def write(self, seq, timestamp, jpeg):
+        """Worker side: store a JPEG in seq's slot; False if it doesn't fit"""
+        data = memoryview(jpeg).cast('B')
+        if len(data) > self.slot_bytes:
+            return False
+        slot = seq % self.slots
+        start = self._data_start + slot * self.slot_bytes
+        self.SLOT.pack_into(self.buf, 64 + slot * self.SLOT.size, 0, 0.0, 0)
+        self.buf[start:start + len(data)] = data
+        self.SLOT.pack_into(self.buf, 64 + slot * self.SLOT.size, seq, timestamp, len(data))
+        return True
+
+    def read(self, seq):
+        """Server side: (timestamp, jpeg) copied out of seq's slot, or None if it was overwritten"""
+        slot = seq % self.slots
+        stored, timestamp, length = self.SLOT.unpack_from(self.buf, 64 + slot * self.SLOT.size)
+        if stored != seq:
+            return None
+        start = self._data_start + slot * self.slot_bytes
+        jpeg = mjpeg_payload(self.buf[start:start + length])
+        if self.SLOT.unpack_from(self.buf, 64 + slot * self.SLOT.size)[0] != seq:
+            return None  # The worker lapped us mid-copy
+        return timestamp, jpeg
+
+class ProcessCapture(CameraCapture):
+    """CameraCapture fed by a supervised worker process that owns the device and the encoder"""
+
+    def __init__(self, camera_id):
+        super().__init__(camera_id)
+        self.worker = None          # subprocess.Popen of the running worker
+        self.worker_mode = None     # The worker's own capture mode
+        self.restarts = 0
+        self.torn_frames = 0        # Slots overwritten before they could be copied
+        self.fps = 0.0
+        self._oversized = 0
+        self._sent_size = None
+        self._ring = None
+
+    def _run(self):
+        from multiprocessing import shared_memory
+
+        shm = shared_memory.SharedMemory(create=True, size=CaptureRing.size())
+        self._ring = CaptureRing(shm.buf)
+        delay = CAPTURE_WORKER_RESTART_DELAY
+        try:
+            while self._running:
+                started = time.monotonic()
+                exit_reason = self._supervise(shm.name)
+                if not self._running:
+                    break
+                self.restarts += 1
+                self.read_errors += 1
+                self._read_failures.inc()
+                trace.log('camera', self.camera_id, f"Capture worker for camera {self.camera_id} {exit_reason}; restarting")
+                if self.read_errors == 1:
+                    status_hub.set_camera(self.camera_id, False, 'lost')
+                if time.monotonic() - started > CAPTURE_WORKER_RESTART_MAX:
+                    delay = CAPTURE_WORKER_RESTART_DELAY  # It ran fine for a while; not a crash loop
+                with self._cond:
+                    self._cond.wait_for(lambda: not self._running, delay)
+                delay = min(CAPTURE_WORKER_RESTART_MAX, delay * 2)
+        finally:
+            self._ring = None
+            shm.close()
+            shm.unlink()
+
+    def _supervise(self, shm_name):
+        """Run one worker until it exits, hangs or the capture stops; returns why it ended"""
+        ring = self._ring
+        ring.write_header(0.0, self.frame_size, 0.0, 0, None, 0)
+        read_fd, write_fd = os.pipe()
+        try:
+            worker = subprocess.Popen(CAPTURE_WORKER_COMMAND + [self.camera_id, shm_name, str(write_fd)],
+                                      stdin=subprocess.PIPE, pass_fds=(write_fd,))
+        except OSError as e:
+            os.close(read_fd)
+            return f"failed to start ({e})"
+        finally:
+            os.close(write_fd)
+        with self._cond:
+            self.worker = worker
+            self.worker_mode = None
+            self._sent_size = None
+            self._send_size()
+        spawned = time.monotonic()
+        pending = b''
+        try:
+            while self._running:
+                ready, _, _ = select.select([read_fd], [], [], 0.25)
+                newest = None
+                if ready:
+                    data = os.read(read_fd, 4096)
+                    if not data:
+                        return f"exited with code {worker.wait()}"
+                    # Each message is a slot sequence number; only the newest matters
+                    pending += data
+                    usable = len(pending) - len(pending) % 8
+                    if usable:
+                        newest = struct.unpack_from('<Q', pending, usable - 8)[0]
+                        pending = pending[usable:]
+
+                # The worker updates the header before notifying, so it describes this frame
+                header = ring.header()
+                self._sync_worker_state(header)
+                if newest is not None:
+                    self._publish(ring, newest)
+                if header['progress']:
+                    stalled, limit = time.monotonic() - header['progress'], CAPTURE_WORKER_TIMEOUT
+                else:
+                    stalled, limit = time.monotonic() - spawned, CAPTURE_WORKER_START_TIMEOUT
+                if stalled > limit:
+                    return f"made no progress for {stalled:.1f}s"
+            return 'stopped'
+        finally:
+            os.close(read_fd)
+            with self._cond:
+                self.worker = None
+            self._stop_worker(worker)
+
+    def _stop_worker(self, worker):
+        # Closing stdin asks the worker to release the camera and exit
+        try:
+            worker.stdin.close()
+        except OSError:
+            pass
+        try:
+            worker.wait(timeout=2.0)
+        except subprocess.TimeoutExpired:
+            worker.kill()
+            worker.wait()
+
+    def _sync_worker_state(self, header):
+        if header['frame_size'][0]:
+            self.frame_size = header['frame_size']
+        self.fps = header['fps']
+        self._oversized = header['oversized']
+        if header['mode'] is not None and self.worker_mode is None:
+            print(f"Camera {self.camera_id} capture mode: {header['mode']} (worker process)")
+        self.worker_mode = header['mode']
+        if header['read_errors']:
+            # Cleared again by the next frame that arrives
+            if not self.read_errors:
+                status_hub.set_camera(self.camera_id, False, 'lost')
+            self.read_errors = header['read_errors']
+
+    def _publish(self, ring, worker_seq):
+        import numpy as np
+
+        result = ring.read(worker_seq)
+        if result is None:
+            self.torn_frames += 1
+            return
+        timestamp, jpeg = result
+        if self.read_errors:
+            self.read_errors = 0
+            status_hub.set_camera(self.camera_id, True, 'opened')
+        if self.worker_mode == 'passthrough':
+            self.passthrough_frames += 1
+        else:
+            self.encodes += 1
+        if self.seq == 0:
+            readiness.milestone('first_frame')
+        # Frames are the JPEGs themselves; the array is a view of the multipart part
+        frame = np.frombuffer(jpeg, np.uint8)
+        self.mode = 'passthrough'
+        if self.change.enabled:
+            self.change.observe(self.seq + 1, frame)
+        with self._cond:
+            self.frame = frame
+            self.seq += 1
+            self.timestamp = timestamp
+            item = (self.seq, timestamp, frame)
+            # The worker already encoded this frame at full quality
+            self.native.jpegs[JPEG_QUALITY] = (self.seq, timestamp, jpeg)
+            clients = list(self.clients)
+            self._cond.notify_all()
+        for client in clients:
+            client.offer(item)
+        self._prefetch(item, clients)
+
+    def _update_desired_size(self):
+        super()._update_desired_size()
+        self._send_size()
+
+    def _send_size(self):
+        # Called with self._cond held; the worker applies it like a local capture would
+        if self._desired_size != self._sent_size and self._send(f"size {self._desired_size[0]} {self._desired_size[1]}"):
+            self._sent_size = self._desired_size
+
+    def reload_settings(self):
+        # The worker owns the device; it rereads the saved settings and applies
+        # them, then gets sent the size our viewers need again
+        with self._cond:
+            self._send('reload')
+            self._sent_size = None
+        super().reload_settings()
+
+    def _send(self, command):
+        worker = self.worker
+        if worker is None:
+            return False
+        try:
+            worker.stdin.write(f"{command}\n".encode())
+            worker.stdin.flush()
+            return True
+        except (OSError, ValueError):
+            return False  # Worker is going away; the next one starts from the current state
+
+    def worker_stats(self):
+        worker = self.worker
+        return {
+            'pid': worker.pid if worker is not None else None,
+            'mode': self.worker_mode,
+            'restarts': self.restarts,
+            'torn_frames': self.torn_frames,
+            'oversized_frames': self._oversized
+        }
+
+def run_capture_worker(camera_id, shm_name, notify_fd):
+    """Entry point of a capture worker process (see ProcessCapture)"""
+    from multiprocessing import resource_tracker, shared_memory
+
+    global REWIND_SECONDS
+    REWIND_SECONDS = 0  # The server keeps the rewind buffer
+    if CAPTURE_WORKER_NICE:
+        os.nice(CAPTURE_WORKER_NICE)
+    shm = shared_memory.SharedMemory(name=shm_name)
+    # The server owns the segment; don't let this process's tracker unlink it at exit
+    resource_tracker.unregister(shm._name, 'shared_memory')
+    ring = CaptureRing(shm.buf)
+    notify_fd = int(notify_fd)
+    done = threading.Event()
+    capture = CameraCapture(camera_id)
+
+    def read_commands():
+        # One command per line on stdin; EOF means the server wants us gone
+        for line in sys.stdin.buffer:
+            parts = line.split()
+            if len(parts) == 3 and parts[0] == b'size':
+                capture._desired_size = (min(int(parts[1]), CAMERA_MAX_WIDTH), min(int(parts[2]), CAMERA_MAX_HEIGHT))
+            elif parts == [b'reload']:
+                load_camera_settings(force=True)
+                capture.reload_settings()
+        done.set()
+
+    threading.Thread(target=read_commands, name="worker-commands", daemon=True).start()
+    capture.start()
+    written = notified = 0
+    last_seq = 0
+    last_errors = 0
+    oversized = 0
+    fps = 0.0
+    progress = 0.0
+    try:
+        while not done.is_set():
+            item = capture.wait_for_frame(last_seq, timeout=0.5)
+            if capture.read_errors != last_errors:
+                last_errors = capture.read_errors
+                progress = time.monotonic()
+            if item is not None:
+                seq, timestamp, frame = item
+                last_seq = seq
+                progress = time.monotonic()
+                if fps == 0.0 and camera_id in cameras:
+                    fps = cameras[camera_id].get(cv2.CAP_PROP_FPS)
+                if is_jpeg_buffer(frame):
+                    jpeg = frame
+                else:
+                    result = capture.native.encode(seq, timestamp, frame, JPEG_QUALITY)
+                    jpeg = result[2] if result is not None else None
+                if jpeg is not None and ring.write(written + 1, timestamp, jpeg):
+                    written += 1
+                elif jpeg is not None:
+                    oversized += 1
+            # The header goes out before the notification, so the server never
+            # sees a new frame alongside stale error counts
+            ring.write_header(progress, capture.frame_size, fps, capture.read_errors, capture.mode, oversized)
+            if item is not None and written > notified:
+                notified = written
+                os.write(notify_fd, struct.pack('<Q', written))
+    except BrokenPipeError:
+        pass  # Server went away
+    finally:
+        capture.stop()
+        for camera in cameras.values():
+            camera.release()
+        shm.close()
+    return 0
+
+# -------------------- Rewind buffer --------------------
+# A capture keeps its last REWIND_SECONDS of JPEGs so an operator can look
+# back at something they missed. Frames are copied into one byte arena
+# allocated up front, with a ring index of (seq, timestamp, offset, length),
+# so memory is fixed no matter how big the frames get. A feeder thread takes
+# frames like a viewer and uses the shared encode cache, so the live stream
+# path is not touched. The buffer costs an encode per kept frame and a whole
+# arena, so it only exists for cameras whose 'rewind' setting is on (kept
+# for as long as the capture runs) or once a rewind route is used (then
+# dropped after REWIND_IDLE_SECONDS without a read).
+REWIND_SECONDS = 30            # Look-back window per camera; 0 disables the buffer
+REWIND_FPS = 10                # Frames per second kept
+REWIND_BUFFER_BYTES = 16 * 2**20
+REWIND_QUALITY = JPEG_QUALITY  # Same as live streams, so encodes are shared via the JPEG cache
+REWIND_IDLE_SECONDS = 600      # An on-demand buffer stops this long after it was last read
+
+class RewindBuffer:
+    """Fixed-size byte arena of a camera's recent JPEGs with a ring index by time"""
+
+    def __init__(self, capture, seconds=REWIND_SECONDS, fps=REWIND_FPS, capacity=REWIND_BUFFER_BYTES,
+                 quality=REWIND_QUALITY, idle_timeout=None):
+        self.capture = capture
+        self.idle_timeout = idle_timeout   # Stop after this long without a read; None keeps it running
+        self.last_read = time.monotonic()
+        self.seconds = seconds
+        self.fps = fps
+        self.quality = quality
+        self.arena = bytearray(capacity)
+        slots = int(seconds * fps) + 2
+        self._seqs = array.array('q', bytes(8 * slots))
+        self._timestamps = array.array('d', bytes(8 * slots))
+        self._offsets = array.array('q', bytes(8 * slots))
+        self._lengths = array.array('q', bytes(8 * slots))
+        self._head = 0            # Slot of the oldest frame
+        self._count = 0
+        self._write_pos = 0       # Arena offset for the next frame
+        self.stored = 0
+        self.evicted = 0
+        self.oversized = 0        # Frames larger than a quarter of the arena, not kept
+        self._lock = threading.Lock()
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name=f"rewind-{self.capture.camera_id}", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=2.0)
+        self._thread = None
+
+    def _run(self):
+        period = 1.0 / self.fps
+        next_due = 0.0
+        last_seq = 0
+        while self._running:
+            if self.idle_timeout is not None and time.monotonic() - self.last_read > self.idle_timeout:
+                # Nobody is looking back: stop encoding and let the arena go
+                print(f"Camera {self.capture.camera_id} rewind buffer idle, stopping")
+                self._running = False
+                self.capture._rewind_idle(self)
+                break
+            delay = next_due - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            # Not a subscriber: waits like a snapshot, so it doesn't count as a viewer
+            item = self.capture.wait_for_frame(last_seq)
+            if item is None:
+                continue
+            last_seq = item[0]
+            next_due = time.monotonic() + period
+            result = self.capture.native.encode(*item, quality=self.quality)
+            if result is not None:
+                self.append(*result)
+
+    def append(self, seq, timestamp, jpeg):
+        """Copy a JPEG into the arena, evicting whatever it overwrites or has aged out"""
+        size = len(jpeg)
+        if size > len(self.arena) // 4:
+            self.oversized += 1
+            return
+        with self._lock:
+            start = self._write_pos
+            if start + size > len(self.arena):
+                # Doesn't fit before the end: everything left in the tail is older than what's at the front
+                self._evict_while(lambda offset, length: offset >= start)
+                start = 0
+            end = start + size
+            slots = len(self._seqs)
+            cutoff = timestamp - self.seconds
+            self._evict_while(lambda offset, length: offset < end and offset + length > start)
+            while self._count and (self._count == slots or self._timestamps[self._head] < cutoff):
+                self._evict_oldest()
+
+            self.arena[start:end] = jpeg
+            slot = (self._head + self._count) % slots
+            self._seqs[slot] = seq
+            self._timestamps[slot] = timestamp
+            self._offsets[slot] = start
+            self._lengths[slot] = size
+            self._count += 1
+            self._write_pos = end
+            self.stored += 1
+
+    def _evict_while(self, overlaps):
+        while self._count and overlaps(self._offsets[self._head], self._lengths[self._head]):
+            self._evict_oldest()
+
+    def _evict_oldest(self):
+        self._head = (self._head + 1) % len(self._seqs)
+        self._count -= 1
+        self.evicted += 1
+
+    def _slot(self, k):
+        """Ring slot of the k-th oldest frame"""
+        return (self._head + k) % len(self._seqs)
+
+    def _find(self, timestamp):
+        """Number of buffered frames captured at or before timestamp (lock held)"""
+        low, high = 0, self._count
+        while low < high:
+            mid = (low + high) // 2
+            if self._timestamps[self._slot(mid)] <= timestamp:
+                low = mid + 1
+            else:
+                high = mid
+        return low
+
+    def frames(self):
+        """[(seq, timestamp)] of everything buffered, oldest first"""
+        self.last_read = time.monotonic()
+        with self._lock:
+            return [(self._seqs[self._slot(k)], self._timestamps[self._slot(k)]) for k in range(self._count)]
+
+    def frame_at(self, timestamp):
+        """(seq, timestamp, jpeg) of the last frame captured at or before timestamp (else the oldest), or None"""
+        self.last_read = time.monotonic()
+        with self._lock:
+            if not self._count:
+                return None
+            k = max(0, self._find(timestamp) - 1)
+            return self._read(self._slot(k))
+
+    def frame_after(self, seq):
+        """The oldest buffered frame newer than seq, or None"""
+        self.last_read = time.monotonic()
+        with self._lock:
+            for k in range(self._count):
+                slot = self._slot(k)
+                if self._seqs[slot] > seq:
+                    return self._read(slot)
+        return None
+
+    def _read(self, slot):
+        offset = self._offsets[slot]
+        # Copied out under the lock: the arena slot may be reused right after
+        return self._seqs[slot], self._timestamps[slot], bytes(self.arena[offset:offset + self._lengths[slot]])
+
+    def replay(self, start, end=None, speed=1.0):
+        """Yield (delay, seq, timestamp, jpeg) for frames from start to end, delays keeping their original spacing"""
+        item = self.frame_at(start)
+        if item is None or (end is not None and item[1] > end):
+            return
+        previous = item[1]
+        while item is not None and (end is None or item[1] <= end):
+            seq, timestamp, jpeg = item
+            yield max(0.0, (timestamp - previous) / speed), seq, timestamp, jpeg
+            previous = timestamp
+            item = self.frame_after(seq)
+
+    def stats(self):
+        with self._lock:
+            count = self._count
+            oldest = self._timestamps[self._head] if count else None
+            newest = self._timestamps[self._slot(count - 1)] if count else None
+            used = sum(self._lengths[self._slot(k)] for k in range(count))
+        return {
+            'frames': count,
+            'oldest': oldest,
+            'newest': newest,
+            'seconds': round(newest - oldest, 2) if count else 0.0,
+            'window_seconds': self.seconds,
+            'fps': self.fps,
+            'bytes_used': used,
+            'capacity_bytes': len(self.arena),
+            'stored': self.stored,
+            'evicted': self.evicted,
+            'oversized': self.oversized
+        }
+
+def _rewind_for(camera_id):
+    """The rewind buffer of a running capture, started on first use; None if there is none"""
+    capture = camera_captures.get(camera_id)
+    return capture.enable_rewind() if capture is not None else None
+
+def _rewind_time(args, default=None):
+    """Parse ?t=<unix time> or ?ago=<seconds> into a timestamp"""
+    if 't' in args:
+        return float(args['t'])
+    if 'ago' in args:
+        return time.time() - float(args['ago'])
+    return default
+
+def _rewind_span(args):
+    """(start, end, speed) for a replay from ?t=/?ago= (default the oldest frame) to ?until= (default now)"""
+    now = time.time()  # Without ?until= the replay stops at the request, not at the live edge
+    start = _rewind_time(args, 0.0)
+    end = float(args['until']) if 'until' in args else now
+    speed = max(0.1, min(16.0, float(args.get('speed', 1.0))))
+    return start, end, speed
+
+@app.route('/camera/<camera_id>/rewind', methods=['GET'])
+def camera_rewind(camera_id):
+    """Route to list the frames held in a camera's rewind buffer"""
+    rewind = _rewind_for(camera_id)
+    if rewind is None:
+        return jsonify({'status': 'error', 'message': f'Camera {camera_id} has no rewind buffer running'}), 404
+    return jsonify({
+        'status': 'success',
+        'camera_id': camera_id,
+        **rewind.stats(),
+        'timestamps': [{'seq': seq, 't': timestamp} for seq, timestamp in rewind.frames()]
+    })
+
+@app.route('/camera/<camera_id>/rewind/frame', methods=['GET'])
+def camera_rewind_frame(camera_id):
+    """Route to fetch the buffered frame nearest before ?t= (or ?ago= seconds back)"""
+    rewind = _rewind_for(camera_id)
+    if rewind is None:
+        return jsonify({'status': 'error', 'message': f'Camera {camera_id} has no rewind buffer running'}), 404
+    try:
+        timestamp = _rewind_time(request.args, time.time())
+    except ValueError:
+        return jsonify({'status': 'error', 'message': 't and ago must be numbers'}), 400
+    result = rewind.frame_at(timestamp)
+    if result is None:
+        return jsonify({'status': 'error', 'message': 'No frames buffered yet'}), 404
+    seq, timestamp, jpeg = result
+    response = Response(jpeg, mimetype='image/jpeg')
+    response.headers['X-Frame-Seq'] = str(seq)
+    response.headers['X-Frame-Timestamp'] = f'{timestamp:.3f}'
+    return response
+
+def generate_rewind_frames(rewind, start, end, speed):
+    """Replay buffered frames as MJPEG at their original pace (times speed)"""
+    for delay, _, _, jpeg in rewind.replay(start, end, speed):
+        if delay:
+            time.sleep(delay)
+        yield mjpeg_part(jpeg)
+
+@app.route('/camera/<camera_id>/rewind/replay', methods=['GET'])
+def camera_rewind_replay(camera_id):
+    """Route to replay a span of the rewind buffer (?t=/?ago=, ?until=, ?speed=) as MJPEG"""
+    rewind = _rewind_for(camera_id)
+    if rewind is None:
+        return jsonify({'status': 'error', 'message': f'Camera {camera_id} has no rewind buffer running'}), 404
+    try:
+        start, end, speed = _rewind_span(request.args)
+    except ValueError:
+        return jsonify({'status': 'error', 'message': 't, ago, until and speed must be numbers'}), 400
+    return Response(generate_rewind_frames(rewind, start, end, speed),
+                    mimetype='multipart/x-mixed-replace; boundary=frame')
+
+# -------------------- Composite streams --------------------
+# Several cameras tiled (or picture-in-picture) into one MJPEG stream, so a
+# front/rear pair costs one connection and one encode per output frame. The
+# first camera's frames pace the composite; each output frame takes every
+# camera's newest frame at that moment, which keeps them time-aligned.
+COMPOSITE_LAYOUTS = ('tile', 'pip')
+COMPOSITE_PIP_SCALE = 4       # Insets are 1/4 of the output width and height
+COMPOSITE_PIP_MARGIN = 8      # Pixels between insets and the output edge
+
+composites = {}
+_composites_lock = threading.Lock()
+
+class CameraComposite:
+    """Composes several cameras into one preallocated image and encodes it once per output frame
+
+    The one encode is shared by every viewer, so it uses the highest quality
+    any of them currently wants: adaptive viewers only lower it when all of
+    them are falling behind, and otherwise adapt by frame rate alone.
+    """
+
+    def __init__(self, camera_ids, layout='tile', width=None, height=None, quality=JPEG_QUALITY):
+        import numpy as np
+
+        self.camera_ids = tuple(camera_ids)
+        self.layout = layout
+        self.quality = quality
+        self.name = f"{'+'.join(self.camera_ids)}:{layout}"
+        self.key = None           # Registry key, set by acquire_composite()
+        count = len(self.camera_ids)
+        self.columns = math.ceil(math.sqrt(count)) if layout == 'tile' else 1
+        self.rows = math.ceil(count / self.columns) if layout == 'tile' else 1
+        self.width = width or CAMERA_WIDTH
+        # Default to 4:3 tiles (or a 4:3 frame for picture-in-picture)
+        self.height = height or round(self.width * 3 / 4 * self.rows / self.columns)
+        self.subscribers = 0
+        self.clients = set()
+        self.seq = 0
+        self.timestamp = 0.0
+        self.frames = 0
+        self.redraws = 0          # Cells scaled into the canvas
+        self.torn = 0             # Output frames dropped because a source buffer was reused mid-draw
+        self.encode_quality = quality
+        self.bytes_out = 0
+        self.skew = 0.0           # Smoothed spread of the source frames' capture times
+        self.compose_time = 0.0   # Smoothed seconds to scale cells per output frame
+        self.encode_time = 0.0    # Smoothed seconds to encode one output frame
+        # One output canvas for the life of the composite; each cell is a view into it
+        self.canvas = np.zeros((self.height, self.width, 3), np.uint8)
+        self.cells = [self.canvas[y:y + h, x:x + w] for x, y, w, h in self._cell_rects()]
+        self._cond = threading.Condition()
+        self._running = False
+        self._thread = None
+        self._encode_seconds = metric_histogram(
+            'jpeg_encode_seconds', 'Time to scale and encode one JPEG', camera=self.name, variant='composite')
+
+    def _cell_rects(self):
+        """(x, y, width, height) of each camera's cell, in drawing order"""
+        if self.layout == 'pip':
+            inset_w, inset_h = self.width // COMPOSITE_PIP_SCALE, self.height // COMPOSITE_PIP_SCALE
+            rects = [(0, 0, self.width, self.height)]
+            for i in range(1, len(self.camera_ids)):
+                x = self.width - i * (inset_w + COMPOSITE_PIP_MARGIN)
+                rects.append((max(0, x), self.height - inset_h - COMPOSITE_PIP_MARGIN, inset_w, inset_h))
+            return rects
+        cell_w, cell_h = self.width // self.columns, self.height // self.rows
+        return [((i % self.columns) * cell_w, (i // self.columns) * cell_h, cell_w, cell_h)
+                for i in range(len(self.camera_ids))]
+
+    @property
+    def running(self):
+        return self._running
+
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name=f"composite-{self.name}", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        with self._cond:
+            clients = list(self.clients)
+        for client in clients:
+            client.wake()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=2.0)
+        self._thread = None
+
+    def subscribe(self, client):
+        with self._cond:
+            self.clients.add(client)
+
+    def unsubscribe(self, client):
+        with self._cond:
+            self.clients.discard(client)
+
+    def _run(self):
+        captures = [get_capture(camera_id) for camera_id in self.camera_ids]
+        primary = captures[0]
+        drawn = [0] * len(captures)
+        period = 1.0 / STREAM_MAX_FPS
+        next_due = 0.0
+        while self._running:
+            # Paced by the first camera; a stalled primary still lets the others update
+            primary.wait_for_frame(drawn[0], timeout=1.0)
+            delay = next_due - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            next_due = time.monotonic() + period
+
+            started = time.monotonic()
+            latest = [capture.latest() for capture in captures]
+            changed = [seq != drawn[i] and frame is not None for i, (seq, _, frame) in enumerate(latest)]
+            if not any(changed):
+                continue
+            if self.layout == 'pip' and changed[0]:
+                # The main picture covers the insets; draw them again on top
+                changed = [frame is not None for _, _, frame in latest]
+            torn = False
+            for i, (seq, _, frame) in enumerate(latest):
+                if changed[i]:
+                    self._draw(i, captures[i].pixels(seq, frame))
+                    if not captures[i].frame_intact(seq):
+                        # A newer read overwrote the buffer while it was scaled;
+                        # leave the cell to be redrawn from the next frame
+                        torn = True
+                        continue
+                    drawn[i] = seq
+            if torn:
+                self.torn += 1
+                continue
+            timestamps = [timestamp for seq, timestamp, frame in latest if frame is not None]
+            self.skew = _ewma(self.skew, max(timestamps) - min(timestamps))
+            self.compose_time = _ewma(self.compose_time, time.monotonic() - started)
+
+            with self._cond:
+                self.encode_quality = max((client.quality for client in self.clients), default=self.quality)
+            started = time.monotonic()
+            ret, jpeg = cv2.imencode('.jpg', self.canvas, [cv2.IMWRITE_JPEG_QUALITY, self.encode_quality])
+            if not ret:
+                continue
+            elapsed = time.monotonic() - started
+            self.encode_time = _ewma(self.encode_time, elapsed)
+            self._encode_seconds.observe(elapsed)
+            jpeg = mjpeg_payload(jpeg)
+            self.frames += 1
+            self.bytes_out += len(jpeg)
+
+            with self._cond:
+                self.seq += 1
+                # Age the output by its oldest source frame
+                self.timestamp = min(timestamps)
+                item = (self.seq, self.timestamp, jpeg)
+                clients = list(self.clients)
+            for client in clients:
+                client.offer(item)
+
+    def _draw(self, index, image):
+        cell = self.cells[index]
+        if image is None or image.ndim < 3:
+            return
+        height, width = cell.shape[:2]
+        if image.shape[:2] == (height, width):
+            cell[...] = image
+        else:
+            # Scale straight into the canvas; no intermediate image
+            cv2.resize(image, (width, height), dst=cell, interpolation=cv2.INTER_AREA)
+        self.redraws += 1
+
+    def stats(self):
+        return {
+            'name': self.name,
+            'cameras': list(self.camera_ids),
+            'layout': self.layout,
+            'size': [self.width, self.height],
+            'quality': self.quality,
+            'encode_quality': self.encode_quality,
+            'subscribers': self.subscribers,
+            'viewers': len(self.clients),
+            'frames': self.frames,
+            'cell_redraws': self.redraws,
+            'torn_frames': self.torn,
+            'skew_ms': round(self.skew * 1000, 1),
+            'compose_ms': round(self.compose_time * 1000, 2),
+            'encode_ms': round(self.encode_time * 1000, 2),
+            'bytes_out': self.bytes_out,
+            'clients': [client.stats() for client in list(self.clients)]
+        }
+
+def acquire_composite(camera_ids, layout='tile', width=None, height=None, quality=JPEG_QUALITY):
+    """Get the shared composite for these cameras and settings, starting it for the first subscriber"""
+    key = (tuple(camera_ids), layout, width, height, quality)
+    with _composites_lock:
+        composite = composites.get(key)
+        if composite is None:
+            composite = CameraComposite(camera_ids, layout, width, height, quality)
+            composite.key = key
+            composites[key] = composite
+        composite.subscribers += 1
+    composite.start()
+    return composite
+
+def release_composite(composite):
+    """Drop a subscription; the last subscriber stops the composite"""
+    with _composites_lock:
+        composite.subscribers = max(0, composite.subscribers - 1)
+        if composite.subscribers:
+            return
+        if composites.get(composite.key) is composite:
+            del composites[composite.key]
+    composite.stop()
+
+def _composite_params(args):
+    """Parse ?cameras=0,1&layout=tile|pip (plus the stream size/quality) for a composite"""
+    camera_ids = [camera_id.strip() for camera_id in args.get('cameras', '').split(',') if camera_id.strip()]
+    if not camera_ids:
+        raise ValueError("cameras must list at least one camera, e.g. ?cameras=0,1")
+    layout = args.get('layout', 'tile')
+    if layout not in COMPOSITE_LAYOUTS:
+        raise ValueError(f"layout must be one of {', '.join(COMPOSITE_LAYOUTS)}")
+    width, height, quality = _stream_params(args)
+    return camera_ids, layout, width, height, quality
+
+def generate_composite_frames(composite, pacing=STREAM_PACING):
+    """Generate composite frames for MJPEG streaming"""
+    client = StreamClient(adaptive=(pacing == 'adaptive'), max_quality=composite.quality)
+    composite.subscribe(client)
+    next_due = 0.0
+
+    try:
+        while composite.running:
+            delay = next_due - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+
+            item = client.take()
+            if item is None:
+                continue
+            _, timestamp, jpeg = item
+
+            started = time.monotonic()
+            yield mjpeg_part(jpeg)
+            client.record_sent(time.monotonic() - started, len(jpeg), timestamp)
+            next_due = started + 1.0 / client.target_fps
+    finally:
+        composite.unsubscribe(client)
+        release_composite(composite)
+
+@app.route('/composite/stream')
+def composite_stream():
+    """Route to stream several cameras tiled into one MJPEG stream"""
+    try:
+        params = _composite_params(request.args)
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    pacing = request.args.get('pacing', STREAM_PACING)
+    if pacing not in ('adaptive', 'fixed'):
+        pacing = STREAM_PACING
+    return Response(generate_composite_frames(acquire_composite(*params), pacing),
+                    mimetype='multipart/x-mixed-replace; boundary=frame')
+
+@app.route('/composite', methods=['GET'])
+def composite_status():
+    """Route to list the composite streams currently being served"""
+    return jsonify({
+        'status': 'success',
+        'composites': [composite.stats() for composite in list(composites.values())]
+    })
+
+# -------------------- Camera inventory --------------------
+# Cameras are enumerated from sysfs, which gives names and node types without
+# opening anything. A background thread watches the node list so hotplugged
+# cameras show up (and unplugged ones disappear) without a rescan per request.
+V4L2_SYSFS = '/sys/class/video4linux'
+CAMERA_SCAN_INTERVAL = 2.0  # Seconds between checks for added/removed devices
+
+def _read_sysfs(path):
+    try:
+        with open(path, 'r') as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+def scan_sysfs_cameras():
+    """List V4L2 capture nodes and their names from sysfs"""
+    detected = {}
+    for node in os.listdir(V4L2_SYSFS):
+        cam_id = node.replace('video', '')
+        if not node.startswith('video') or not cam_id.isdigit():
+            continue
+        name = _read_sysfs(os.path.join(V4L2_SYSFS, node, 'name')) or f"Camera {cam_id}"
+        # A USB camera registers several nodes; only index 0 captures video,
+        # the others carry metadata
+        index = _read_sysfs(os.path.join(V4L2_SYSFS, node, 'index'))
+        detected[cam_id] = {
+            "available": index in (None, '0') and os.path.exists(f'/dev/{node}'),
+            "name": name
+        }
+    return detected
+
+class CameraInventory:
+    """Cached camera list, refreshed in the background when video devices change"""
+
+    def __init__(self, interval=CAMERA_SCAN_INTERVAL):
+        self.interval = interval
+        self.cameras = {}
+        self.scans = 0
+        self.last_scan = 0.0
+        self._signature = None
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def _current_signature(self):
+        if os.path.isdir(V4L2_SYSFS):
+            return tuple(sorted(os.listdir(V4L2_SYSFS)))
+        return tuple(sorted(d for d in os.listdir('/dev') if d.startswith('video'))) if os.path.isdir('/dev') else ()
+
+    def refresh(self):
+        with self._lock:
+            signature = self._current_signature()
+            if os.path.isdir(V4L2_SYSFS):
+                detected = scan_sysfs_cameras()
+            else:
+                detected = detect_system_cameras()
+            # Swap in a new dict so readers never see a half-built inventory
+            self.cameras = detected
+            self._signature = signature
+            self.scans += 1
+            self.last_scan = time.time()
+
+    def start(self):
+        if self._thread is not None:
+            return
+        # sysfs scans are cheap enough to do inline; probing by opening
+        # devices is left to the background thread
+        if os.path.isdir(V4L2_SYSFS):
+            self.refresh()
+        self._thread = threading.Thread(target=self._run, name="camera-inventory", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        if self.scans == 0:
+            self.refresh()
+        while True:
+            time.sleep(self.interval)
+            try:
+                if self._current_signature() != self._signature:
+                    self.refresh()
+                    print(f"Camera inventory changed: {sorted(self.cameras)}")
+                    status_hub.publish('cameras', cameras=self.cameras)
+            except Exception as e:
+                trace.log('camera', 'inventory', f"Camera inventory error: {e}")
+
+camera_inventory = CameraInventory()
+
 @app.route('/camera/<camera_id>/release', methods=['POST'])
 def release_camera(camera_id):
     """Route to release a camera"""
-    if camera_id in cameras:
-        with camera_locks[camera_id]:
-            cameras[camera_id].release()
+    if camera_id in cameras or camera_id in camera_captures:
+        # Stop the reader thread (or worker process) first so it isn't mid-read on the device
+        stop_recording(camera_id)
+        stop_capture(camera_id)
+        if camera_id in cameras:
+            with camera_locks[camera_id]:
+                cameras[camera_id].release()
+        status_hub.set_camera(camera_id, False, 'released')
         
         return jsonify({
             'status': 'success',
@@ -645,50 +3816,441 @@ def release_camera(camera_id):
         }), 404
 
 
+# -------------------- Recording --------------------
+# Records the frames the capture thread already produces into time-segmented
+# MJPEG files (concatenated JPEGs; play with e.g. `ffplay -f mjpeg`). A feeder
+# thread takes frames like a stream viewer and hands them to a bounded queue;
+# a separate writer thread owns the files. If storage falls behind, the queue
+# fills and frames are dropped instead of stalling capture or live streams.
+RECORDING_DIR = os.environ.get('GPIO_SERVER_RECORDINGS',
+                               os.path.join(os.path.dirname(os.path.abspath(__file__)), 'recordings'))
+RECORDING_FPS = 10
+RECORDING_QUALITY = JPEG_QUALITY    # Same as live streams, so encodes are shared via the JPEG cache
+RECORDING_SEGMENT_SECONDS = 60
+RECORDING_QUEUE_DEPTH = 64          # Frames buffered for the writer before new ones are dropped
+
+recorders = {}
+_recorders_lock = threading.Lock()
+
+class CameraRecorder:
+    """Feeds one camera's frames through a bounded queue to a segment-writing thread"""
+
+    def __init__(self, camera_id, fps=RECORDING_FPS, quality=RECORDING_QUALITY, width=None, height=None,
+                 segment_seconds=RECORDING_SEGMENT_SECONDS, directory=RECORDING_DIR):
+        self.camera_id = camera_id
+        self.fps = fps
+        self.quality = quality
+        self.width = width
+        self.height = height
+        self.segment_seconds = segment_seconds
+        self.directory = os.path.join(directory, str(camera_id))
+        self.started = None
+        self.error = None
+        self.segments = []
+        self.frames_written = 0
+        self.bytes_written = 0
+        self.dropped = 0          # Frames the writer queue had no room for
+        self.write_time = 0.0     # Seconds spent in write() and segment rotation
+        self._queue = queue.Queue(RECORDING_QUEUE_DEPTH)
+        self._running = False
+        self._feeder = None
+        self._writer = None
+        self._file = None
+        self._segment_started = 0.0
+        self._capture = None
+        self._client = None
+        self._write_seconds = metric_histogram(
+            'recording_write_seconds', 'Time to write one recorded frame', camera=camera_id)
+        self._dropped_frames = metric_counter(
+            'recording_dropped_frames', 'Recorded frames dropped because storage fell behind', camera=camera_id)
+
+    @property
+    def running(self):
+        return self._running
+
+    def start(self):
+        if self._running:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        self._running = True
+        self.started = time.time()
+        self._capture = get_capture(self.camera_id)
+        variant = self._capture.acquire_variant(self.width, self.height)
+        self._client = StreamClient(adaptive=False, variant=variant, max_quality=self.quality)
+        self._client.target_fps = self.fps
+        self._capture.subscribe(self._client)
+        self._writer = threading.Thread(target=self._write, name=f"record-write-{self.camera_id}", daemon=True)
+        self._feeder = threading.Thread(target=self._feed, name=f"record-feed-{self.camera_id}", daemon=True)
+        self._writer.start()
+        self._feeder.start()
+        status_hub.publish('recording', camera_id=self.camera_id, state='started', directory=self.directory)
+
+    def stop(self, wait=False):
+        """Stop taking frames; the writer drains what is queued, then closes the segment"""
+        if self._running:
+            self._running = False
+            self._client.wake()
+            if self._feeder is not threading.current_thread():
+                self._feeder.join(timeout=2.0)
+            if self._writer.is_alive():
+                # Waits for at most one write if the queue is full
+                self._queue.put(None)
+        if wait and self._writer is not None:
+            self._writer.join()
+
+    def _feed(self):
+        capture, client = self._capture, self._client
+        period = 1.0 / self.fps
+        next_due = 0.0
+        try:
+            while self._running and capture.running:
+                delay = next_due - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                item = client.take()
+                if item is None:
+                    continue
+                next_due = time.monotonic() + period
+                if self._queue.full():
+                    # Don't spend an encode on a frame the writer has no room for
+                    self.dropped += 1
+                    self._dropped_frames.inc()
+                    continue
+                result = client.variant.encode(*item, quality=self.quality)
+                if result is not None:
+                    self._queue.put_nowait(result)
+        finally:
+            capture.unsubscribe(client)
+            capture.release_variant(client.variant)
+            if self._running:
+                # Capture stopped underneath us (camera released); finish up
+                self._running = False
+                self._queue.put(None)
+
+    def _write(self):
+        try:
+            while True:
+                item = self._queue.get()
+                if item is None:
+                    break
+                _, timestamp, jpeg = item
+                started = time.monotonic()
+                if self._file is None or timestamp - self._segment_started >= self.segment_seconds:
+                    self._open_segment(timestamp)
+                self._file.write(jpeg)
+                elapsed = time.monotonic() - started
+                self.write_time += elapsed
+                self._write_seconds.observe(elapsed)
+                self.frames_written += 1
+                self.bytes_written += len(jpeg)
+        except OSError as e:
+            self.error = str(e)
+            self._running = False
+            trace.log('recording', self.camera_id, f"Recording of camera {self.camera_id} failed: {e}")
+        finally:
+            self._close_segment()
+            status_hub.publish('recording', camera_id=self.camera_id, state='stopped',
+                               frames=self.frames_written, error=self.error)
+
+    def _open_segment(self, timestamp):
+        self._close_segment()
+        stamp = time.strftime('%Y%m%d-%H%M%S', time.localtime(timestamp))
+        path = os.path.join(self.directory, f"{self.camera_id}-{stamp}.mjpeg")
+        self._file = open(path, 'ab')
+        self._segment_started = timestamp
+        self.segments.append(path)
+
+    def _close_segment(self):
+        if self._file is None:
+            return
+        try:
+            self._file.flush()
+            # Make the finished segment durable before starting the next one
+            os.fsync(self._file.fileno())
+        except OSError:
+            pass
+        self._file.close()
+        self._file = None
+
+    def stats(self):
+        elapsed = time.time() - self.started if self.started else 0.0
+        offered = self.frames_written + self.dropped + self._queue.qsize()
+        return {
+            'recording': self._running,
+            'writing': self._writer is not None and self._writer.is_alive(),
+            'directory': self.directory,
+            'segment': self.segments[-1] if self.segments else None,
+            'segments': len(self.segments),
+            'segment_seconds': self.segment_seconds,
+            'fps': self.fps,
+            'quality': self.quality,
+            'seconds': round(elapsed, 1),
+            'frames_written': self.frames_written,
+            'bytes_written': self.bytes_written,
+            'write_bytes_per_sec': round(self.bytes_written / elapsed) if elapsed else 0,
+            'write_ms_per_frame': round(self.write_time * 1000 / self.frames_written, 2) if self.frames_written else 0.0,
+            'queue_depth': self._queue.qsize(),
+            'queue_capacity': self._queue.maxsize,
+            'dropped': self.dropped,
+            'drop_rate': round(self.dropped / offered, 3) if offered else 0.0,
+            'error': self.error
+        }
+
+def start_recording(camera_id, **options):
+    """Start recording a camera; returns the (possibly already running) recorder"""
+    with _recorders_lock:
+        recorder = recorders.get(camera_id)
+        if recorder is None or not recorder.running:
+            recorder = CameraRecorder(camera_id, **options)
+            recorders[camera_id] = recorder
+            recorder.start()
+    return recorder
+
+def stop_recording(camera_id, wait=False):
+    """Stop recording a camera, if it is; returns the recorder or None"""
+    with _recorders_lock:
+        recorder = recorders.get(camera_id)
+    if recorder is not None:
+        recorder.stop(wait)
+    return recorder
+
+# POST /camera/<id>/record fields that must be JSON numbers (or null for the default)
+RECORD_NUMBER_FIELDS = ('width', 'height', 'quality', 'fps', 'segment_seconds')
+
+@app.route('/camera/<camera_id>/record', methods=['GET', 'POST'])
+def camera_record(camera_id):
+    """Route to start/stop server-side recording of a camera, or report its progress"""
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or {}
+        if not isinstance(data, dict):
+            return jsonify({'status': 'error', 'message': 'Expected a JSON object'}), 400
+        for name, value in data.items():
+            if name == 'on' and not isinstance(value, bool):
+                return jsonify({'status': 'error', 'message': 'on must be true or false'}), 400
+            if name in RECORD_NUMBER_FIELDS and value is not None and \
+                    (isinstance(value, bool) or not isinstance(value, (int, float))):
+                return jsonify({'status': 'error', 'message': f'{name} must be a number'}), 400
+        if not data.get('on', True):
+            recorder = stop_recording(camera_id)
+        else:
+            width, height, quality = _stream_params(data)
+            fps, segment_seconds = data.get('fps'), data.get('segment_seconds')
+            try:
+                fps = max(0.5, min(STREAM_MAX_FPS, float(RECORDING_FPS if fps is None else fps)))
+                segment_seconds = max(5, int(RECORDING_SEGMENT_SECONDS if segment_seconds is None else segment_seconds))
+            except (OverflowError, ValueError):
+                return jsonify({'status': 'error', 'message': 'Invalid fps or segment_seconds'}), 400
+            if data.get('quality') is None:
+                quality = RECORDING_QUALITY
+            try:
+                recorder = start_recording(camera_id, fps=fps, quality=quality, width=width, height=height,
+                                           segment_seconds=segment_seconds)
+            except OSError as e:
+                return jsonify({'status': 'error', 'message': f'Cannot record to {RECORDING_DIR}: {e}'}), 500
+    else:
+        recorder = recorders.get(camera_id)
+
+    return jsonify({
+        'status': 'success',
+        'camera_id': camera_id,
+        **(recorder.stats() if recorder is not None else {'recording': False})
+    })
+
+
+# -------------------- Motor control loop --------------------
+# A single thread owns the motor pins. Control handlers only publish the
+# latest command into a slot; the loop applies it at a fixed rate and ramps
+# the tracks to a stop if commands stop arriving (e.g. the tether drops).
+MOTOR_LOOP_HZ = 100
+MOTOR_DEADMAN_TIMEOUT = 0.5   # Seconds without a command before stopping
+MOTOR_RAMP_STEP = 25          # Motor units per tick when ramping down (~0.1s from full)
+
+# Guards the motor pins against the loop and shutdown writing at once
+_motor_lock = threading.Lock()
+
+def mix_joystick(forward_reverse, left_right):
+    """Convert joystick values to clamped (left, right) motor values"""
+    # Calculate motor values based on joystick inputs
+    # This is a simple differential drive calculation
+    left_motor = forward_reverse + left_right
+    right_motor = forward_reverse - left_right
+    
+    # Clamp values to -255 to 255 range
+    left_motor = max(-255, min(255, left_motor))
+    right_motor = max(-255, min(255, right_motor))
+    
+    return left_motor, right_motor
+
+def apply_motors(left_motor, right_motor):
+    """Write motor values to the pins (called from the control loop)"""
+    with _motor_lock:
+        motor_driver.set_motor(MOTOR_A_IN1, MOTOR_A_IN2, MOTOR_A_EN, pwm_a, left_motor)
+        motor_driver.set_motor(MOTOR_B_IN1, MOTOR_B_IN2, MOTOR_B_EN, pwm_b, right_motor)
+        motor_driver.flush()
+
+def _ramp(current, target, step):
+    if current < target:
+        return min(target, current + step)
+    return max(target, current - step)
+
+class MotorControlLoop:
+    """Applies the most recent motor command at a fixed rate with a deadman stop"""
+
+    def __init__(self, rate_hz=MOTOR_LOOP_HZ, deadman=MOTOR_DEADMAN_TIMEOUT, ramp_step=MOTOR_RAMP_STEP):
+        self.rate_hz = rate_hz
+        self.deadman = deadman
+        self.ramp_step = ramp_step
+        # (left, right, monotonic time); replaced by a single reference
+        # assignment, so publishers and the loop never need a lock
+        self._command = (0, 0, 0.0)
+        self.left = 0
+        self.right = 0
+        self.ticks = 0
+        self.overruns = 0
+        self.deadman_stops = 0
+        self.deadman_active = False
+        self.write_errors = 0
+        self.last_error = None
+        self._running = False
+        self._thread = None
+        self._last_stamp = 0.0
+        self._retry = False       # The last write failed; rewrite even if the command is unchanged
+        self._command_latency = metric_histogram(
+            'control_to_gpio_seconds', 'Time from receiving a motor command until the loop applies it')
+        self._write_time = metric_histogram(
+            'gpio_write_seconds', 'Time to write both motors to the pins')
+        self._overrun_count = metric_counter('motor_loop_overruns', 'Control loop ticks that fell behind')
+
+    def publish(self, left_motor, right_motor, received=None):
+        """Hand a command to the loop; received is the monotonic time the request arrived"""
+        self._command = (left_motor, right_motor, received or time.monotonic())
+
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="motor-loop", daemon=True)
+        self._thread.start()
+
+    @property
+    def running(self):
+        """True while the loop thread is alive and applying commands"""
+        return self._running and self._thread is not None and self._thread.is_alive()
+
+    def stop(self):
+        was_running = self._running
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+        self._thread = None
+        self.left = self.right = 0
+        if was_running:
+            apply_motors(0, 0)
+
+    def _run(self):
+        period = 1.0 / self.rate_hz
+        next_tick = time.monotonic()
+        while self._running:
+            try:
+                self._tick()
+            except Exception as e:
+                # Never let one bad tick end the loop: that would leave the
+                # tracks at their last duty with no deadman
+                self._tick_failed(e)
+
+            next_tick += period
+            delay = next_tick - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            elif delay < -period:
+                # Fell more than a tick behind; resync rather than bursting
+                self.overruns += 1
+                self._overrun_count.inc()
+                next_tick = time.monotonic()
+
+    def _tick(self):
+        left, right, stamp = self._command
+        now = time.monotonic()
+        self.ticks += 1
+
+        if now - stamp > self.deadman:
+            # No fresh command: ramp down rather than slamming to a stop
+            if not self.deadman_active and (self.left or self.right):
+                self.deadman_active = True
+                self.deadman_stops += 1
+                trace.log('motor', 'deadman', "Motor deadman timeout, stopping")
+                status_hub.update('deadman_active', True, 'motor', state='deadman_stop')
+            left = _ramp(self.left, 0, self.ramp_step)
+            right = _ramp(self.right, 0, self.ramp_step)
+        elif self.deadman_active:
+            self.deadman_active = False
+            status_hub.update('deadman_active', False, 'motor', state='resumed')
+
+        if (left, right) != (self.left, self.right) or self.ticks == 1 or self._retry:
+            trace.record('motor', 'apply', (left, right))
+            started = time.monotonic()
+            apply_motors(left, right)
+            self._write_time.observe(time.monotonic() - started)
+            self.left, self.right = left, right
+            if self._retry:
+                self._retry = False
+                trace.log('motor', 'loop', "Motor writes recovered")
+        if stamp != self._last_stamp and not self.deadman_active:
+            # First tick to see this command: the pins now reflect it
+            self._last_stamp = stamp
+            self._command_latency.observe(time.monotonic() - stamp)
+
+    def _tick_failed(self, error):
+        """Log a failed tick; the next tick rewrites every pin"""
+        self.write_errors += 1
+        self.last_error = str(error)
+        if not self._retry:
+            trace.log('motor', 'loop', f"Motor write failed, retrying every tick: {error}")
+        self._retry = True
+        motor_driver.invalidate()
+
+    def stats(self):
+        return {
+            'rate_hz': self.rate_hz,
+            'left': self.left,
+            'right': self.right,
+            'ticks': self.ticks,
+            'overruns': self.overruns,
+            'deadman_stops': self.deadman_stops,
+            'deadman_active': self.deadman_active,
+            'running': self.running,
+            'write_errors': self.write_errors,
+            'last_error': self.last_error
+        }
+
+motor_loop = MotorControlLoop()
+
+class MotorLoopStopped(RuntimeError):
+    """A command arrived while no control loop is running to apply it"""
+
+def drive(forward_reverse, left_right, received=None):
+    """Publish joystick values to the control loop; returns the (left, right) motor values"""
+    if not motor_loop.running:
+        raise MotorLoopStopped("Motor control loop is not running")
+    left_motor, right_motor = mix_joystick(forward_reverse, left_right)
+    motor_loop.publish(left_motor, right_motor, received)
+    return left_motor, right_motor
+
+_control_request_time = {
+    transport: metric_histogram('control_request_seconds', 'Time to handle one motor command', transport=transport)
+    for transport in ('http', 'websocket')
+}
+
 @app.route('/control', methods=['POST'])
 def control_motors():
     """Route for controlling motors"""
+    received = time.monotonic()
     try:
         data = request.json
         forward_reverse = data.get('forwardReverse', 0)
         left_right = data.get('leftRight', 0)
         
-        # Calculate motor values based on joystick inputs
-        # This is a simple differential drive calculation
-        left_motor = forward_reverse + left_right
-        right_motor = forward_reverse - left_right
-        
-        # Clamp values to -255 to 255 range
-        left_motor = max(-255, min(255, left_motor))
-        right_motor = max(-255, min(255, right_motor))
-        
-        # Control left motor
-        if left_motor > 0:  # Forward
-            gpio_output(MOTOR_A_IN1, GPIO.HIGH)
-            gpio_output(MOTOR_A_IN2, GPIO.LOW)
-            pwm_set_duty(pwm_a, MOTOR_A_EN, int(abs(left_motor) / 255 * 100))
-        elif left_motor < 0:  # Reverse
-            gpio_output(MOTOR_A_IN1, GPIO.LOW)
-            gpio_output(MOTOR_A_IN2, GPIO.HIGH)
-            pwm_set_duty(pwm_a, MOTOR_A_EN, int(abs(left_motor) / 255 * 100))
-        else:  # Stop
-            gpio_output(MOTOR_A_IN1, GPIO.LOW)
-            gpio_output(MOTOR_A_IN2, GPIO.LOW)
-            pwm_set_duty(pwm_a, MOTOR_A_EN, 0)
-        
-        # Control right motor
-        if right_motor > 0:  # Forward
-            gpio_output(MOTOR_B_IN1, GPIO.HIGH)
-            gpio_output(MOTOR_B_IN2, GPIO.LOW)
-            pwm_set_duty(pwm_b, MOTOR_B_EN, int(abs(right_motor) / 255 * 100))
-        elif right_motor < 0:  # Reverse
-            gpio_output(MOTOR_B_IN1, GPIO.LOW)
-            gpio_output(MOTOR_B_IN2, GPIO.HIGH)
-            pwm_set_duty(pwm_b, MOTOR_B_EN, int(abs(right_motor) / 255 * 100))
-        else:  # Stop
-            gpio_output(MOTOR_B_IN1, GPIO.LOW)
-            gpio_output(MOTOR_B_IN2, GPIO.LOW)
-            pwm_set_duty(pwm_b, MOTOR_B_EN, 0)
+        left_motor, right_motor = drive(forward_reverse, left_right, received)
         
         return jsonify({
             'status': 'success',
@@ -696,50 +4258,646 @@ def control_motors():
             'rightMotor': right_motor,
             'platform': platform_name
         })
+    except MotorLoopStopped as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 503
     except Exception as e:
-        print(f"Control error: {e}")
+        trace.log('control', 'http', f"Control error: {e}")
         return jsonify({
             'status': 'error',
             'message': str(e)
         }), 500
+    finally:
+        _control_request_time['http'].observe(time.monotonic() - received)
+
+# -------------------- Control channel (WebSocket) --------------------
+# A persistent socket avoids per-command HTTP overhead at joystick rates.
+# Messages are JSON ({"seq": 12, "forwardReverse": 100, "leftRight": -20})
+# or compact text ("12,100,-20"). Commands with a sequence number at or below
+# the last applied one arrived out of order and are dropped.
+control_channel_stats = {
+    'connections': 0,
+    'received': 0,
+    'applied': 0,
+    'stale': 0,
+    'errors': 0
+}
+
+def _parse_control_message(message):
+    """Parse a control channel message into (seq, forward_reverse, left_right, client_time)"""
+    if isinstance(message, bytes):
+        message = message.decode('utf-8')
+    message = message.strip()
+    if message.startswith('{'):
+        data = json.loads(message)
+        seq = data.get('seq')
+        return (int(seq) if seq is not None else None,
+                int(data.get('forwardReverse', 0)),
+                int(data.get('leftRight', 0)),
+                data.get('t'))
+    seq, forward_reverse, left_right = message.split(',')[:3]
+    return int(seq), int(forward_reverse), int(left_right), None
+
+def process_control_message(message, session):
+    """Apply one control channel message and return the reply to send back"""
+    received = time.monotonic()
+    control_channel_stats['received'] += 1
+    try:
+        seq, forward_reverse, left_right, client_time = _parse_control_message(message)
+        last_seq = session.get('last_seq')
+        if seq is not None and last_seq is not None and seq <= last_seq:
+            control_channel_stats['stale'] += 1
+            return {'seq': seq, 'status': 'stale'}
+        if seq is not None:
+            session['last_seq'] = seq
+
+        left_motor, right_motor = drive(forward_reverse, left_right, received)
+        control_channel_stats['applied'] += 1
+
+        ack = {'seq': seq, 'leftMotor': left_motor, 'rightMotor': right_motor}
+        if client_time is not None:
+            ack['t'] = client_time
+        return ack
+    except (ValueError, TypeError, MotorLoopStopped) as e:
+        control_channel_stats['errors'] += 1
+        return {'status': 'error', 'message': str(e)}
+    finally:
+        _control_request_time['websocket'].observe(time.monotonic() - received)
+
+def handle_control_channel(ws):
+    """Serve one control channel connection until the client goes away"""
+    control_channel_stats['connections'] += 1
+    session = {}
+    try:
+        while True:
+            message = ws.receive()
+            if message is None:
+                break
+            ws.send(json.dumps(process_control_message(message, session)))
+    except ConnectionClosed:
+        pass
+    finally:
+        control_channel_stats['connections'] -= 1
+
+def control_channel_enabled():
+    """The channel is served by flask-sock, or natively by the aiohttp engine"""
+    return sock is not None or SERVER_ENGINE == 'aiohttp'
+
+if sock is not None:
+    @sock.route('/control/ws')
+    def control_socket(ws):
+        """WebSocket route for low-latency motor control"""
+        handle_control_channel(ws)
 
 @app.route('/status', methods=['GET'])
 def get_status():
     """Route for checking server status"""
-    camera_status = {}
-    for camera_id in cameras:
-        camera, _ = get_camera(camera_id)
-        camera_status[camera_id] = camera.isOpened()
-    
-    return jsonify({
+    readiness.milestone('first_status')
+    return jsonify(status_payload())
+
+def status_payload():
+    """Server status from the cached snapshot and in-memory counters; never touches a device"""
+    snapshot = status_hub.snapshot
+    return {
         'status': 'online',
-        'cameras': camera_status,
+        'cameras': snapshot['cameras'],
+        'lights': snapshot['lights'],
         'platform': platform_name,
-        'message': f'Robot control server is running on {platform_name}'
-    })
+        'gpio_writes': motor_driver.stats(),
+        'motor_loop': motor_loop.stats(),
+        'control_channel': dict(control_channel_stats, url='/control/ws') if control_channel_enabled() else None,
+        'startup': readiness.stats(),
+        'events': {'url': '/events', 'subscribers': len(status_hub.subscribers)},
+        'recording': {camera_id: recorder.running for camera_id, recorder in list(recorders.items())},
+        'message': f'Robot control server is running on {platform_name or "undetected platform (starting)"}'
+                   + ('' if motor_loop.running else '; motor control loop is not running')
+    }
+
+def generate_events():
+    """Stream the status snapshot, then change events, as Server-Sent Events"""
+    subscriber = status_hub.subscribe()
+    try:
+        yield format_sse('status', status_payload())
+        while True:
+            item = subscriber.take(EVENTS_KEEPALIVE)
+            if item is None:
+                # Lets clients notice a dead link without polling
+                yield format_sse('ping', {'time': time.time()})
+                continue
+            event_id, event, data = item
+            yield format_sse(event, data, event_id)
+    finally:
+        status_hub.unsubscribe(subscriber)
+
+@app.route('/events', methods=['GET'])
+def events_stream():
+    """Server-Sent Events push channel for status, lights, camera and motor changes"""
+    return Response(generate_events(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus metrics: stage latency histograms, counters and system health"""
+    captures = list(camera_captures.items())
+    gauges = [
+        ('stream_viewers', 'Open MJPEG streams per camera', 'gauge',
+         [({'camera': cam_id}, capture.viewers) for cam_id, capture in captures]),
+        ('jpeg_encodes', 'JPEG encodes per camera', 'counter',
+         [({'camera': cam_id}, capture.encodes) for cam_id, capture in captures]),
+        ('jpeg_cache_hits', 'Frames served from the shared JPEG cache', 'counter',
+         [({'camera': cam_id}, capture.cache_hits) for cam_id, capture in captures]),
+        ('jpeg_passthrough_frames', 'Camera JPEGs forwarded without re-encoding', 'counter',
+         [({'camera': cam_id}, capture.passthrough_frames) for cam_id, capture in captures]),
+        ('stream_frames_skipped', 'Stream frames skipped because the scene had not changed', 'counter',
+         [({'camera': cam_id}, capture.change.skipped) for cam_id, capture in captures]),
+        ('jpeg_pipeline_skipped', 'Frames left to serial encoding because the encode pool was full', 'counter',
+         [({'camera': cam_id}, capture.prefetch_skipped) for cam_id, capture in captures]),
+        ('gpio_writes', 'Motor pin and PWM writes by outcome', 'counter',
+         [({'result': 'issued'}, motor_driver.writes), ({'result': 'skipped'}, motor_driver.skipped)]),
+        ('gpio_bulk_writes', 'Bulk writes covering several motor pins', 'counter', [({}, motor_driver.bulk_writes)]),
+        ('motor_loop_ticks', 'Control loop iterations', 'counter', [({}, motor_loop.ticks)]),
+        ('trace_events', 'Events recorded in the debug trace', 'counter', [({}, trace.last_seq)]),
+        ('motor_deadman_stops', 'Motors stopped by the deadman timeout', 'counter', [({}, motor_loop.deadman_stops)]),
+        ('control_channel_connections', 'Open control channel sockets', 'gauge',
+         [({}, control_channel_stats['connections'])]),
+        ('control_channel_messages', 'Control channel messages by outcome', 'counter',
+         [({'result': key}, control_channel_stats[key]) for key in ('received', 'applied', 'stale', 'errors')]),
+        ('event_subscribers', 'Open /events push streams', 'gauge', [({}, len(status_hub.subscribers))]),
+        ('light_frames', 'NeoPixel frames by outcome', 'counter',
+         [({'result': 'written'}, light_engine.frames), ({'result': 'skipped'}, light_engine.skipped)]),
+        ('rewind_bytes_used', 'Bytes of the rewind arena holding frames', 'gauge',
+         [({'camera': camera_id}, rewind['bytes_used'])
+          for camera_id, rewind in ((camera_id, capture.rewind_stats()) for camera_id, capture in captures)
+          if rewind is not None]),
+        ('capture_worker_restarts', 'Capture worker processes restarted after exiting or stalling', 'counter',
+         [({'camera': camera_id}, capture.restarts)
+          for camera_id, capture in captures if isinstance(capture, ProcessCapture)]),
+        ('recording_queue_depth', 'Frames waiting for the recording writer', 'gauge',
+         [({'camera': camera_id}, recorder.stats()['queue_depth']) for camera_id, recorder in list(recorders.items())]),
+        ('recording_bytes_written', 'Bytes written to recording segments', 'counter',
+         [({'camera': camera_id}, recorder.bytes_written) for camera_id, recorder in list(recorders.items())])
+    ]
+    return Response(render_metrics(gauges + system_monitor.gauges()),
+                    mimetype='text/plain; version=0.0.4')
+
+TRACE_FOLLOW_INTERVAL = 0.1  # Seconds between polls of the ring when following
 
+def _trace_query(args):
+    """Parse ?since=&limit=&subsystem= for /debug/trace"""
+    def number(name, default):
+        try:
+            return int(args.get(name, default))
+        except ValueError:
+            return default
+    return number('since', 0), number('limit', 500), args.get('subsystem') or None
+
+def _follow_trace(since, subsystem):
+    """Yield new trace events as NDJSON lines until the client disconnects"""
+    yield ''  # Get the response headers out before the first event
+    while True:
+        last = trace.last_seq
+        for event in trace.events(since, subsystem=subsystem, until=last):
+            yield json.dumps(event, default=str) + '\n'
+        since = last
+        time.sleep(TRACE_FOLLOW_INTERVAL)
+
+@app.route('/debug/trace', methods=['GET'])
+def debug_trace():
+    """Dump recent trace events, or follow new ones as NDJSON with ?follow=1"""
+    since, limit, subsystem = _trace_query(request.args)
+    if request.args.get('follow', '').lower() in ('1', 'true', 'yes'):
+        return Response(_follow_trace(since or trace.last_seq, subsystem), mimetype='application/x-ndjson')
+    return jsonify(dict(trace.stats(), status='success',
+                        events=trace.events(since, limit, subsystem)))
+
+def _parse_color(value):
+    """Accept [r, g, b] or "#rrggbb" """
+    if isinstance(value, str):
+        value = value.lstrip('#')
+        if len(value) != 6:
+            raise ValueError(f"colour {value!r} is not #rrggbb")
+        return tuple(bytes.fromhex(value))
+    r, g, b = (max(0, min(255, int(c))) for c in value)
+    return (r, g, b)
+
+def _parse_level(value):
+    return None if value is None else max(0, min(255, int(value)))
+
+def _apply_lights_request(data):
+    """Apply a POST /lights body: on/off, strip brightness, fill colour, per-pixel values, effect"""
+    if not isinstance(data, dict):
+        raise ValueError("expected a JSON object")
+    if not isinstance(data.get('on', False), bool):
+        raise ValueError("on must be true or false")
+    fade = max(0.0, float(data.get('fade', 0.0)))
+    if 'brightness' in data:
+        light_engine.set_brightness(_parse_level(data['brightness']))
+    if 'effect' in data:
+        light_engine.set_effect(data['effect'], data.get('period'))
+    if 'color' in data:
+        light_engine.fill(_parse_color(data['color']), fade)
+    if 'pixels' in data:
+        pixels = {}
+        for pixel in data['pixels']:
+            index = int(pixel['index'])
+            if not 0 <= index < light_engine.count:
+                raise IndexError(f"pixel {index} out of range 0-{light_engine.count - 1}")
+            color = pixel.get('color')
+            pixels[index] = (_parse_color(color) if color is not None else None,
+                             _parse_level(pixel.get('brightness')))
+        light_engine.update(pixels, fade)
+    if 'color' in data or 'pixels' in data:
+        _sync_lights_state()
+    elif 'on' in data or not any(key in data for key in ('brightness', 'effect')):
+        # Plain {on: bool} (or an empty body, which has always meant off)
+        set_lights(data.get('on', False), fade)
 
 @app.route('/lights', methods=['GET', 'POST'])
 def lights_route():
     """Get or set light state for 4 NeoPixels on GPIO 12"""
     try:
-        if request.method == 'GET':
-            return jsonify({ 'status': 'success', 'on': bool(lights_on) })
-        # POST
-        data = request.get_json(silent=True) or {}
-        desired = bool(data.get('on', False))
-        set_lights(desired)
-        return jsonify({ 'status': 'success', 'on': bool(lights_on) })
+        if request.method == 'POST':
+            if not readiness.is_ready('lights'):
+                return jsonify({ 'status': 'error', 'message': 'Lights are still initialising' }), 503
+            data = request.get_json(silent=True) or {}
+            try:
+                _apply_lights_request(data)
+            except (TypeError, ValueError, IndexError) as e:
+                return jsonify({ 'status': 'error', 'message': f'Invalid lights request: {e}' }), 400
+        return jsonify({
+            'status': 'success',
+            'on': bool(lights_on),
+            'pixels': light_engine.pixels(),
+            **light_engine.stats()
+        })
     except Exception as e:
-        print(f"/lights error: {e}")
+        trace.log('lights', 'route', f"/lights error: {e}")
         return jsonify({ 'status': 'error', 'message': str(e) }), 500
 
 
+# -------------------- Async server engine (aiohttp) --------------------
+# With GPIO_SERVER_ENGINE=aiohttp the server runs on an asyncio event loop.
+# MJPEG streams are async generators woken by the capture threads, so an open
+# stream no longer pins an OS thread. /control and /control/ws are handled
+# natively on the loop; every other route is passed through to the Flask app
+# on a worker thread, so both engines expose the same API.
+
+async def generate_camera_frames_async(camera_id, pacing=STREAM_PACING, width=None, height=None, quality=JPEG_QUALITY):
+    """Async counterpart of generate_camera_frames() for the aiohttp engine"""
+    loop = asyncio.get_running_loop()
+    capture = await loop.run_in_executor(None, get_capture, camera_id)
+    variant = capture.acquire_variant(width, height)
+    client = StreamClient(adaptive=(pacing == 'adaptive'), variant=variant, max_quality=quality)
+    send_time = metric_histogram('stream_send_seconds', 'Time to write one MJPEG frame to a viewer', camera=camera_id)
+    frame_age = metric_histogram('stream_frame_age_seconds', 'Capture-to-sent age of streamed frames', camera=camera_id)
+    ready = asyncio.Event()
+
+    def wake():
+        # Runs on the capture thread
+        try:
+            loop.call_soon_threadsafe(ready.set)
+        except RuntimeError:
+            pass  # Event loop already closed
+
+    client.listener = wake
+    capture.subscribe(client)
+    next_due = 0.0
+
+    try:
+        while capture.running:
+            delay = next_due - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            ready.clear()
+            item = client.poll()
+            if item is None:
+                try:
+                    await asyncio.wait_for(ready.wait(), 1.0)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            if not capture.change.should_send(client, item[0]):
+                continue
+
+            # Encode on a worker thread unless another viewer already has
+            result = variant.cached_jpeg(item[0], client.quality)
+            if result is None:
+                result = await loop.run_in_executor(None, variant.encode, *item, client.quality)
+            if result is None:
+                continue
+            _, timestamp, jpeg = result
+
+            started = time.monotonic()
+            yield mjpeg_part(jpeg)
+            elapsed = time.monotonic() - started
+            client.record_sent(elapsed, len(jpeg), timestamp)
+            send_time.observe(elapsed)
+            frame_age.observe(time.time() - timestamp)
+
+            next_due = started + 1.0 / client.target_fps
+    finally:
+        capture.unsubscribe(client)
+        capture.release_variant(variant)
+
+async def _async_camera_stream(request):
+    pacing = request.query.get('pacing', STREAM_PACING)
+    if pacing not in ('adaptive', 'fixed'):
+        pacing = STREAM_PACING
+    response = aiohttp_web.StreamResponse(headers={
+        'Content-Type': 'multipart/x-mixed-replace; boundary=frame'
+    })
+    await response.prepare(request)
+
+    width, height, quality = _stream_params(request.query)
+    frames = generate_camera_frames_async(request.match_info['camera_id'], pacing, width, height, quality)
+    try:
+        async for chunk in frames:
+            await response.write(chunk)
+    except ConnectionResetError:
+        pass  # Viewer went away
+    finally:
+        await frames.aclose()
+    return response
+
+async def generate_composite_frames_async(composite, pacing=STREAM_PACING):
+    """Async counterpart of generate_composite_frames() for the aiohttp engine"""
+    loop = asyncio.get_running_loop()
+    client = StreamClient(adaptive=(pacing == 'adaptive'), max_quality=composite.quality)
+    ready = asyncio.Event()
+
+    def wake():
+        # Runs on the composite thread
+        try:
+            loop.call_soon_threadsafe(ready.set)
+        except RuntimeError:
+            pass  # Event loop already closed
+
+    client.listener = wake
+    composite.subscribe(client)
+    next_due = 0.0
+
+    try:
+        while composite.running:
+            delay = next_due - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            ready.clear()
+            item = client.poll()
+            if item is None:
+                try:
+                    await asyncio.wait_for(ready.wait(), 1.0)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            _, timestamp, jpeg = item
+
+            started = time.monotonic()
+            yield mjpeg_part(jpeg)
+            client.record_sent(time.monotonic() - started, len(jpeg), timestamp)
+            next_due = started + 1.0 / client.target_fps
+    finally:
+        composite.unsubscribe(client)
+        await loop.run_in_executor(None, release_composite, composite)
+
+async def _async_composite_stream(request):
+    try:
+        params = _composite_params(request.query)
+    except ValueError as e:
+        return aiohttp_web.json_response({'status': 'error', 'message': str(e)}, status=400)
+    pacing = request.query.get('pacing', STREAM_PACING)
+    if pacing not in ('adaptive', 'fixed'):
+        pacing = STREAM_PACING
+    response = aiohttp_web.StreamResponse(headers={
+        'Content-Type': 'multipart/x-mixed-replace; boundary=frame'
+    })
+    await response.prepare(request)
+
+    loop = asyncio.get_running_loop()
+    composite = await loop.run_in_executor(None, acquire_composite, *params)
+    frames = generate_composite_frames_async(composite, pacing)
+    try:
+        async for chunk in frames:
+            await response.write(chunk)
+    except ConnectionResetError:
+        pass  # Viewer went away
+    finally:
+        await frames.aclose()
+    return response
+
+async def _async_rewind_replay(request):
+    rewind = _rewind_for(request.match_info['camera_id'])
+    if rewind is None:
+        return aiohttp_web.json_response({'status': 'error', 'message': 'Camera has no rewind buffer running'},
+                                         status=404)
+    try:
+        start, end, speed = _rewind_span(request.query)
+    except ValueError:
+        return aiohttp_web.json_response({'status': 'error', 'message': 't, ago, until and speed must be numbers'},
+                                         status=400)
+    response = aiohttp_web.StreamResponse(headers={
+        'Content-Type': 'multipart/x-mixed-replace; boundary=frame'
+    })
+    await response.prepare(request)
+    try:
+        for delay, _, _, jpeg in rewind.replay(start, end, speed):
+            if delay:
+                await asyncio.sleep(delay)
+            await response.write(mjpeg_part(jpeg))
+    except ConnectionResetError:
+        pass  # Viewer went away
+    return response
+
+async def _async_control(request):
+    received = time.monotonic()
+    try:
+        data = await request.json()
+        left_motor, right_motor = drive(data.get('forwardReverse', 0), data.get('leftRight', 0), received)
+        return aiohttp_web.json_response({
+            'status': 'success',
+            'leftMotor': left_motor,
+            'rightMotor': right_motor,
+            'platform': platform_name
+        })
+    except MotorLoopStopped as e:
+        return aiohttp_web.json_response({
+            'status': 'error',
+            'message': str(e)
+        }, status=503)
+    except Exception as e:
+        trace.log('control', 'http', f"Control error: {e}")
+        return aiohttp_web.json_response({
+            'status': 'error',
+            'message': str(e)
+        }, status=500)
+    finally:
+        _control_request_time['http'].observe(time.monotonic() - received)
+
+async def _async_control_socket(request):
+    ws = aiohttp_web.WebSocketResponse()
+    await ws.prepare(request)
+    control_channel_stats['connections'] += 1
+    session = {}
+    try:
+        async for message in ws:
+            if message.type in (WSMsgType.TEXT, WSMsgType.BINARY):
+                await ws.send_str(json.dumps(process_control_message(message.data, session)))
+    finally:
+        control_channel_stats['connections'] -= 1
+    return ws
+
+async def _async_events(request):
+    loop = asyncio.get_running_loop()
+    ready = asyncio.Event()
+    subscriber = status_hub.subscribe()
+
+    def wake():
+        try:
+            loop.call_soon_threadsafe(ready.set)
+        except RuntimeError:
+            pass  # Event loop already closed
+
+    subscriber.listener = wake
+    response = aiohttp_web.StreamResponse(headers={
+        'Content-Type': 'text/event-stream',
+        'Cache-Control': 'no-cache'
+    })
+    try:
+        await response.prepare(request)
+        await response.write(format_sse('status', status_payload()).encode())
+        while True:
+            ready.clear()
+            item = subscriber.poll()
+            if item is None:
+                try:
+                    await asyncio.wait_for(ready.wait(), EVENTS_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    await response.write(format_sse('ping', {'time': time.time()}).encode())
+                continue
+            event_id, event, data = item
+            await response.write(format_sse(event, data, event_id).encode())
+    except ConnectionResetError:
+        pass  # Subscriber went away
+    finally:
+        status_hub.unsubscribe(subscriber)
+    return response
+
+async def _async_debug_trace(request):
+    if request.query.get('follow', '').lower() not in ('1', 'true', 'yes'):
+        return await _async_flask_bridge(request)
+    since, _, subsystem = _trace_query(request.query)
+    since = since or trace.last_seq
+    response = aiohttp_web.StreamResponse(headers={'Content-Type': 'application/x-ndjson'})
+    await response.prepare(request)
+    try:
+        while True:
+            last = trace.last_seq
+            lines = [json.dumps(event, default=str) + '\n'
+                     for event in trace.events(since, subsystem=subsystem, until=last)]
+            if lines:
+                await response.write(''.join(lines).encode())
+            since = last
+            await asyncio.sleep(TRACE_FOLLOW_INTERVAL)
+    except ConnectionResetError:
+        pass  # Client went away
+    return response
+
+def _call_flask(environ):
+    """Run the Flask app for one request and collect the whole response"""
+    started = {}
+
+    def start_response(status, headers, exc_info=None):
+        started['status'] = status
+        started['headers'] = headers
+
+    result = app(environ, start_response)
+    try:
+        body = b''.join(result)
+    finally:
+        if hasattr(result, 'close'):
+            result.close()
+    return started['status'], started['headers'], body
+
+async def _async_flask_bridge(request):
+    body = await request.read()
+    host, _, port = (request.host or 'localhost').partition(':')
+    environ = {
+        'REQUEST_METHOD': request.method,
+        'SCRIPT_NAME': '',
+        'PATH_INFO': urllib.parse.unquote(request.raw_path.split('?', 1)[0], 'latin-1'),
+        'QUERY_STRING': request.query_string,
+        'SERVER_NAME': host,
+        'SERVER_PORT': port or '80',
+        'SERVER_PROTOCOL': f'HTTP/{request.version.major}.{request.version.minor}',
+        'REMOTE_ADDR': request.remote or '',
+        'CONTENT_TYPE': request.headers.get('Content-Type', ''),
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': request.scheme,
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False
+    }
+    for name, value in request.headers.items():
+        key = 'HTTP_' + name.upper().replace('-', '_')
+        if key in ('HTTP_CONTENT_TYPE', 'HTTP_CONTENT_LENGTH'):
+            continue
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+
+    status, headers, payload = await asyncio.get_running_loop().run_in_executor(None, _call_flask, environ)
+    headers = [(name, value) for name, value in headers
+               if name.lower() not in ('content-length', 'transfer-encoding', 'connection')]
+    return aiohttp_web.Response(status=int(status.split(' ', 1)[0]), body=payload, headers=headers)
+
+async def _add_cors_headers(request, response):
+    # Natively handled routes bypass flask_cors
+    response.headers.setdefault('Access-Control-Allow-Origin', '*')
+
+def create_async_app():
+    """Build the aiohttp application used by the async engine"""
+    async_app = aiohttp_web.Application()
+    async_app.router.add_post('/control', _async_control)
+    async_app.router.add_get('/control/ws', _async_control_socket)
+    async_app.router.add_get('/camera/{camera_id}/stream', _async_camera_stream)
+    async_app.router.add_get('/debug/trace', _async_debug_trace)
+    async_app.router.add_get('/events', _async_events)
+    async_app.router.add_get('/composite/stream', _async_composite_stream)
+    async_app.router.add_get('/camera/{camera_id}/rewind/replay', _async_rewind_replay)
+    # Everything else (including CORS preflight) goes through Flask
+    async_app.router.add_route('*', '/{tail:.*}', _async_flask_bridge)
+    async_app.on_response_prepare.append(_add_cors_headers)
+    return async_app
+
+def run_async_server(host='0.0.0.0', port=8080):
+    """Serve the API on an asyncio event loop"""
+    if aiohttp_web is None:
+        raise RuntimeError("GPIO_SERVER_ENGINE=aiohttp requires aiohttp (pip install aiohttp)")
+    aiohttp_web.run_app(create_async_app(), host=host, port=port)
+
+
 if __name__ == '__main__':
+    if sys.argv[1:2] == ['--capture-worker']:
+        # Child process started by ProcessCapture; see run_capture_worker()
+        sys.exit(run_capture_worker(*sys.argv[2:]))
     try:
-        print(f"Starting GPIO server on platform: {platform_name}")
-        app.run(host='0.0.0.0', port=8080, threaded=True)
+        print(f"Starting GPIO server (engine: {SERVER_ENGINE}, capture: {CAPTURE_MODE})")
+        # Hardware comes up in the background while the listener binds
+        startup()
+        if SERVER_ENGINE == 'aiohttp':
+            run_async_server(host='0.0.0.0', port=8080)
+        else:
+            app.run(host='0.0.0.0', port=8080, threaded=True)
     finally:
+        # Stop the control loop first; it leaves the motors stopped
+        motor_loop.stop()
+        system_monitor.stop()
+        trace.stop()
          
         # Clean up based on platform
         if platform_name == "raspberry_pi" or platform_name == "simulation":
@@ -748,6 +4906,12 @@ if __name__ == '__main__':
                 pwm_b.stop()
             if hasattr(GPIO, 'cleanup'):
                 GPIO.cleanup()
+        elif platform_name == "generic_linux":
+            for pwm in (pwm_a, pwm_b):
+                if pwm is not None:
+                    pwm.stop()
+            if gpiod_lines is not None:
+                gpiod_lines.release()
         elif platform_name == "odroid":
             # and "wiringpi" in str(GPIO.__module__):
             # WiringPi cleanup for Odroid
@@ -759,9 +4923,14 @@ if __name__ == '__main__':
             
         try:
             set_lights(False)
+            light_engine.stop()
         except Exception:
             pass
         
-        # Release cameras
+        # Finish recordings, stop capture threads, then release cameras
+        for camera_id in list(recorders):
+            stop_recording(camera_id, wait=True)
+        for camera_id in list(camera_captures):
+            stop_capture(camera_id)
         for camera_id in cameras:
             cameras[camera_id].release()
\ No newline at end of file